@@ -0,0 +1,211 @@
+"""
+Synthetic medical reports for benchmarks: text-layer, scanned and mixed
+PDFs, plus phone photos of printed pages
+"""
+import io
+import os
+import random
+import zlib
+from typing import Dict, List, Union
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Letter size at 72 points per inch, and the raster size of a 200 DPI scan
+PAGE_POINTS = (612, 792)
+SCAN_DPI = 200
+SCAN_PIXELS = (int(8.5 * SCAN_DPI), int(11 * SCAN_DPI))
+
+_SECTIONS = {
+    "CHIEF COMPLAINT": [
+        "Chest pain radiating to the left arm for two hours.",
+        "Shortness of breath on exertion for three days.",
+        "Intermittent palpitations and dizziness since last week.",
+    ],
+    "HISTORY OF PRESENT ILLNESS": [
+        "The patient is a {age} year old with a history of hypertension and hyperlipidemia.",
+        "Symptoms began at rest and were not relieved by sublingual nitroglycerin.",
+        "ECG showed ST elevation in leads V2 through V4 consistent with anterior STEMI.",
+        "Troponin I peaked at {troponin} ng/mL. BP 150/90, HR 98 bpm, SpO2 96% on room air.",
+        "Emergent cardiac catheterization showed 95% occlusion of the proximal LAD.",
+    ],
+    "PROCEDURES": [
+        "Primary PCI with placement of one drug-eluting stent to the proximal LAD.",
+        "Transthoracic echocardiogram: ejection fraction {ef}% with anterior hypokinesis.",
+    ],
+    "DISCHARGE MEDICATIONS": [
+        "Aspirin 81 mg PO daily.",
+        "Ticagrelor 90 mg PO BID for 12 months.",
+        "Atorvastatin 80 mg PO nightly.",
+        "Metoprolol succinate 25 mg PO daily.",
+        "Lisinopril 5 mg PO daily.",
+    ],
+    "DISCHARGE INSTRUCTIONS": [
+        "Follow up with cardiology in 1 week.",
+        "Return to ED for chest pain, shortness of breath or fainting.",
+        "No heavy lifting over 10 pounds for one week.",
+        "Enroll in cardiac rehabilitation.",
+    ],
+}
+
+
+def report_text(seed: int, repeats: int = 1) -> str:
+    """A synthetic discharge summary; repeats > 1 makes a longer report"""
+    rng = random.Random(seed)
+    values = {"age": rng.randint(38, 86), "troponin": round(rng.uniform(2, 40), 1), "ef": rng.randint(30, 60)}
+    lines = ["DISCHARGE SUMMARY", f"Patient ID: {seed:06d}  DOB: 01/{rng.randint(1, 28):02d}/19{rng.randint(40, 89)}", ""]
+    for _ in range(repeats):
+        for heading, sentences in _SECTIONS.items():
+            lines.append(f"{heading}:")
+            for sentence in sentences:
+                if rng.random() < 0.85:
+                    lines.append(sentence.format(**values))
+            lines.append("")
+    return "\n".join(lines).strip()
+
+
+def paginate(text: str, lines_per_page: int = 46) -> List[str]:
+    lines = text.split("\n")
+    return ["\n".join(lines[i:i + lines_per_page]) for i in range(0, len(lines), lines_per_page)] or [""]
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single fixed-size default font
+        return ImageFont.load_default()
+
+
+def render_page(text: str, size=SCAN_PIXELS) -> Image.Image:
+    """A page of text as a clean grayscale raster"""
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    font = _font(size[1] // 70)
+    line_height = size[1] // 50
+    y = size[1] // 14
+    for line in text.split("\n"):
+        draw.text((size[0] // 12, y), line, fill=0, font=font)
+        y += line_height
+    return image
+
+
+def scan(page: Image.Image, rng: random.Random) -> Image.Image:
+    """What a flatbed scan of a printed page looks like: slight skew and speckle"""
+    skewed = page.rotate(rng.uniform(-1.5, 1.5), resample=Image.BILINEAR, fillcolor=255)
+    pixels = np.asarray(skewed, dtype=np.int16)
+    noise = np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, 12, pixels.shape)
+    return Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8))
+
+
+def phone_photo(page: Image.Image, rng: random.Random) -> Image.Image:
+    """A handheld photo of a page: perspective, uneven lighting, blur, color"""
+    width, height = page.size
+    margin = int(width * 0.06)
+    jitter = lambda: rng.randint(0, margin)
+    quad = (jitter(), jitter(), jitter(), height - jitter(), width - jitter(), height - jitter(), width - jitter(), jitter())
+    warped = page.transform(page.size, Image.QUAD, quad, resample=Image.BILINEAR, fillcolor=200)
+    warped = warped.rotate(rng.uniform(-4, 4), resample=Image.BILINEAR, fillcolor=180)
+
+    pixels = np.asarray(warped, dtype=np.float32)
+    # Light falls off towards one corner
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    lighting = 1.0 - 0.35 * (xs / width * rng.random() + ys / height * rng.random())
+    pixels = pixels * lighting + np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, 6, pixels.shape)
+    gray = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1.2))
+    # Warm white balance, as phone cameras indoors tend to produce
+    return Image.merge("RGB", (gray.point(lambda v: min(255, v + 8)), gray, gray.point(lambda v: v * 0.9)))
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[Union[str, Image.Image]]):
+    """
+    A minimal PDF: string pages get a Helvetica text layer, image pages are
+    embedded as full-page JPEGs with no text layer (like a scanner's output)
+    """
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    def stream(data: bytes, dictionary: str = "") -> bytes:
+        header = f"<< {dictionary} /Length {len(data)} >>" if dictionary else f"<< /Length {len(data)} >>"
+        return f"{header}\nstream\n".encode("latin-1") + data + b"\nendstream"
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1
+    objects.append(b"")  # the page tree, filled in once the pages exist
+    page_ids = []
+    for page in pages:
+        if isinstance(page, str):
+            lines = [f"({_escape(line)}) '" for line in page.split("\n")]
+            content = "BT /F1 10 Tf 13 TL 54 750 Td\n" + "\n".join(lines) + "\nET"
+            contents = add(stream(zlib.compress(content.encode("latin-1", "replace")), "/Filter /FlateDecode"))
+            resources = f"<< /Font << /F1 {font} 0 R >> >>"
+        else:
+            buffer = io.BytesIO()
+            page.convert("L").save(buffer, "JPEG", quality=75)
+            image = add(stream(
+                buffer.getvalue(),
+                f"/Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /DCTDecode",
+            ))
+            contents = add(stream(f"q {PAGE_POINTS[0]} 0 0 {PAGE_POINTS[1]} 0 0 cm /Im0 Do Q".encode("latin-1")))
+            resources = f"<< /XObject << /Im0 {image} 0 R >> >>"
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_POINTS[0]} {PAGE_POINTS[1]}] "
+            f"/Resources {resources} /Contents {contents} 0 R >>".encode("latin-1")
+        ))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+    catalog = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("latin-1"))
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n")
+    xref = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    with open(path, "wb") as f:
+        f.write(output.getvalue())
+
+
+def build_corpus(directory: str, per_kind: int = 2, repeats: int = 2, seed: int = 0) -> List[Dict]:
+    """
+    Write per_kind documents of each kind into directory
+
+    Returns one entry per file: path, kind, page count and the source text.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(per_kind):
+        text = report_text(seed * 1000 + index, repeats)
+        pages = paginate(text)
+
+        path = os.path.join(directory, f"text_{index}.pdf")
+        write_pdf(path, pages)
+        corpus.append({"path": path, "kind": "pdf_text", "pages": len(pages), "text": text})
+
+        path = os.path.join(directory, f"scanned_{index}.pdf")
+        write_pdf(path, [scan(render_page(page), rng) for page in pages])
+        corpus.append({"path": path, "kind": "pdf_scanned", "pages": len(pages), "text": text})
+
+        # Alternate text-layer and scanned pages, as in a faxed cover sheet plus typed notes
+        path = os.path.join(directory, f"mixed_{index}.pdf")
+        write_pdf(path, [page if number % 2 == 0 else scan(render_page(page), rng)
+                         for number, page in enumerate(pages)])
+        corpus.append({"path": path, "kind": "pdf_mixed", "pages": len(pages), "text": text})
+
+        path = os.path.join(directory, f"photo_{index}.jpg")
+        phone_photo(render_page(pages[0], size=(1500, 2000)), rng).save(path, "JPEG", quality=85)
+        corpus.append({"path": path, "kind": "image_photo", "pages": 1, "text": pages[0]})
+    return corpus
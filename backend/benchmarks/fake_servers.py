@@ -0,0 +1,199 @@
+"""
+Local stand-ins for the Gemini and ElevenLabs APIs, so benchmarks run
+offline with latency that is set rather than whatever the network gives
+
+Point the app at them with GEMINI_API_ENDPOINT and ELEVENLABS_BASE_URL.
+"""
+import asyncio
+import json
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+# Roughly what the real tokenizers average on English text
+CHARS_PER_TOKEN = 4
+
+# One 128 kbps, 44.1 kHz MPEG-1 Layer III frame of silence (about 26 ms of audio)
+_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+_MP3_FRAMES_PER_SECOND = 38.28
+
+_SEGMENTS = re.compile(r"Return only a JSON object mapping each segment number.*?Segments:\s*(\{.*\})\s*$", re.S)
+
+
+@dataclass
+class FakeLLMSettings:
+    """How the fake Gemini behaves; change the fields between runs to vary it"""
+    first_token_latency: float = 0.3   # seconds before the first token
+    tokens_per_second: float = 200.0   # generation speed after that
+    max_output_tokens: int = 600       # replies are capped at this length
+    chunk_tokens: int = 20             # tokens per streamed chunk
+
+
+@dataclass
+class FakeTTSSettings:
+    """How the fake ElevenLabs behaves"""
+    first_byte_latency: float = 0.25    # seconds before the first audio
+    realtime_factor: float = 10.0       # seconds of audio produced per second
+    chars_per_second: float = 15.0      # speaking rate used to size the audio
+
+
+def _reply_for(prompt: str, settings: FakeLLMSettings) -> str:
+    """
+    A plausible reply: segment translations come back as the JSON object the
+    translation prompt asks for, anything else as prose sized to the prompt
+    """
+    match = _SEGMENTS.search(prompt)
+    if match:
+        try:
+            segments = json.loads(match.group(1))
+            return json.dumps({number: f"[translated] {text}" for number, text in segments.items()},
+                              ensure_ascii=False)
+        except ValueError:
+            pass
+    # Prose replies echo the end of the prompt, where the document usually is
+    max_chars = settings.max_output_tokens * CHARS_PER_TOKEN
+    body = prompt[-max_chars:].strip() or "OK"
+    return "**Summary**\n\n" + body
+
+
+def _usage(prompt: str, reply: str) -> dict:
+    prompt_tokens = max(1, len(prompt) // CHARS_PER_TOKEN)
+    reply_tokens = max(1, len(reply) // CHARS_PER_TOKEN)
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": reply_tokens,
+        "totalTokenCount": prompt_tokens + reply_tokens,
+    }
+
+
+def _candidate(text: str, finished: bool) -> dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return candidate
+
+
+def _prompt_text(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def create_gemini_app(settings: FakeLLMSettings) -> FastAPI:
+    """generateContent and streamGenerateContent, in both JSON-array and SSE stream forms"""
+    app = FastAPI()
+    app.state.requests = 0
+
+    async def chunks(prompt: str) -> AsyncIterator[dict]:
+        reply = _reply_for(prompt, settings)
+        step = settings.chunk_tokens * CHARS_PER_TOKEN
+        pieces: List[str] = [reply[i:i + step] for i in range(0, len(reply), step)] or [""]
+        await asyncio.sleep(settings.first_token_latency)
+        for index, piece in enumerate(pieces):
+            if index:
+                await asyncio.sleep(settings.chunk_tokens / settings.tokens_per_second)
+            last = index == len(pieces) - 1
+            chunk = {"candidates": [_candidate(piece, last)]}
+            if last:
+                chunk["usageMetadata"] = _usage(prompt, reply)
+            yield chunk
+
+    @app.post("/{version}/models/{target}")
+    async def generate(version: str, target: str, request: Request):
+        app.state.requests += 1
+        _, _, method = target.partition(":")
+        prompt = _prompt_text(await request.json())
+
+        if method == "generateContent":
+            reply = _reply_for(prompt, settings)
+            tokens = len(reply) / CHARS_PER_TOKEN
+            await asyncio.sleep(settings.first_token_latency + tokens / settings.tokens_per_second)
+            return {"candidates": [_candidate(reply, True)], "usageMetadata": _usage(prompt, reply)}
+
+        if method == "streamGenerateContent":
+            if request.query_params.get("alt") == "sse":
+                async def sse():
+                    async for chunk in chunks(prompt):
+                        yield f"data: {json.dumps(chunk)}\r\n\r\n"
+                return StreamingResponse(sse(), media_type="text/event-stream")
+
+            # The SDK's REST transport reads the stream as one JSON array
+            async def array():
+                separator = "["
+                async for chunk in chunks(prompt):
+                    yield separator + json.dumps(chunk)
+                    separator = ",\r\n"
+                yield "]"
+            return StreamingResponse(array(), media_type="application/json")
+
+        return Response(status_code=404)
+
+    return app
+
+
+def create_elevenlabs_app(settings: FakeTTSSettings) -> FastAPI:
+    """text-to-speech (whole and streamed) plus the voice list, returning silent MPEG audio"""
+    app = FastAPI()
+    app.state.requests = 0
+
+    async def audio(text: str) -> AsyncIterator[bytes]:
+        frames = max(1, int(len(text) / settings.chars_per_second * _MP3_FRAMES_PER_SECOND))
+        # Released in quarter-second batches, at realtime_factor times real time
+        batch = max(1, int(_MP3_FRAMES_PER_SECOND / 4))
+        await asyncio.sleep(settings.first_byte_latency)
+        for start in range(0, frames, batch):
+            count = min(batch, frames - start)
+            if start:
+                await asyncio.sleep(count / _MP3_FRAMES_PER_SECOND / settings.realtime_factor)
+            yield _MP3_FRAME * count
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech(voice_id: str, request: Request):
+        app.state.requests += 1
+        text = (await request.json()).get("text", "")
+        return StreamingResponse(audio(text), media_type="audio/mpeg")
+
+    @app.get("/v1/voices")
+    async def voices():
+        return {"voices": []}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on a daemon thread"""
+
+    def __init__(self, app, port: Optional[int] = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self, timeout: float = 10.0) -> "BackgroundServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Fake server on port {self.port} did not start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
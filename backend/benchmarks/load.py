@@ -0,0 +1,204 @@
+"""
+Closed-loop load generation against a running app, one endpoint at a time
+"""
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+SAMPLE_QUESTION = "What medications should I take and how often?"
+
+
+@dataclass
+class Scenario:
+    """
+    One endpoint under load: build(index, cold) returns the keyword
+    arguments for httpx's request(); cold requests must not hit any cache.
+    variants is how many distinct warm requests build() cycles through.
+    """
+    name: str
+    path: str
+    build: Callable[[int, bool], dict]
+    method: str = "POST"
+    variants: int = 1
+
+
+def _nonce(cold: bool) -> str:
+    return f"\nReference: {uuid.uuid4().hex}" if cold else ""
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def default_scenarios(corpus: List[Dict], language: str = "spanish") -> List[Scenario]:
+    """upload, simplify, ask, translate and text-to-speech, driven by the corpus"""
+    files = [(entry, _read(entry["path"])) for entry in corpus]
+    text = corpus[0]["text"]
+    # Speech is benchmarked on a paragraph, about what a simplified section reads as
+    speech_text = " ".join(text.split("\n")[3:9])
+
+    def upload(index: int, cold: bool) -> dict:
+        entry, content = files[index % len(files)]
+        if cold:
+            # Trailing bytes after %%EOF or a JPEG's end marker change the digest, not the document
+            content += f"\n%{uuid.uuid4().hex}\n".encode("ascii")
+        content_type = "image/jpeg" if entry["path"].endswith(".jpg") else "application/pdf"
+        return {"files": {"file": (os.path.basename(entry["path"]), content, content_type)}}
+
+    return [
+        Scenario("upload", "/upload", upload, variants=len(files)),
+        Scenario("simplify", "/simplify", lambda index, cold: {
+            "json": {"text": text + _nonce(cold), "include_original_text": False}}),
+        Scenario("ask", "/ask", lambda index, cold: {
+            "json": {"question": SAMPLE_QUESTION, "context": text + _nonce(cold)}}),
+        Scenario("translate", "/translate", lambda index, cold: {
+            "json": {"text": text + _nonce(cold), "target_language": language, "include_original_text": False}}),
+        Scenario("tts", "/text-to-speech", lambda index, cold: {
+            "json": {"text": speech_text + _nonce(cold)}, "headers": {"Accept": "audio/mpeg"}}),
+    ]
+
+
+def _status_kb(pid: int) -> Dict[str, int]:
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def _descendants(pid: int) -> List[int]:
+    """Every process below pid, from each thread's children list (Linux 3.5+)"""
+    found: List[int] = []
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return found
+    for task in tasks:
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children = [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+        for child in children:
+            found.append(child)
+            found.extend(_descendants(child))
+    return found
+
+
+def read_rss_kb(pid: int) -> Dict[str, int]:
+    """
+    Current and peak resident set size of a process and everything it has
+    spawned (the extraction pool's workers, say), from /proc (Linux only)
+
+    rss_kb and peak_rss_kb cover the whole tree; the children_ fields are
+    the descendants alone. Peaks are summed per process, so the tree's
+    peak is an upper bound: the processes need not have peaked together.
+    """
+    parent = _status_kb(pid)
+    if not parent:
+        return {}
+    children = [_status_kb(child) for child in _descendants(pid)]
+    children_rss = sum(usage.get("VmRSS", 0) for usage in children)
+    children_peak = sum(usage.get("VmHWM", 0) for usage in children)
+    return {
+        "rss_kb": parent.get("VmRSS", 0) + children_rss,
+        "peak_rss_kb": parent.get("VmHWM", 0) + children_peak,
+        "children": len(children),
+        "children_rss_kb": children_rss,
+        "children_peak_rss_kb": children_peak,
+    }
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Latency percentiles in milliseconds plus throughput"""
+    result = {"requests": len(latencies) + errors, "errors": errors, "seconds": round(elapsed, 3),
+              "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0}
+    if latencies:
+        values = np.array(latencies) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        result.update(p50_ms=round(float(p50), 1), p95_ms=round(float(p95), 1),
+                      p99_ms=round(float(p99), 1), mean_ms=round(float(values.mean()), 1),
+                      max_ms=round(float(values.max()), 1))
+    return result
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int,
+                       cold: bool = True, pid: Optional[int] = None, warmup: Optional[int] = None) -> dict:
+    """
+    Send requests in total, concurrency at a time, and summarize them
+
+    Each of the concurrency workers sends its next request as soon as the
+    previous one finishes. The warmup requests are sent first and left out
+    of the figures; warm runs default to one per variant, so every measured
+    request can be a cache hit. With a pid, the app's RSS is sampled
+    throughout.
+    """
+    if warmup is None:
+        warmup = 1 if cold else scenario.variants
+    for index in range(warmup):
+        await client.request(scenario.method, scenario.path, **scenario.build(index, cold))
+
+    latencies: List[float] = []
+    errors = 0
+    statuses: Dict[str, int] = {}
+    next_index = warmup
+    rss_samples: List[int] = []
+    finished = asyncio.Event()
+
+    async def sample_rss():
+        while not finished.is_set():
+            rss = read_rss_kb(pid).get("rss_kb")
+            if rss:
+                rss_samples.append(rss)
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=0.2)
+            except asyncio.TimeoutError:
+                pass
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < warmup + requests:
+            index = next_index
+            next_index += 1
+            kwargs = scenario.build(index, cold)
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, scenario.path, **kwargs)
+                await response.aread()
+                status = str(response.status_code)
+                if response.is_success:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+                errors += 1
+            statuses[status] = statuses.get(status, 0) + 1
+
+    sampler = asyncio.ensure_future(sample_rss()) if pid else None
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    finished.set()
+    if sampler:
+        await sampler
+
+    result = summarize(latencies, errors, elapsed)
+    result.update(concurrency=concurrency, cache="cold" if cold else "warm", statuses=statuses)
+    if pid:
+        result.update(read_rss_kb(pid))
+        if rss_samples:
+            result["max_sampled_rss_kb"] = max(rss_samples)
+    return result
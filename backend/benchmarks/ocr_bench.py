@@ -0,0 +1,87 @@
+"""
+Micro-benchmarks of each OCRService extraction path, in process
+"""
+import asyncio
+import difflib
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.document_source import DocumentSource
+
+
+def _accuracy(extracted: str, expected: str) -> float:
+    """Character-level similarity of extracted text to the source text (0.0 - 1.0)"""
+    normalize = lambda text: " ".join(text.split())
+    return round(difflib.SequenceMatcher(None, normalize(extracted), normalize(expected), autojunk=False).ratio(), 3)
+
+
+def _paths_for(kind: str) -> List[str]:
+    if kind == "image_photo":
+        return ["extract_text", "_extract_from_image"]
+    return ["extract_text", "_extract_from_pdf", "_extract_from_pdf_ocr"]
+
+
+async def _time_path(ocr_service, path: str, source: DocumentSource, content_type: str,
+                     expected: str, rounds: int) -> dict:
+    timings = []
+    text = ""
+    for _ in range(rounds):
+        started = time.perf_counter()
+        if path == "extract_text":
+            text = await ocr_service.extract_text(source, content_type)
+        else:
+            text = await getattr(ocr_service, path)(source)
+        timings.append(time.perf_counter() - started)
+    values = np.array(timings) * 1000
+    return {
+        "rounds": rounds,
+        "median_ms": round(float(np.median(values)), 1),
+        "min_ms": round(float(values.min()), 1),
+        "max_ms": round(float(values.max()), 1),
+        "characters": len(text),
+        "accuracy": _accuracy(text, expected),
+    }
+
+
+async def run_ocr_benchmarks(corpus: List[Dict], rounds: int = 3, workers: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Time every extraction path on every corpus document
+
+    Results are keyed "<kind>/<file name>" and then by path. The extraction
+    cache is disabled so every round does the full work; the first call
+    warms up the pool and tesseract and is not counted. A document that
+    fails keeps the paths timed so far plus an "error", and the run goes on.
+    """
+    os.environ["OCR_CACHE_ENTRIES"] = "0"
+    os.environ.pop("OCR_CACHE_DIR", None)
+    # Imported here so the environment above applies
+    from services.executor import ExtractionExecutor
+    from services.ocr_service import OCRService
+
+    ocr_service = OCRService(ExtractionExecutor(max_workers=workers) if workers else None)
+    results: Dict[str, dict] = {}
+    try:
+        for entry in corpus:
+            content_type = "image/jpeg" if entry["kind"] == "image_photo" else "application/pdf"
+            document = {"pages": entry["pages"]}
+            try:
+                source = DocumentSource(path=entry["path"])
+                document["bytes"] = source.size
+                await ocr_service.extract_text(source, content_type)
+                for path in _paths_for(entry["kind"]):
+                    document[path] = await _time_path(ocr_service, path, source, content_type, entry["text"], rounds)
+            except Exception as e:
+                document["error"] = f"{type(e).__name__}: {e}"
+                print(f"OCR benchmark of {entry['path']} failed: {document['error']}", file=sys.stderr)
+            results[f"{entry['kind']}/{os.path.basename(entry['path'])}"] = document
+    finally:
+        ocr_service.executor.shutdown()
+    return results
+
+
+def run(corpus: List[Dict], rounds: int = 3, workers: Optional[int] = None) -> Dict[str, dict]:
+    return asyncio.run(run_ocr_benchmarks(corpus, rounds, workers))
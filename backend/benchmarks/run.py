@@ -0,0 +1,285 @@
+"""
+End-to-end benchmarks, offline and reproducible
+
+    python -m benchmarks.run -o before.json
+    python -m benchmarks.run -o after.json
+    python -m benchmarks.run compare before.json after.json
+
+Builds a synthetic corpus, starts local Gemini and ElevenLabs stand-ins,
+runs the app against them in a subprocess and load-tests each endpoint,
+then times every OCRService path in process. Results, with the git
+commit and settings they were measured with, are written as JSON.
+
+Cold runs disable the app's caches and make every request unique; warm
+runs repeat requests that were sent once before measuring.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks import ocr_bench
+from benchmarks.corpus import build_corpus
+from benchmarks.fake_servers import (BackgroundServer, FakeLLMSettings, FakeTTSSettings, create_elevenlabs_app,
+                                     create_gemini_app, free_port)
+from benchmarks.load import default_scenarios, run_scenario
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = ("upload", "simplify", "ask", "translate", "tts")
+
+# Caches turned off for cold runs, so every request does the full work
+_COLD_ENV = {
+    "OCR_CACHE_ENTRIES": "0",
+    "RESPONSE_CACHE_ENTRIES": "0",
+    "TRANSLATION_MEMORY_ENTRIES": "0",
+    "TTS_CACHE_MAX_MB": "0",
+}
+
+# Percentile and throughput fields compared between runs; True when higher is better
+_COMPARED = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput_rps": True,
+             "peak_rss_kb": False, "median_ms": False}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+class AppProcess:
+    """The app under uvicorn in a subprocess, pointed at the fake APIs"""
+
+    def __init__(self, env: Dict[str, str], log_path: str):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._log = open(log_path, "ab")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+
+    async def wait_ready(self, client: httpx.AsyncClient, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"App exited with status {self.process.returncode}; see {self._log.name}")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+        raise RuntimeError(f"App did not become healthy within {timeout:.0f}s; see {self._log.name}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._log.close()
+
+
+async def run_load(args, corpus: List[Dict], work_dir: str, gemini_url: str, elevenlabs_url: str) -> Dict[str, dict]:
+    """Load-test each endpoint, with a fresh app per cache mode"""
+    results: Dict[str, dict] = {}
+    scenarios = [scenario for scenario in default_scenarios(corpus, args.language) if scenario.name in args.endpoints]
+    for mode in args.cache:
+        cold = mode == "cold"
+        mode_dir = os.path.join(work_dir, mode)
+        env = {
+            "GEMINI_API_KEY": "benchmark",
+            "GEMINI_API_ENDPOINT": gemini_url,
+            "ELEVENLABS_API_KEY": "benchmark",
+            "ELEVENLABS_BASE_URL": elevenlabs_url,
+            # Keep everything the app writes inside the work directory
+            "TTS_CACHE_DIR": os.path.join(mode_dir, "tts"),
+            "JOBS_DIR": os.path.join(mode_dir, "jobs"),
+            "OCR_CACHE_DIR": "",
+            "RESPONSE_CACHE_PATH": "",
+            "TRANSLATION_MEMORY_PATH": "",
+            "REPORT_STORE_DIR": "",
+            **(_COLD_ENV if cold else {}),
+        }
+        if args.workers:
+            env["OCR_WORKERS"] = str(args.workers)
+        app = AppProcess(env, os.path.join(work_dir, "app.log"))
+        try:
+            timeout = httpx.Timeout(args.timeout)
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=app.url, timeout=timeout, limits=limits) as client:
+                await app.wait_ready(client)
+                for scenario in scenarios:
+                    print(f"{mode:>4} {scenario.name}: {args.requests} requests, {args.concurrency} at a time",
+                          file=sys.stderr)
+                    result = await run_scenario(client, scenario, args.requests, args.concurrency,
+                                                cold=cold, pid=app.process.pid)
+                    results[f"{scenario.name}/{mode}"] = result
+                    print(f"     p50 {result.get('p50_ms')} ms, p95 {result.get('p95_ms')} ms, "
+                          f"{result['throughput_rps']} req/s, {result['errors']} errors", file=sys.stderr)
+        finally:
+            app.stop()
+    return results
+
+
+def run(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix="medlens-bench-")
+    try:
+        corpus = build_corpus(os.path.join(work_dir, "corpus"), per_kind=args.per_kind, repeats=args.repeats,
+                              seed=args.seed)
+        llm_settings = FakeLLMSettings(first_token_latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second)
+        tts_settings = FakeTTSSettings(first_byte_latency=args.tts_latency, realtime_factor=args.tts_realtime_factor)
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu": _cpu_model(),
+                "cpu_count": os.cpu_count(),
+                "params": {key: value for key, value in vars(args).items() if key != "command"},
+                "corpus": [{"kind": entry["kind"], "file": os.path.basename(entry["path"]), "pages": entry["pages"],
+                            "bytes": os.path.getsize(entry["path"])} for entry in corpus],
+            },
+        }
+
+        if not args.skip_load:
+            gemini = BackgroundServer(create_gemini_app(llm_settings)).start()
+            elevenlabs = BackgroundServer(create_elevenlabs_app(tts_settings)).start()
+            try:
+                report["load"] = asyncio.run(run_load(args, corpus, work_dir, gemini.url, elevenlabs.url))
+            finally:
+                gemini.stop()
+                elevenlabs.stop()
+
+        if not args.skip_ocr:
+            print(f"OCR paths: {len(corpus)} documents, {args.ocr_rounds} rounds each", file=sys.stderr)
+            report["ocr"] = ocr_bench.run(corpus, args.ocr_rounds, args.workers)
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+        return report
+    finally:
+        if args.keep:
+            print(f"Corpus and app log kept in {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _flatten(report: dict) -> Dict[str, float]:
+    """Compared figures keyed "load/upload/cold/p95_ms" or "ocr/<document>/<path>/median_ms" """
+    figures = {}
+    for name, result in report.get("load", {}).items():
+        for field in _COMPARED:
+            if field in result:
+                figures[f"load/{name}/{field}"] = result[field]
+    for document, paths in report.get("ocr", {}).items():
+        for path, result in paths.items():
+            if isinstance(result, dict) and "median_ms" in result:
+                figures[f"ocr/{document}/{path}/median_ms"] = result["median_ms"]
+    return figures
+
+
+def compare(args) -> int:
+    """Print the change in every figure; exits 1 if any regressed by more than the threshold"""
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    old_figures, new_figures = _flatten(old), _flatten(new)
+
+    print(f"old: {old['meta'].get('git_commit')} ({old['meta'].get('timestamp')})")
+    print(f"new: {new['meta'].get('git_commit')} ({new['meta'].get('timestamp')})")
+    regressions = 0
+    for key in sorted(old_figures.keys() & new_figures.keys()):
+        before, after = old_figures[key], new_figures[key]
+        change = (after - before) / before * 100 if before else 0.0
+        higher_is_better = _COMPARED[key.rsplit("/", 1)[1]]
+        regressed = (-change if higher_is_better else change) > args.threshold
+        regressions += regressed
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{key:<60} {before:>12} -> {after:>12} ({change:+.1f}%){marker}")
+    for key in sorted(old_figures.keys() ^ new_figures.keys()):
+        print(f"{key:<60} only in {'old' if key in old_figures else 'new'}")
+    return 1 if regressions else 0
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend offline against local API stand-ins")
+    commands = parser.add_subparsers(dest="command")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="percent change counted as a regression")
+
+    parser.add_argument("-o", "--output", default="benchmark-results.json", help="results file")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated endpoints to load-test")
+    parser.add_argument("--cache", default="cold,warm", help="cache modes to run: cold, warm or both")
+    parser.add_argument("--requests", type=int, default=40, help="measured requests per endpoint and mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds before a request is abandoned")
+    parser.add_argument("--language", default="spanish", help="target language for /translate")
+    parser.add_argument("--workers", type=int, help="extraction pool size (OCR_WORKERS)")
+    parser.add_argument("--per-kind", type=int, default=2, help="documents of each kind in the corpus")
+    parser.add_argument("--repeats", type=int, default=2, help="report length, in repeats of the template")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake Gemini time to first token (s)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0, help="fake Gemini output rate")
+    parser.add_argument("--tts-latency", type=float, default=0.25, help="fake ElevenLabs time to first byte (s)")
+    parser.add_argument("--tts-realtime-factor", type=float, default=10.0,
+                        help="seconds of audio the fake ElevenLabs produces per second")
+    parser.add_argument("--ocr-rounds", type=int, default=3, help="timed rounds per OCR path and document")
+    parser.add_argument("--skip-load", action="store_true", help="only run the OCR micro-benchmarks")
+    parser.add_argument("--skip-ocr", action="store_true", help="only run the endpoint load tests")
+    parser.add_argument("--keep", action="store_true", help="keep the corpus and app log")
+    args = parser.parse_args(argv)
+
+    if args.command != "compare":
+        args.endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+        unknown = set(args.endpoints) - set(ENDPOINTS)
+        if unknown:
+            parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+        args.cache = [mode.strip() for mode in args.cache.split(",") if mode.strip()]
+        if set(args.cache) - {"cold", "warm"}:
+            parser.error("--cache takes cold, warm or cold,warm")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.command == "compare":
+        sys.exit(compare(args))
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
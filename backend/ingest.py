@@ -0,0 +1,333 @@
+"""
+Batch ingestion of report files, outside the web app
+
+    python ingest.py reports/ -o results.jsonl --simplify --translate spanish,urdu
+
+Walks a directory (or reads a manifest of paths), extracts text with
+OCRService across the extraction process pool, optionally simplifies and
+translates it with bounded LLM concurrency, and writes one record per
+document to JSONL or Parquet as it goes. Paths written without an error
+are appended to a checkpoint file, so an interrupted run picks up where it
+stopped and a rerun retries the documents that failed (their error records
+stay in the output; the latest record for a path wins).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Iterator, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from services.document_source import DocumentSource
+from services.executor import ExtractionQueueFull
+from services.upload_reader import sniff_content_type
+
+logger = logging.getLogger("ingest")
+
+SUPPORTED_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg")
+
+# Output record fields and their Parquet types; translations are stored as JSON text
+RECORD_FIELDS = {
+    "path": "string",
+    "error": "string",
+    "report_id": "string",
+    "content_type": "string",
+    "pages": "int64",
+    "text_length": "int64",
+    "extracted_text": "string",
+    "simplified_text": "string",
+    "translations": "string",
+    "seconds": "float64",
+}
+
+
+def iter_paths(inputs: List[str], manifest: Optional[str]) -> Iterator[str]:
+    """Report files under each input directory (or the files themselves), then the manifest's"""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield item
+    if manifest:
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                # Either a bare path or a JSON object with a "path" field
+                yield json.loads(line)["path"] if line.startswith("{") else line
+
+
+class Checkpoint:
+    """Paths already written to the output without an error, one per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, paths: List[str]):
+        for path in paths:
+            self._file.write(path + "\n")
+            self.done.add(path)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class JSONLWriter:
+    """Appends one JSON object per line; every record is durable once written"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict) -> List[str]:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        return [record["path"]]
+
+    def close(self) -> List[str]:
+        self._file.close()
+        return []
+
+
+class ParquetWriter:
+    """
+    Writes records as numbered part files in a directory, batch_size at a
+    time, so a resumed run adds parts instead of rewriting earlier ones
+
+    Every part has the RECORD_FIELDS schema, whichever fields its first
+    record happens to have (an error record has no text, for example).
+    """
+
+    def __init__(self, directory: str, batch_size: int):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self.schema = pa.schema([(name, pa.type_for_alias(kind)) for name, kind in RECORD_FIELDS.items()])
+        self.directory = directory
+        self.batch_size = batch_size
+        self._pending: List[dict] = []
+        os.makedirs(directory, exist_ok=True)
+        self._part = len([name for name in os.listdir(directory) if name.endswith(".parquet")])
+
+    def write(self, record: dict) -> List[str]:
+        # Nested values vary by document, so they are stored as JSON text
+        row = {key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+               for key, value in record.items()}
+        self._pending.append(row)
+        return self._flush() if len(self._pending) >= self.batch_size else []
+
+    def _flush(self) -> List[str]:
+        if not self._pending:
+            return []
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(self._pending, schema=self.schema)
+        pq.write_table(table, os.path.join(self.directory, f"part-{self._part:05d}.parquet"))
+        self._part += 1
+        paths = [row["path"] for row in self._pending]
+        self._pending = []
+        return paths
+
+    def close(self) -> List[str]:
+        return self._flush()
+
+
+class Throughput:
+    """Running totals for progress lines and the final summary"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.documents = 0
+        self.failed = 0
+        self.pages = 0
+
+    def add(self, record: dict):
+        self.documents += 1
+        self.pages += record.get("pages") or 0
+        if record.get("error"):
+            self.failed += 1
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "documents": self.documents,
+            "failed": self.failed,
+            "pages": self.pages,
+            "seconds": round(elapsed, 1),
+            "documents_per_minute": round(self.documents / elapsed * 60, 2) if elapsed else 0.0,
+            "pages_per_second": round(self.pages / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+async def process_document(path: str, args, ocr_service, ai_service, translation_service) -> dict:
+    """Extract (and optionally simplify and translate) one file into an output record"""
+    started = time.perf_counter()
+    record = {"path": path, "error": None}
+    pages = {"total": 0}
+
+    def progress(pages_done: int, pages_total: int):
+        pages["total"] = pages_total
+
+    try:
+        with open(path, "rb") as f:
+            content_type = sniff_content_type(f.read(2048))
+        if content_type is None:
+            raise ValueError("Unsupported file type")
+        # The pool maps the file in place; nothing is copied into memory here
+        source = DocumentSource(path=os.path.abspath(path))
+        digest = await asyncio.to_thread(source.sha256)
+        record.update(report_id=digest, content_type=content_type)
+
+        while True:
+            try:
+                extracted_text = await ocr_service.extract_text(
+                    source, content_type, content_digest=digest, progress=progress
+                )
+                break
+            except ExtractionQueueFull as e:
+                await asyncio.sleep(e.retry_after)
+        record.update(pages=pages["total"], text_length=len(extracted_text), extracted_text=extracted_text)
+        # OCRService returns a sample report when extraction fails outright
+        if ocr_service.is_sample_text(extracted_text):
+            raise ValueError("Extraction failed")
+
+        # The services answer with demo text when Gemini fails; that is an error here, not output
+        if args.simplify or args.translate:
+            simplified_text = await ai_service.simplify_medical_text(extracted_text)
+            if ai_service.is_demo_text(simplified_text):
+                raise ValueError("Simplification failed")
+            record["simplified_text"] = simplified_text
+            if args.translate:
+                translations = {
+                    language: translated
+                    async for language, translated in translation_service.translate_many(simplified_text, args.translate)
+                }
+                failed = [language for language, translated in translations.items()
+                          if translation_service.is_demo_translation(translated, simplified_text)]
+                record["translations"] = {language: translated for language, translated in translations.items()
+                                          if language not in failed}
+                if failed:
+                    raise ValueError(f"Translation failed: {', '.join(failed)}")
+    except Exception as e:
+        logger.error(f"Failed to process {path}: {str(e)}")
+        record["error"] = str(e)
+
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+async def run(args) -> dict:
+    # Imported here so the environment set from the command line applies to them
+    from services.ai_service import AIService
+    from services.llm_client import get_llm_client
+    from services.ocr_service import OCRService
+    from services.translation_service import TranslationService
+
+    ocr_service = OCRService()
+    llm_client = get_llm_client()
+    ai_service = AIService(llm_client)
+    translation_service = TranslationService(llm_client)
+    unsupported = [language for language in args.translate if language not in translation_service.language_names]
+    if unsupported:
+        raise SystemExit(f"Unsupported languages: {', '.join(unsupported)}")
+    if (args.simplify or args.translate) and not ai_service.is_configured():
+        raise SystemExit("Simplification and translation need GEMINI_API_KEY")
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.output}.checkpoint")
+    if args.output.endswith(".parquet"):
+        writer = ParquetWriter(args.output, args.batch_size)
+    else:
+        writer = JSONLWriter(args.output)
+    if checkpoint.done:
+        logger.info(f"Resuming: {len(checkpoint.done)} documents already written")
+
+    paths = (path for path in iter_paths(args.inputs, args.manifest) if path not in checkpoint.done)
+    throughput = Throughput()
+    last_report = time.perf_counter()
+    # Written but not checkpointed, so the next run tries them again
+    failed: Set[str] = set()
+
+    def finished(written: List[str]) -> List[str]:
+        return [path for path in written if path not in failed]
+
+    async def worker():
+        nonlocal last_report
+        for path in paths:
+            record = await process_document(path, args, ocr_service, ai_service, translation_service)
+            if record["error"] is not None:
+                failed.add(path)
+            checkpoint.record(finished(writer.write(record)))
+            throughput.add(record)
+            if time.perf_counter() - last_report >= args.report_every:
+                last_report = time.perf_counter()
+                logger.info(f"Progress: {throughput.summary()}")
+
+    try:
+        # Workers share one path iterator, so at most args.concurrency documents are in flight
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    finally:
+        checkpoint.record(finished(writer.close()))
+        checkpoint.close()
+        ocr_service.executor.shutdown()
+    return throughput.summary()
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Extract, simplify and translate folders of medical reports")
+    parser.add_argument("inputs", nargs="*", help="directories or files to ingest")
+    parser.add_argument("--manifest", help="file listing one path (or {\"path\": ...} JSON object) per line")
+    parser.add_argument("-o", "--output", required=True,
+                        help="results file (.jsonl) or directory of Parquet parts (.parquet)")
+    parser.add_argument("--checkpoint", help="finished-path list for resuming (default: <output>.checkpoint)")
+    parser.add_argument("--simplify", action="store_true", help="also simplify each report")
+    parser.add_argument("--translate", default="",
+                        help="comma-separated languages to translate the simplified report into")
+    parser.add_argument("--workers", type=int, help="extraction pool size (OCR_WORKERS)")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="documents in flight (default: twice the extraction pool size)")
+    parser.add_argument("--llm-concurrency", type=int, help="Gemini requests in flight (LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--batch-size", type=int, default=500, help="records per Parquet part file")
+    parser.add_argument("--report-every", type=float, default=30.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error("give at least one input directory/file or --manifest")
+    args.translate = [language.strip().lower() for language in args.translate.split(",") if language.strip()]
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = parse_args(argv)
+
+    if args.workers:
+        os.environ["OCR_WORKERS"] = str(args.workers)
+    if args.llm_concurrency:
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_concurrency)
+    workers = int(os.getenv("OCR_WORKERS") or 0) or (os.cpu_count() or 1)
+    args.concurrency = args.concurrency or 2 * workers
+    # Documents wait in this process rather than being turned away by admission control
+    os.environ["OCR_QUEUE_LIMIT"] = str(max(int(os.getenv("OCR_QUEUE_LIMIT", "8")), args.concurrency))
+
+    summary = asyncio.run(run(args))
+    logger.info(f"Done: {json.dumps(summary)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,42 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.datastructures import Headers
 import os
+import asyncio
 from dotenv import load_dotenv
 import logging
-from typing import Optional, List
+from typing import Dict, Optional, List
 import json
+import shutil
+import time
+import uuid
 
 from services.ocr_service import OCRService
 from services.ai_service import AIService
+from services.llm_client import get_llm_client
 from services.translation_service import TranslationService
 from services.voice_service import VoiceService
+from services.executor import ExtractionQueueFull
+from services.upload_reader import UploadReader, UploadRejected
+from services.retrieval import ReportIndexStore
+from services.report_store import ReportSession, ReportSessionStore
+from services.local_tts import audio_media_type
+from services.document_source import DocumentSource
+from services.job_queue import JOB_STAGES, JobContext, JobQueue
+from services.metrics import (
+    HTTP_IN_FLIGHT, HTTP_SECONDS, registry, server_timing_header, start_request_timing, timed
+)
 from models.schemas import (
     SimplifyRequest, 
     SimplifyResponse, 
     QAResponse, 
     TranslationRequest,
-    TranslationResponse
+    TranslationResponse,
+    BatchTranslationRequest,
+    BatchTranslationResponse,
+    PipelineRequest,
+    PipelineResponse
 )
 
 # Load environment variables
@@ -44,9 +64,82 @@ app.add_middleware(
 
 # Initialize services
 ocr_service = OCRService()
-ai_service = AIService()
-translation_service = TranslationService()
+llm_client = get_llm_client()
+ai_service = AIService(llm_client)
+translation_service = TranslationService(llm_client)
 voice_service = VoiceService()
+upload_reader = UploadReader(spill_threshold=ocr_service.spill_threshold)
+report_indexes = ReportIndexStore()
+report_store = ReportSessionStore()
+
+class UploadSizeLimit:
+    """
+    Refuse oversized uploads before the multipart parser spools them
+
+    The declared Content-Length is checked up front; a body sent without
+    one (chunked) is counted as it arrives and cut off with a 413 as soon
+    as it passes the limit.
+    """
+
+    def __init__(self, app, paths=("/upload", "/jobs")):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        try:
+            upload_reader.check_declared_size(Headers(scope=scope).get("content-length"))
+        except UploadRejected as e:
+            response = JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                try:
+                    upload_reader.check_received_size(received)
+                except UploadRejected as e:
+                    # FastAPI re-raises HTTPExceptions from body parsing as they are
+                    raise HTTPException(status_code=e.status_code, detail=e.detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadSizeLimit)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Time every request, and list the stages it ran in a Server-Timing header
+
+    Streamed responses send their headers before the body is generated, so
+    their header only covers the work done before streaming started.
+    """
+    token = start_request_timing()
+    started = time.perf_counter()
+    try:
+        with HTTP_IN_FLIGHT.track():
+            response = await call_next(request)
+    finally:
+        elapsed = time.perf_counter() - started
+        server_timing = server_timing_header(token, elapsed)
+    # The route template ("/jobs/{job_id}"), so IDs do not each become a series
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_SECONDS.observe(elapsed, method=request.method, route=route, status=str(response.status_code))
+    response.headers["Server-Timing"] = server_timing
+    return response
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """Stop background worker pools"""
+    ocr_service.executor.shutdown()
 
 @app.get("/")
 async def root():
@@ -62,10 +155,58 @@ async def health_check():
             "ocr": "ready",
             "ai": "ready" if ai_service.is_configured() else "not_configured",
             "translation": "ready" if translation_service.is_configured() else "not_configured",
-            "voice": "ready" if voice_service.is_configured() else "not_configured"
-        }
+            "voice": "ready" if voice_service.is_configured() else "not_configured",
+            "local_voice": voice_service.local_engine.backend or "not_configured"
+        },
+        "extraction": ocr_service.executor.stats(),
+        "extraction_cache": ocr_service.cache.stats(),
+        "llm": llm_client.stats(),
+        "response_cache": ai_service.cache.stats(),
+        "translation_memory": translation_service.memory.stats(),
+        "report_sessions": report_store.stats(),
+        "audio_cache": voice_service.audio_cache.stats(),
+        "jobs": job_queue.stats() if job_queue else None
     }
 
+def _service_metrics():
+    """In-flight work, queue depth and cache counters, read from the services' stats on each scrape"""
+    extraction = ocr_service.executor.stats()
+    llm = llm_client.stats()
+    jobs = job_queue.stats() if job_queue else {"running": 0, "queued": 0}
+    yield "in_flight", "gauge", "Work in progress right now", [
+        ("", {"work": "extraction"}, extraction["in_flight"]),
+        ("", {"work": "llm"}, llm["in_flight"]),
+        ("", {"work": "jobs"}, jobs["running"]),
+    ]
+    yield "queue_depth", "gauge", "Work waiting for a free worker", [
+        ("", {"queue": "extraction"}, extraction["queued"]),
+        ("", {"queue": "jobs"}, jobs["queued"]),
+    ]
+    caches = {
+        "extraction": ocr_service.cache.stats(),
+        "response": ai_service.cache.stats(),
+        "translation_memory": translation_service.memory.stats(),
+        "report_sessions": report_store.stats(),
+        "audio": voice_service.audio_cache.stats(),
+    }
+    yield "cache_lookups_total", "counter", "Cache lookups, by cache and result", [
+        ("", {"cache": name, "result": result}, stats[field])
+        for name, stats in caches.items()
+        for result, field in (("hit", "hits"), ("miss", "misses"))
+    ]
+    yield "extraction_rejected_total", "counter", "Uploads turned away by a full extraction pool", [
+        ("", {}, extraction["rejected"]),
+    ]
+    yield "llm_retries_total", "counter", "Gemini calls retried after a transient error", [("", {}, llm["retries"])]
+    yield "llm_failures_total", "counter", "Gemini calls that failed after all retries", [("", {}, llm["failures"])]
+
+registry.add_collector(_service_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """Metrics in the Prometheus text format: stage timings, tokens, fallbacks, caches and load"""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/upload", response_model=dict)
 async def upload_file(file: UploadFile = File(...)):
     """
@@ -74,19 +215,17 @@ async def upload_file(file: UploadFile = File(...)):
     try:
         logger.info(f"Processing file: {file.filename}")
         
-        # Validate file type
-        allowed_types = ["application/pdf", "image/jpeg", "image/png", "image/jpg"]
-        if file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"File type {file.content_type} not supported. Please upload PDF, JPEG, or PNG files."
-            )
-        
-        # Read file content
-        content = await file.read()
+        # Read the upload in chunks; the type comes from its magic bytes, not the client header
+        with timed("upload_read"):
+            document = await upload_reader.read(file)
         
         # Extract text using OCR
-        extracted_text = await ocr_service.extract_text(content, file.content_type)
+        try:
+            extracted_text = await ocr_service.extract_text(
+                document.source, document.content_type, content_digest=document.digest
+            )
+        finally:
+            document.close()
         
         if not extracted_text or len(extracted_text.strip()) < 10:
             raise HTTPException(
@@ -95,22 +234,123 @@ async def upload_file(file: UploadFile = File(...)):
             )
         
         logger.info(f"Successfully extracted {len(extracted_text)} characters")
+
+        report_id = document.digest
+        await _register_report(report_id, extracted_text, file.filename)
         
         return {
             "success": True,
             "filename": file.filename,
+            "report_id": report_id,
             "extracted_text": extracted_text,
             "text_length": len(extracted_text)
         }
         
+    except UploadRejected as e:
+        logger.warning(f"Rejecting upload {file.filename}: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except ExtractionQueueFull as e:
+        logger.warning(f"Rejecting upload: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail="The server is busy processing other reports. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+async def _register_report(report_id: str, extracted_text: str, filename: Optional[str]) -> ReportSession:
+    """Index a newly extracted report and start its session"""
+    # Index the report once so later questions only send relevant passages
+    await asyncio.to_thread(report_indexes.build, report_id, extracted_text)
+    # Later calls can refer to report_id instead of posting the text back
+    return await asyncio.to_thread(report_store.create, report_id, extracted_text, filename)
+
+def _get_report(report_id: str) -> ReportSession:
+    """The session for report_id, or a 404 asking the client to upload again"""
+    session = report_store.get(report_id)
+    if session is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Report not found. Please upload the report again."
+        )
+    return session
+
+async def _save_report(session: ReportSession):
+    await asyncio.to_thread(report_store.save, session)
+
+def _store_simplified(session: ReportSession, simplified_text: str) -> bool:
+    """
+    Put a simplification on the session, unless it is the demo fallback
+    (which would otherwise be served for the rest of the session)
+    """
+    if ai_service.is_demo_text(simplified_text):
+        return False
+    session.simplified_text = simplified_text
+    return True
+
+def _store_translations(session: ReportSession, text: str, translations: Dict[str, str]) -> bool:
+    """Put translations of text on the session, leaving out demo fallbacks"""
+    # A translation of the demo summary is no more the report's than the summary is
+    if ai_service.is_demo_text(text):
+        return False
+    real = {language: translated for language, translated in translations.items()
+            if not translation_service.is_demo_translation(translated, text)}
+    session.translations.update(real)
+    return bool(real)
+
+async def _remember_simplified(session: ReportSession, chunks):
+    """Pass a simplification stream through, then store the full text on the session"""
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    if _store_simplified(session, "".join(parts)):
+        await _save_report(session)
+
+def _wants_event_stream(http_request: Request) -> bool:
+    """Whether the client asked for Server-Sent Events via the Accept header"""
+    return "text/event-stream" in http_request.headers.get("accept", "")
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _event_stream_response(chunks, result_field: str, extra: Optional[dict] = None) -> StreamingResponse:
+    """
+    Relay text chunks as "chunk" events, then a "done" event carrying the
+    assembled text under result_field (or an "error" event)
+    """
+    async def events():
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield _sse_event("chunk", {"text": chunk})
+            done = {result_field: "".join(parts), "success": True}
+            done.update(extra or {})
+            yield _sse_event("done", done)
+        except Exception as e:
+            logger.error(f"Error while streaming {result_field}: {str(e)}")
+            yield _sse_event("error", {"detail": str(e), "success": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/simplify", response_model=SimplifyResponse)
-async def simplify_diagnosis(request: SimplifyRequest):
+async def simplify_diagnosis(request: SimplifyRequest, http_request: Request):
     """
     Simplify medical text using AI
+
+    Send either the text or the report_id returned by /upload. Send
+    "Accept: text/event-stream" to receive the response as it is generated.
     """
     try:
         logger.info("Simplifying medical text")
@@ -120,32 +360,107 @@ async def simplify_diagnosis(request: SimplifyRequest):
                 status_code=500,
                 detail="AI service not configured. Please check OpenAI API key."
             )
+
+        session = _get_report(request.report_id) if request.report_id else None
+        text = request.text or (session.extracted_text if session else "")
+        if not text.strip():
+            raise HTTPException(status_code=400, detail="Text or report_id is required")
+        # Only results for the report's own text belong on its session
+        if session and text != session.extracted_text:
+            session = None
+
+        if _wants_event_stream(http_request):
+            chunks = ai_service.stream_simplified_text(text)
+            if session:
+                chunks = _remember_simplified(session, chunks)
+            return _event_stream_response(chunks, "simplified_text", {"report_id": request.report_id})
         
-        simplified_text = await ai_service.simplify_medical_text(request.text)
+        simplified_text = await ai_service.simplify_medical_text(text)
+
+        if session and _store_simplified(session, simplified_text):
+            await _save_report(session)
         
         return SimplifyResponse(
-            original_text=request.text,
+            original_text=text if request.include_original_text else None,
             simplified_text=simplified_text,
-            success=True
+            success=True,
+            report_id=request.report_id
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error simplifying text: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error simplifying text: {str(e)}")
 
+@app.post("/simplify/stream")
+async def simplify_diagnosis_stream(request: SimplifyRequest):
+    """
+    Simplify medical text using AI, streamed as Server-Sent Events
+    """
+    if not ai_service.is_configured():
+        raise HTTPException(
+            status_code=500,
+            detail="AI service not configured. Please check OpenAI API key."
+        )
+    session = _get_report(request.report_id) if request.report_id else None
+    text = request.text or (session.extracted_text if session else "")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text or report_id is required")
+    if session and text != session.extracted_text:
+        session = None
+
+    logger.info("Streaming simplified medical text")
+    chunks = ai_service.stream_simplified_text(text)
+    if session:
+        chunks = _remember_simplified(session, chunks)
+    return _event_stream_response(chunks, "simplified_text", {"report_id": request.report_id})
+
+async def _question_context(question: str, context: str, report_id: Optional[str]) -> str:
+    """
+    The part of the report to send with a question
+
+    Uses the retrieval index of an uploaded report (report_id), built from
+    the stored text only, or indexes the raw context once under its hash,
+    then picks the passages relevant to the question.
+    """
+    if report_id:
+        index = report_indexes.get(report_id)
+        if index is None:
+            # The index was evicted but the session still has the text
+            text = _get_report(report_id).extracted_text
+            index = await asyncio.to_thread(report_indexes.build, report_id, text)
+    else:
+        if not context.strip():
+            return context
+        index = await asyncio.to_thread(
+            report_indexes.get_or_build, report_indexes.context_id(context), context
+        )
+    return report_indexes.select_context(index, question)
+
 @app.post("/ask", response_model=QAResponse)
-async def ask_question(request: dict):
+async def ask_question(request: dict, http_request: Request):
     """
     Answer questions about medical text using AI
+
+    Pass the report_id from /upload instead of the full context to send only
+    the relevant passages. Send "Accept: text/event-stream" to receive the
+    answer as it is generated.
     """
     try:
         question = request.get("question", "")
-        context = request.get("context", "")
         
         if not question.strip():
             raise HTTPException(status_code=400, detail="Question is required")
+
+        context = await _question_context(question, request.get("context", ""), request.get("report_id"))
         
         logger.info(f"Answering question: {question[:50]}...")
+
+        if _wants_event_stream(http_request):
+            return _event_stream_response(
+                ai_service.stream_answer(question, context), "answer", {"question": question}
+            )
         
         answer = await ai_service.answer_question(question, context)
         
@@ -155,67 +470,634 @@ async def ask_question(request: dict):
             success=True
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: dict):
+    """
+    Answer questions about medical text using AI, streamed as Server-Sent Events
+    """
+    question = request.get("question", "")
+
+    if not question.strip():
+        raise HTTPException(status_code=400, detail="Question is required")
+
+    context = await _question_context(question, request.get("context", ""), request.get("report_id"))
+    logger.info(f"Streaming answer to question: {question[:50]}...")
+    return _event_stream_response(
+        ai_service.stream_answer(question, context), "answer", {"question": question}
+    )
+
 @app.post("/translate", response_model=TranslationResponse)
 async def translate_text(request: TranslationRequest):
     """
     Translate text to specified language
+
+    Send either the text or the report_id returned by /upload, which
+    translates the report's simplified text (or its extracted text).
     """
     try:
         logger.info(f"Translating text to {request.target_language}")
+
+        session = _get_report(request.report_id) if request.report_id else None
+        text = request.text or (session.simplified_text or session.extracted_text if session else "")
+        if not text.strip():
+            raise HTTPException(status_code=400, detail="Text or report_id is required")
         
         translated_text = await translation_service.translate_text(
-            request.text, 
+            text, 
             request.target_language
         )
+
+        if session and not request.text and _store_translations(
+            session, text, {request.target_language.lower(): translated_text}
+        ):
+            await _save_report(session)
         
         return TranslationResponse(
-            original_text=request.text,
+            original_text=text if request.include_original_text else None,
             translated_text=translated_text,
             target_language=request.target_language,
-            success=True
+            success=True,
+            report_id=request.report_id
         )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error translating text: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error translating text: {str(e)}")
+
+def _target_languages(requested: List[str], required: bool = True) -> List[str]:
+    """Requested languages, lowercased and deduplicated in order, all supported"""
+    languages = list(dict.fromkeys(language.lower() for language in requested))
+    if required and not languages:
+        raise HTTPException(status_code=400, detail="At least one target language is required")
+    unsupported = [language for language in languages if language not in translation_service.language_names]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported languages: {', '.join(unsupported)}")
+    return languages
+
+def _batch_translation_input(request: BatchTranslationRequest):
+    """Validated (text, languages, session) for a batch translation request"""
+    session = _get_report(request.report_id) if request.report_id else None
+    text = request.text or (session.simplified_text or session.extracted_text if session else "")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text or report_id is required")
+    languages = _target_languages(request.target_languages)
+
+    # Only translations of the report's own text belong on its session
+    return text, languages, (session if not request.text else None)
+
+def _batch_translation_stream(text: str, languages: List[str], session: Optional[ReportSession],
+                              report_id: Optional[str]) -> StreamingResponse:
+    """
+    Send each language as a "translation" event when it finishes, then a
+    "done" event with all of them (or an "error" event)
+    """
+    async def events():
+        translations = {}
+        try:
+            async for language, translated_text in translation_service.translate_many(text, languages):
+                translations[language] = translated_text
+                yield _sse_event("translation", {"target_language": language, "translated_text": translated_text})
+            if session and _store_translations(session, text, translations):
+                await _save_report(session)
+            yield _sse_event("done", {"translations": translations, "success": True, "report_id": report_id})
+        except Exception as e:
+            logger.error(f"Error while streaming translations: {str(e)}")
+            yield _sse_event("error", {"detail": str(e), "success": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/translate/batch", response_model=BatchTranslationResponse)
+async def translate_batch(request: BatchTranslationRequest, http_request: Request):
+    """
+    Translate one text into several languages concurrently
+
+    Send either the text or the report_id returned by /upload. Send
+    "Accept: text/event-stream" to receive each language as it finishes.
+    """
+    try:
+        text, languages, session = _batch_translation_input(request)
+        logger.info(f"Translating text to {len(languages)} languages")
+
+        if _wants_event_stream(http_request):
+            return _batch_translation_stream(text, languages, session, request.report_id)
+
+        translations = {}
+        async for language, translated_text in translation_service.translate_many(text, languages):
+            translations[language] = translated_text
+
+        if session and _store_translations(session, text, translations):
+            await _save_report(session)
+
+        return BatchTranslationResponse(
+            # Report languages in the order they were requested
+            translations={language: translations[language] for language in languages},
+            success=True,
+            report_id=request.report_id
+        )
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error translating text: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error translating text: {str(e)}")
 
+@app.post("/translate/batch/stream")
+async def translate_batch_stream(request: BatchTranslationRequest):
+    """
+    Translate one text into several languages as Server-Sent Events
+
+    Emits a "translation" event per language as it finishes, then "done".
+    """
+    text, languages, session = _batch_translation_input(request)
+    logger.info(f"Streaming translations to {len(languages)} languages")
+    return _batch_translation_stream(text, languages, session, request.report_id)
+
+async def _pipeline_results(text: str, languages: List[str], single_prompt: bool):
+    """
+    Yield ("simplified", None, text) and then ("translation", language, text)
+    for each language as it finishes
+
+    With single_prompt and one non-English language, the report is
+    simplified straight into that language and nothing is translated.
+    """
+    if single_prompt and len(languages) == 1 and languages[0] != "english":
+        language = languages[0]
+        language_name = translation_service.language_names[language]
+        yield "translation", language, await ai_service.simplify_medical_text(text, language_name)
+        return
+
+    simplified_text = await ai_service.simplify_medical_text(text)
+    yield "simplified", None, simplified_text
+
+    # The simplified text is already English
+    if "english" in languages:
+        yield "translation", "english", simplified_text
+    others = [language for language in languages if language != "english"]
+    if others:
+        async for language, translated_text in translation_service.translate_many(simplified_text, others):
+            yield "translation", language, translated_text
+
+def _pipeline_input(request: PipelineRequest):
+    """Validated (text, languages, session) for a pipeline request"""
+    if not ai_service.is_configured():
+        raise HTTPException(
+            status_code=500,
+            detail="AI service not configured. Please check OpenAI API key."
+        )
+    session = _get_report(request.report_id) if request.report_id else None
+    text = request.text or (session.extracted_text if session else "")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text or report_id is required")
+    languages = _target_languages(request.target_languages, required=False)
+    # Only results for the report's own text belong on its session
+    if session and text != session.extracted_text:
+        session = None
+    return text, languages, session
+
+def _record_pipeline_result(session: Optional[ReportSession], stage: str, language: Optional[str],
+                            result: str, simplified_text: Optional[str]):
+    """Store one pipeline result on the session; simplified_text is None in single-prompt mode"""
+    if session is None:
+        return
+    if stage == "simplified":
+        _store_simplified(session, result)
+    elif simplified_text is None or language == "english":
+        # Simplified straight into the language, or the English simplification itself
+        if not ai_service.is_demo_text(result):
+            session.translations[language] = result
+    else:
+        _store_translations(session, simplified_text, {language: result})
+
+def _pipeline_stream(text: str, languages: List[str], single_prompt: bool,
+                     session: Optional[ReportSession], report_id: Optional[str]) -> StreamingResponse:
+    """Pipeline results as Server-Sent Events, then "done" (or "error")"""
+    async def events():
+        simplified_text = None
+        translations = {}
+        try:
+            async for stage, language, result in _pipeline_results(text, languages, single_prompt):
+                if stage == "simplified":
+                    simplified_text = result
+                _record_pipeline_result(session, stage, language, result, simplified_text)
+                if stage == "simplified":
+                    yield _sse_event("simplified", {"simplified_text": result})
+                else:
+                    translations[language] = result
+                    yield _sse_event("translation", {"target_language": language, "translated_text": result})
+            if session:
+                await _save_report(session)
+            yield _sse_event("done", {
+                "simplified_text": simplified_text,
+                "translations": translations,
+                "success": True,
+                "report_id": report_id
+            })
+        except Exception as e:
+            logger.error(f"Error while streaming pipeline: {str(e)}")
+            yield _sse_event("error", {"detail": str(e), "success": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/pipeline", response_model=PipelineResponse)
+async def run_pipeline(request: PipelineRequest, http_request: Request):
+    """
+    Simplify a report once and translate it into every requested language
+
+    Send either the text or the report_id returned by /upload. Translations
+    run concurrently once the simplified text is ready; with a single
+    language (and single_prompt) the report is simplified straight into it
+    in one call. Send "Accept: text/event-stream" to receive a "simplified"
+    event and one "translation" event per language as they finish.
+    """
+    try:
+        text, languages, session = _pipeline_input(request)
+        logger.info(f"Running pipeline for {len(languages)} languages")
+
+        if _wants_event_stream(http_request):
+            return _pipeline_stream(text, languages, request.single_prompt, session, request.report_id)
+
+        simplified_text = None
+        translations = {}
+        async for stage, language, result in _pipeline_results(text, languages, request.single_prompt):
+            if stage == "simplified":
+                simplified_text = result
+            else:
+                translations[language] = result
+            _record_pipeline_result(session, stage, language, result, simplified_text)
+
+        if session:
+            await _save_report(session)
+
+        return PipelineResponse(
+            simplified_text=simplified_text,
+            # Report languages in the order they were requested
+            translations={language: translations[language] for language in languages},
+            success=True,
+            report_id=request.report_id
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running pipeline: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error running pipeline: {str(e)}")
+
+def _speech_input(text: str, report_id: Optional[str], language: Optional[str]):
+    """
+    (text, language code) to speak: the given text, or a report's
+    simplified text or translation
+    """
+    if not text and report_id:
+        session = _get_report(report_id)
+        language = (language or "").lower()
+        if language:
+            text = session.translations.get(language, "")
+        else:
+            text = session.simplified_text or session.extracted_text
+    if not text:
+        raise HTTPException(status_code=400, detail="Text is required")
+    
+    if not voice_service.is_available():
+        raise HTTPException(status_code=503, detail="Voice service not configured")
+    language = (language or "").lower()
+    return text, translation_service.language_codes.get(language, language or None)
+
+def _cached_speech_response(text: str, language: Optional[str]) -> Optional[FileResponse]:
+    """Previously synthesized audio for text, served from disk with Range support"""
+    path = voice_service.cached_speech_path(text, language)
+    if path is None:
+        return None
+    return FileResponse(path, media_type="audio/mpeg")
+
 @app.post("/text-to-speech")
-async def text_to_speech(request: dict):
+async def text_to_speech(request: dict, http_request: Request):
     """
     Convert text to speech using ElevenLabs
+
+    Send either the text, or a report_id (plus an optional language) to
+    speak the report's simplified text or its translation; language also
+    picks the abbreviation lexicon used for speech. Send
+    "Accept: audio/mpeg" to receive the audio itself instead of base64 JSON.
     """
     try:
-        text = request.get("text", "")
-        if not text:
-            raise HTTPException(status_code=400, detail="Text is required")
-        
-        if not voice_service.is_configured():
-            raise HTTPException(status_code=503, detail="Voice service not configured")
+        text, language = _speech_input(
+            request.get("text", ""), request.get("report_id"), request.get("language")
+        )
+        wants_audio = "audio/mpeg" in http_request.headers.get("accept", "")
+
+        if wants_audio:
+            cached = _cached_speech_response(text, language)
+            if cached is not None:
+                return cached
         
-        # Generate speech
-        audio_data = await voice_service.text_to_speech(text)
+        # Generate speech (or read back a cached clip)
+        audio_data = await voice_service.text_to_speech(text, language)
         
         if audio_data is None:
             raise HTTPException(status_code=500, detail="Failed to generate speech")
         
+        if wants_audio:
+            return Response(content=audio_data, media_type=audio_media_type(audio_data))
+        
         # Return audio data as base64 for frontend
         import base64
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+        with timed("base64_encode"):
+            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
         
         return {
             "success": True,
             "audio_data": audio_base64,
+            "content_type": audio_media_type(audio_data),
             "text_length": len(text)
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in text-to-speech: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating speech: {str(e)}")
+
+async def _speech_stream_response(text: str, language: Optional[str]) -> Response:
+    """
+    Stream MPEG audio as each segment is synthesized, or serve the cached clip
+
+    The first segment is generated before the response starts, so if it
+    fails the whole text is spoken by the local engine instead (as WAV); a
+    later failure ends the stream.
+    """
+    cached = _cached_speech_response(text, language)
+    if cached is not None:
+        return cached
+
+    if not voice_service.is_configured():
+        audio_data = await voice_service.local_speech(text, language)
+        return Response(content=audio_data, media_type=audio_media_type(audio_data))
+
+    chunks = voice_service.stream_speech(text, language)
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="Failed to generate speech")
+    except Exception as e:
+        logger.error(f"Error generating speech, using local speech: {str(e)}")
+        audio_data = await voice_service.local_speech(text, language)
+        return Response(content=audio_data, media_type=audio_media_type(audio_data))
+
+    async def audio():
+        yield first
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error while streaming speech: {str(e)}")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        audio(),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/text-to-speech/stream")
+async def text_to_speech_stream(request: dict):
+    """
+    Stream speech as audio/mpeg, starting after the first sentence
+
+    Accepts the same body as /text-to-speech.
+    """
+    try:
+        text, language = _speech_input(
+            request.get("text", ""), request.get("report_id"), request.get("language")
+        )
+        return await _speech_stream_response(text, language)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in text-to-speech: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating speech: {str(e)}")
+
+@app.get("/text-to-speech/stream")
+async def text_to_speech_stream_report(report_id: str, language: Optional[str] = None):
+    """
+    Stream an uploaded report's speech, usable directly as an <audio> source
+    """
+    try:
+        text, language = _speech_input("", report_id, language)
+        return await _speech_stream_response(text, language)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in text-to-speech: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating speech: {str(e)}")
 
+async def _extract_job_text(job: dict, context: JobContext) -> str:
+    """Extract a job's file, waiting for room in the extraction pool instead of failing"""
+    source = DocumentSource(path=job["file_path"])
+
+    def progress(pages_done: int, pages_total: int):
+        context.update("extract", pages_done=pages_done, pages_total=pages_total)
+
+    while True:
+        try:
+            return await ocr_service.extract_text(
+                source, job["content_type"], content_digest=job["digest"], progress=progress
+            )
+        except ExtractionQueueFull as e:
+            context.update("extract", status="waiting")
+            await asyncio.sleep(e.retry_after)
+            context.update("extract", status="running")
+
+async def _run_job(job: dict, context: JobContext) -> dict:
+    """Run a job's stages in order: extract, simplify, translate, tts"""
+    stages = job["stages"]
+    report_id = job["digest"]
+    result = {"report_id": report_id}
+
+    context.start("extract")
+    extracted_text = await _extract_job_text(job, context)
+    if not extracted_text or len(extracted_text.strip()) < 10:
+        raise ValueError("Could not extract meaningful text from the file")
+    session = await _register_report(report_id, extracted_text, job["filename"])
+    result["extracted_text"] = extracted_text
+    context.complete("extract", text_length=len(extracted_text))
+
+    if "simplify" in stages:
+        await context.check_cancelled()
+        context.start("simplify")
+        simplified_text = await ai_service.simplify_medical_text(extracted_text)
+        if _store_simplified(session, simplified_text):
+            await _save_report(session)
+        result["simplified_text"] = simplified_text
+        context.complete("simplify")
+
+    translations = {}
+    if "translate" in stages:
+        await context.check_cancelled()
+        languages = job["options"].get("target_languages", [])
+        context.start("translate", languages_done=0, languages_total=len(languages))
+        async for language, translated_text in translation_service.translate_many(result["simplified_text"], languages):
+            translations[language] = translated_text
+            context.update("translate", languages_done=len(translations))
+        if _store_translations(session, result["simplified_text"], translations):
+            await _save_report(session)
+        result["translations"] = translations
+        context.complete("translate")
+
+    if "tts" in stages:
+        await context.check_cancelled()
+        # Speak the simplified text and each translation; the audio is then
+        # served from the audio cache by /text-to-speech/stream
+        targets = [(None, result["simplified_text"])] + list(translations.items())
+        context.start("tts", clips_done=0, clips_total=len(targets))
+        audio = {}
+        for language, text in targets:
+            code = translation_service.language_codes.get(language) if language else None
+            await voice_service.text_to_speech(text, code)
+            url = f"/text-to-speech/stream?report_id={report_id}"
+            audio[language or "simplified"] = f"{url}&language={language}" if language else url
+            context.update("tts", clips_done=len(audio))
+        result["audio"] = audio
+        context.complete("tts")
+
+    return result
+
+# Created on startup, so importing main (tools, benchmarks, tests) does not create the job database
+job_queue: Optional[JobQueue] = None
+
+def _get_job_queue() -> JobQueue:
+    """The running job queue, or a 503 before startup"""
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is not running")
+    return job_queue
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the job workers, requeueing jobs interrupted by the last shutdown"""
+    global job_queue
+    job_queue = JobQueue(_run_job)
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    if job_queue is not None:
+        await job_queue.stop()
+
+def _job_view(job: dict) -> dict:
+    """A job as returned by the API"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "stages": job["stages"],
+        "progress": job["progress"],
+        "result": job["result"],
+        "error": job["error"],
+        "filename": job["filename"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+    }
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    stages: str = Form("extract,simplify"),
+    target_languages: str = Form(""),
+    priority: int = Form(0)
+):
+    """
+    Queue a report for background processing and return its job ID
+
+    stages is a comma-separated subset of extract, simplify, translate and
+    tts; extract always runs, and translate or tts imply simplify.
+    target_languages (comma-separated) is required for translate. Jobs
+    with a higher priority run first. Poll GET /jobs/{job_id} for progress.
+    """
+    queue = _get_job_queue()
+    requested ={stage.strip().lower() for stage in stages.split(",") if stage.strip()}
+    unknown = requested - set(JOB_STAGES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown stages: {', '.join(sorted(unknown))}")
+    if requested & {"translate", "tts"}:
+        requested.add("simplify")
+    requested.add("extract")
+    job_stages = [stage for stage in JOB_STAGES if stage in requested]
+    languages = _target_languages(
+        [language.strip() for language in target_languages.split(",") if language.strip()],
+        required="translate" in requested
+    )
+
+    try:
+        with timed("upload_read"):
+            document = await upload_reader.read(file)
+    except UploadRejected as e:
+        logger.warning(f"Rejecting upload {file.filename}: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    job_id = uuid.uuid4().hex
+    file_path = queue.file_path(job_id)
+    try:
+        # Keep the file until the job finishes, across restarts
+        def keep_file():
+            with document.source.open() as source, open(file_path, "wb") as target:
+                shutil.copyfileobj(source, target)
+
+        await asyncio.to_thread(keep_file)
+    finally:
+        document.close()
+
+    job = queue.submit(
+        job_id=job_id,
+        stages=job_stages,
+        options={"target_languages": languages},
+        priority=priority,
+        filename=file.filename,
+        content_type=document.content_type,
+        digest=document.digest,
+        file_path=file_path
+    )
+    logger.info(f"Queued job {job_id} for {file.filename} ({', '.join(job_stages)})")
+    return _job_view(job)
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """Recent jobs, newest first"""
+    jobs = await asyncio.to_thread(_get_job_queue().store.list, status, min(max(limit, 1), 500))
+    return {"jobs": [_job_view(job) for job in jobs]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """A job's status, per-stage progress and, once completed, its result"""
+    job = await asyncio.to_thread(_get_job_queue().store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_view(job)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    status = _get_job_queue().cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "status": "cancelling" if status == "running" else status}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
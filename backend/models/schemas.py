@@ -1,13 +1,17 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class SimplifyRequest(BaseModel):
-    text: str
+    # Either the text itself or the report_id returned by /upload
+    text: Optional[str] = None
+    report_id: Optional[str] = None
+    include_original_text: bool = True
 
 class SimplifyResponse(BaseModel):
-    original_text: str
+    original_text: Optional[str] = None
     simplified_text: str
     success: bool
+    report_id: Optional[str] = None
 
 class QAResponse(BaseModel):
     question: str
@@ -15,17 +19,51 @@ class QAResponse(BaseModel):
     success: bool
 
 class TranslationRequest(BaseModel):
-    text: str
+    # Either the text itself or the report_id returned by /upload
+    # (which translates the report's simplified text)
+    text: Optional[str] = None
     target_language: str
+    report_id: Optional[str] = None
+    include_original_text: bool = True
 
 class TranslationResponse(BaseModel):
-    original_text: str
+    original_text: Optional[str] = None
     translated_text: str
     target_language: str
     success: bool
+    report_id: Optional[str] = None
+
+class BatchTranslationRequest(BaseModel):
+    # Either the text itself or the report_id returned by /upload
+    text: Optional[str] = None
+    target_languages: List[str]
+    report_id: Optional[str] = None
+
+class BatchTranslationResponse(BaseModel):
+    # Keyed by target language
+    translations: Dict[str, str]
+    success: bool
+    report_id: Optional[str] = None
+
+class PipelineRequest(BaseModel):
+    # Either the text itself or the report_id returned by /upload
+    text: Optional[str] = None
+    report_id: Optional[str] = None
+    target_languages: List[str] = []
+    # With exactly one (non-English) language, simplify straight into it in one call
+    single_prompt: bool = True
+
+class PipelineResponse(BaseModel):
+    # None when the report was simplified straight into the target language
+    simplified_text: Optional[str] = None
+    # Keyed by target language
+    translations: Dict[str, str]
+    success: bool
+    report_id: Optional[str] = None
 
 class UploadResponse(BaseModel):
     success: bool
     filename: str
+    report_id: Optional[str] = None
     extracted_text: str
     text_length: int
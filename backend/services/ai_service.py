@@ -1,38 +1,70 @@
-import google.generativeai as genai
-import os
+import asyncio
 import logging
-from typing import Optional
+import os
+import time
+from typing import AsyncIterator, List, Optional
+
+from services.llm_client import LLMClient, get_llm_client
+from services.metrics import DEMO_FALLBACKS
+from services.report_chunker import chunk_report
+from services.response_cache import ResponseCache, get_response_cache
 
 logger = logging.getLogger(__name__)
 
+# Bump when a prompt template changes so cached responses stop matching
+SIMPLIFY_PROMPT_VERSION = "1"
+SIMPLIFY_CHUNK_PROMPT_VERSION = "1"
+ANSWER_PROMPT_VERSION = "1"
+
+# Returned by simplification when Gemini fails
+_DEMO_SIMPLIFIED_TEXT = """**Simple Summary**: 
+You had a heart attack (STEMI) which means one of the blood vessels that supplies your heart muscle got blocked. The doctors quickly opened it up with a procedure called angioplasty and put in a small tube (stent) to keep it open. This is a common and very treatable condition.
+
+**Key Terms**:
+- **STEMI**: A serious type of heart attack where a blood vessel is completely blocked
+- **Angioplasty**: A procedure to open blocked blood vessels in the heart
+- **Stent**: A small mesh tube that keeps blood vessels open
+- **Hypertension**: High blood pressure
+- **Hyperlipidemia**: High cholesterol levels
+
+**What This Means**:
+- You're going to be okay! This is a very treatable condition
+- You'll need to take medications to prevent future problems
+- Follow up with your cardiologist and primary care doctor
+- Start cardiac rehabilitation to strengthen your heart
+- Make lifestyle changes like eating healthy and exercising
+- Avoid heavy lifting for a week, then gradually return to normal activities
+
+Remember: This is educational information, not medical advice. Always consult your healthcare team for medical decisions."""
+
 class AIService:
-    def __init__(self):
-        self.model = None
-        self._initialize_client()
-    
-    def _initialize_client(self):
-        """Initialize Gemini client with API key"""
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key and api_key != "your_gemini_api_key_here":
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
-            logger.info("Gemini client initialized successfully")
-        else:
-            logger.warning("Gemini API key not found. AI features will be disabled.")
+    def __init__(self, llm: Optional[LLMClient] = None, cache: Optional[ResponseCache] = None):
+        # Gemini access and cached responses are shared with TranslationService
+        self.llm = llm or get_llm_client()
+        self.cache = cache or get_response_cache()
+        # Reports longer than this are simplified section by section, then merged
+        self.long_document_chars = int(os.getenv("SIMPLIFY_LONG_DOC_CHARS", "12000"))
+        self.chunk_chars = int(os.getenv("SIMPLIFY_CHUNK_CHARS", "6000"))
+        self.chunk_concurrency = int(os.getenv("SIMPLIFY_CHUNK_CONCURRENCY", "4"))
+
+    def _simplify_cache_key(self, medical_text: str, language: Optional[str] = None) -> str:
+        return self.cache.make_key(
+            "simplify", medical_text, language=language or "",
+            model=self.llm.model_name, prompt_version=SIMPLIFY_PROMPT_VERSION
+        )
+
+    def _answer_cache_key(self, question: str, context: str) -> str:
+        return self.cache.make_key(
+            "ask", f"{question}\n\n{context}", model=self.llm.model_name, prompt_version=ANSWER_PROMPT_VERSION
+        )
     
     def is_configured(self) -> bool:
         """Check if AI service is properly configured"""
-        return self.model is not None
+        return self.llm.is_configured()
     
-    async def simplify_medical_text(self, medical_text: str) -> str:
-        """
-        Simplify medical text using Gemini 1.5 Flash
-        """
-        if not self.is_configured():
-            raise Exception("AI service not configured")
-        
-        try:
-            prompt = f"""You are a patient educator. Simplify the following medical summary so a 12-year-old can understand it. Keep it accurate and reassuring. Avoid jargon unless explained. Do not state that you summarized it for a 12-year-old to understand in your response. 
+    def _simplify_prompt(self, medical_text: str, language: Optional[str] = None) -> str:
+        """Prompt for simplifying a medical report, optionally answering in another language"""
+        prompt = f"""You are a patient educator. Simplify the following medical summary so a 12-year-old can understand it. Keep it accurate and reassuring. Avoid jargon unless explained. Do not state that you summarized it for a 12-year-old to understand in your response. 
 
 Format your response as:
 1. **Simple Summary**: [Easy-to-understand explanation]
@@ -43,9 +75,81 @@ Be empathetic, clear, and encouraging. Remember this is for someone who might be
 
 Medical text to simplify:
 {medical_text}"""
+        if language:
+            prompt += f"""
+
+Write your entire response, including the section headings, in {language}. Use natural, native-speaker level {language} and keep medical terms accurate; if a term has no direct {language} equivalent, give the original term with an explanation."""
+        return prompt
+    
+    def _simplify_chunk_prompt(self, chunk: str, index: int, total: int) -> str:
+        """Map step: plain-language notes for one part of a long report"""
+        return f"""You are a patient educator. Below is part {index} of {total} of a long medical report. Rewrite it as short plain-language notes a 12-year-old could follow. Keep every diagnosis, test result, medication (with dose), procedure and instruction, and briefly explain any medical term you keep. Do not add an introduction or conclusion; other parts are summarized separately.
+
+Report part {index} of {total}:
+{chunk}"""
+
+    def _merge_prompt(self, section_notes: List[str], language: Optional[str] = None) -> str:
+        """Reduce step: the usual simplification prompt over the per-part notes"""
+        notes = "\n\n".join(
+            f"Part {index}:\n{note.strip()}" for index, note in enumerate(section_notes, start=1)
+        )
+        return self._simplify_prompt(
+            f"(Plain-language notes taken from each part of a long report, in order)\n\n{notes}",
+            language
+        )
+
+    async def _simplify_chunk(self, chunk: str, index: int, total: int) -> str:
+        """Notes for one chunk; cached on the chunk alone so unchanged parts are reused"""
+        cache_key = self.cache.make_key(
+            "simplify_chunk", chunk, model=self.llm.model_name, prompt_version=SIMPLIFY_CHUNK_PROMPT_VERSION
+        )
+        # The part numbers only give the model context, so they stay out of the key
+        return await self.cache.get_or_generate(
+            cache_key, lambda: self.llm.generate(self._simplify_chunk_prompt(chunk, index, total))
+        )
 
-            response = self.model.generate_content(prompt)
-            simplified_text = response.text
+    async def _final_simplify_prompt(self, medical_text: str, language: Optional[str] = None) -> str:
+        """
+        The prompt whose answer is the simplified report (in language, if given)
+
+        Short reports go to the model as they are. Long ones are split on
+        section headings, each chunk is simplified concurrently (at most
+        chunk_concurrency at a time), and the prompt merges those notes.
+        """
+        if len(medical_text) <= self.long_document_chars:
+            return self._simplify_prompt(medical_text, language)
+
+        chunks = chunk_report(medical_text, self.chunk_chars)
+        logger.info(f"Simplifying long report in {len(chunks)} chunks")
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+
+        async def simplify_chunk(index: int, chunk: str) -> str:
+            async with semaphore:
+                return await self._simplify_chunk(chunk, index, len(chunks))
+
+        section_notes = await asyncio.gather(
+            *(simplify_chunk(index, chunk) for index, chunk in enumerate(chunks, start=1))
+        )
+        return self._merge_prompt(section_notes, language)
+
+    async def _generate_simplified_text(self, medical_text: str, language: Optional[str] = None) -> str:
+        return await self.llm.generate(await self._final_simplify_prompt(medical_text, language))
+    
+    async def simplify_medical_text(self, medical_text: str, language: Optional[str] = None) -> str:
+        """
+        Simplify medical text using Gemini
+
+        With a language (a display name such as "Spanish") the explanation
+        is written directly in that language, in the same single call.
+        """
+        if not self.is_configured():
+            raise Exception("AI service not configured")
+        
+        try:
+            simplified_text = await self.cache.get_or_generate(
+                self._simplify_cache_key(medical_text, language),
+                lambda: self._generate_simplified_text(medical_text, language)
+            )
             logger.info("Successfully simplified medical text using Gemini")
             return simplified_text
             
@@ -53,40 +157,55 @@ Medical text to simplify:
             logger.error(f"Error simplifying medical text: {str(e)}")
             # Return demo response for hackathon
             return self._get_demo_simplified_text()
-    
-    def _get_demo_simplified_text(self) -> str:
+
+    async def stream_simplified_text(self, medical_text: str) -> AsyncIterator[str]:
         """
-        Return demo simplified text for hackathon presentation
+        Simplify medical text, yielding the response as Gemini produces it
+
+        Falls back to the demo text only if nothing has been streamed yet.
         """
-        return """**Simple Summary**: 
-You had a heart attack (STEMI) which means one of the blood vessels that supplies your heart muscle got blocked. The doctors quickly opened it up with a procedure called angioplasty and put in a small tube (stent) to keep it open. This is a common and very treatable condition.
+        if not self.is_configured():
+            raise Exception("AI service not configured")
 
-**Key Terms**:
-- **STEMI**: A serious type of heart attack where a blood vessel is completely blocked
-- **Angioplasty**: A procedure to open blocked blood vessels in the heart
-- **Stent**: A small mesh tube that keeps blood vessels open
-- **Hypertension**: High blood pressure
-- **Hyperlipidemia**: High cholesterol levels
+        cache_key = self._simplify_cache_key(medical_text)
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            yield cached
+            return
 
-**What This Means**:
-- You're going to be okay! This is a very treatable condition
-- You'll need to take medications to prevent future problems
-- Follow up with your cardiologist and primary care doctor
-- Start cardiac rehabilitation to strengthen your heart
-- Make lifestyle changes like eating healthy and exercising
-- Avoid heavy lifting for a week, then gradually return to normal activities
+        streamed = False
+        try:
+            started = time.perf_counter()
+            parts = []
+            prompt = await self._final_simplify_prompt(medical_text)
+            async for chunk in self.llm.stream(prompt):
+                streamed = True
+                parts.append(chunk)
+                yield chunk
+            await asyncio.to_thread(self.cache.set, cache_key, "".join(parts), time.perf_counter() - started)
+            logger.info("Successfully streamed simplified medical text using Gemini")
 
-Remember: This is educational information, not medical advice. Always consult your healthcare team for medical decisions."""
+        except Exception as e:
+            logger.error(f"Error streaming simplified medical text: {str(e)}")
+            if streamed:
+                raise
+            yield self._get_demo_simplified_text()
     
-    async def answer_question(self, question: str, context: str = "") -> str:
+    def _get_demo_simplified_text(self) -> str:
         """
-        Answer questions about medical text using Gemini
+        Return demo simplified text for hackathon presentation
         """
-        if not self.is_configured():
-            raise Exception("AI service not configured")
-        
-        try:
-            prompt = f"""You are a helpful medical assistant. Answer the patient's question based on the provided medical context. 
+        DEMO_FALLBACKS.inc(service="simplify")
+        return _DEMO_SIMPLIFIED_TEXT
+
+    @staticmethod
+    def is_demo_text(text: str) -> bool:
+        """Whether text is the demo summary returned when Gemini fails, rather than a real one"""
+        return text == _DEMO_SIMPLIFIED_TEXT
+    
+    def _answer_prompt(self, question: str, context: str) -> str:
+        """Prompt for answering a patient's question about their report"""
+        return f"""You are a helpful medical assistant. Answer the patient's question based on the provided medical context. 
 
 Guidelines:
 - Be clear and reassuring
@@ -100,9 +219,19 @@ Remember: You provide educational information, not medical advice.
 Medical Context: {context}
 
 Patient's Question: {question}"""
-            
-            response = self.model.generate_content(prompt)
-            answer = response.text
+    
+    async def answer_question(self, question: str, context: str = "") -> str:
+        """
+        Answer questions about medical text using Gemini
+        """
+        if not self.is_configured():
+            raise Exception("AI service not configured")
+        
+        try:
+            answer = await self.cache.get_or_generate(
+                self._answer_cache_key(question, context),
+                lambda: self.llm.generate(self._answer_prompt(question, context))
+            )
             logger.info("Successfully answered question using Gemini")
             return answer
             
@@ -110,11 +239,44 @@ Patient's Question: {question}"""
             logger.error(f"Error answering question: {str(e)}")
             # Return demo response for hackathon
             return self._get_demo_answer(question)
+
+    async def stream_answer(self, question: str, context: str = "") -> AsyncIterator[str]:
+        """
+        Answer a question, yielding the response as Gemini produces it
+
+        Falls back to the demo answer only if nothing has been streamed yet.
+        """
+        if not self.is_configured():
+            raise Exception("AI service not configured")
+
+        cache_key = self._answer_cache_key(question, context)
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        streamed = False
+        try:
+            started = time.perf_counter()
+            parts = []
+            async for chunk in self.llm.stream(self._answer_prompt(question, context)):
+                streamed = True
+                parts.append(chunk)
+                yield chunk
+            await asyncio.to_thread(self.cache.set, cache_key, "".join(parts), time.perf_counter() - started)
+            logger.info("Successfully streamed answer using Gemini")
+
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            if streamed:
+                raise
+            yield self._get_demo_answer(question)
     
     def _get_demo_answer(self, question: str) -> str:
         """
         Return demo answers for common questions
         """
+        DEMO_FALLBACKS.inc(service="ask")
         question_lower = question.lower()
         
         if "stemi" in question_lower or "heart attack" in question_lower:
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Optional
+
+from services.cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+def _settings_material(settings: Any) -> str:
+    """Stable text form of a voice settings object (pydantic model, dict or plain object)"""
+    if settings is None:
+        return ""
+    if hasattr(settings, "model_dump"):
+        values = settings.model_dump()
+    elif hasattr(settings, "dict"):
+        values = settings.dict()
+    elif isinstance(settings, dict):
+        values = settings
+    else:
+        values = vars(settings)
+    return json.dumps(values, sort_keys=True, default=str)
+
+
+class AudioCache:
+    """
+    Synthesized speech on disk, keyed by the cleaned text, voice and voice
+    settings
+
+    Whole clips and individual sentences share one size-bounded directory,
+    so files can be served straight from disk and sentences repeated across
+    explanations are synthesized once.
+
+    Configuration (environment):
+        TTS_CACHE_DIR     directory for cached audio (defaults to a temp directory)
+        TTS_CACHE_MAX_MB  size limit of the directory (0 disables the cache)
+    """
+
+    def __init__(self):
+        max_bytes = int(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024
+        directory = os.getenv("TTS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "medlens-audio")
+        self.disk: Optional[DiskCache] = None
+        if max_bytes > 0:
+            try:
+                self.disk = DiskCache(directory, max_bytes=max_bytes)
+            except OSError as e:
+                logger.warning(f"Audio cache disabled, cannot use {directory}: {str(e)}")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind: str, cleaned_text: str, voice_id: str, settings: Any = None) -> str:
+        """File name for audio of cleaned_text; kind separates whole clips from sentences"""
+        material = "\x1f".join([kind, voice_id or "", _settings_material(settings), cleaned_text])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest() + ".mp3"
+
+    def path(self, key: str) -> Optional[str]:
+        """
+        Location of cached audio on disk, or None
+
+        Only hits are counted here: a miss is followed by get() for the same
+        clip, which counts it.
+        """
+        path = self.disk.path(key) if self.disk is not None else None
+        if path is not None:
+            self.hits += 1
+        return path
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.disk is None:
+            self.misses += 1
+            return None
+        audio = self.disk.get(key)
+        if audio is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return audio
+
+    def set(self, key: str, audio: bytes):
+        if self.disk is not None and audio:
+            self.disk.set(key, audio)
+
+    def stats(self) -> dict:
+        """Counters for /health"""
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.disk is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+        if self.disk is not None:
+            stats["entries"] = len(self.disk)
+            stats["bytes"] = self.disk.size_bytes
+        return stats
@@ -0,0 +1,367 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Bounded in-memory cache that evicts the least recently used entry
+
+    With a ttl (seconds), entries also expire that long after being set.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._expires: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            if self.ttl is not None and self._expires[key] < time.monotonic():
+                del self._entries[key]
+                del self._expires[key]
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._expires.pop(evicted, None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._expires.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    One file per key under a directory, evicted least recently used first
+    once the total size goes over max_bytes
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the size index from whatever a previous run left on disk"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._sizes[name] = size
+            self._total += size
+
+    def path(self, key: str) -> Optional[str]:
+        """Location of a cached entry on disk, or None if it is not cached"""
+        path = os.path.join(self.directory, key)
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            if not os.path.exists(path):
+                self._total -= self._sizes.pop(key)
+                return None
+            self._sizes.move_to_end(key)
+        # Touch so a restart rebuilds the same recency order
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Values of the keys that are present"""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(self, items: List[Tuple[str, bytes]]):
+        for key, value in items:
+            self.set(key, value)
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        # Write to a temp file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(temp_path, os.path.join(self.directory, key))
+        except OSError as e:
+            logger.error(f"Failed to write cache entry {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+
+        with self._lock:
+            self._total -= self._sizes.pop(key, 0)
+            self._sizes[key] = len(value)
+            self._total += len(value)
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._sizes:
+                self._total -= self._sizes.pop(key)
+        try:
+            os.unlink(os.path.join(self.directory, key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._sizes:
+            key, size = self._sizes.popitem(last=False)
+            self._total -= size
+            try:
+                os.unlink(os.path.join(self.directory, key))
+            except OSError:
+                pass
+
+    @property
+    def size_bytes(self) -> int:
+        return self._total
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache in a single SQLite file, with optional TTL
+    and least-recently-used eviction past max_entries
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl is not None and created + self.ttl < now:
+                self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+            self._connection.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            return bytes(value)
+
+    # Keys per query, under SQLite's default limit of 999 bound parameters
+    _BATCH = 500
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Values of the keys that are present, read in a few queries and one commit"""
+        now = time.time()
+        found: Dict[str, bytes] = {}
+        expired: List[str] = []
+        with self._lock:
+            for start in range(0, len(keys), self._BATCH):
+                batch = keys[start:start + self._BATCH]
+                rows = self._connection.execute(
+                    f"SELECT key, value, created FROM cache WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, value, created in rows:
+                    if self.ttl is not None and created + self.ttl < now:
+                        expired.append(key)
+                    else:
+                        found[key] = bytes(value)
+            if expired:
+                self._connection.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in expired])
+            if found:
+                self._connection.executemany("UPDATE cache SET accessed = ? WHERE key = ?",
+                                             [(now, key) for key in found])
+            if expired or found:
+                self._connection.commit()
+        return found
+
+    def set(self, key: str, value: bytes):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._connection.commit()
+
+    def set_many(self, items: List[Tuple[str, bytes]]):
+        """Store several values with one eviction pass and one commit"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                [(key, sqlite3.Binary(value), now, now) for key, value in items],
+            )
+            self._connection.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._connection.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._connection.commit()
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            row = self._connection.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM cache").fetchone()
+        return int(row[0])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0])
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of an optional DiskCache or SQLiteCache, with
+    hit/miss counters
+
+    serialize/deserialize convert values to and from the bytes stored on disk.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[Union[DiskCache, SQLiteCache]] = None,
+                 serialize: Callable[[Any], bytes] = lambda value: value,
+                 deserialize: Callable[[bytes], Any] = lambda data: data):
+        self.memory = memory
+        self.disk = disk
+        self.serialize = serialize
+        self.deserialize = deserialize
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                value = self.deserialize(data)
+                self.memory.set(key, value)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, self.serialize(value))
+
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Like get() for each key, with one batched read of the disk tier for the memory misses"""
+        values = [self.memory.get(key) for key in keys]
+        self.memory_hits += sum(1 for value in values if value is not None)
+        missing = [index for index, value in enumerate(values) if value is None]
+        if missing and self.disk is not None:
+            found = self.disk.get_many([keys[index] for index in missing])
+            for index in missing:
+                data = found.get(keys[index])
+                if data is not None:
+                    values[index] = self.deserialize(data)
+                    self.memory.set(keys[index], values[index])
+                    self.disk_hits += 1
+        self.misses += sum(1 for value in values if value is None)
+        return values
+
+    def set_many(self, items: List[Tuple[str, Any]]):
+        for key, value in items:
+            self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set_many([(key, self.serialize(value)) for key, value in items])
+
+    def stats(self) -> dict:
+        """Counters for /health"""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        stats = {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+        if self.disk is not None:
+            stats["disk_entries"] = len(self.disk)
+            stats["disk_bytes"] = self.disk.size_bytes
+        return stats
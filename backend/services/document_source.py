@@ -0,0 +1,171 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+
+class _MappedFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over an mmap of a spilled upload
+
+    Implements readinto() so both pdfminer and pypdfium2 can read from it.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._map)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        target = memoryview(buffer).cast("B")
+        count = max(0, min(len(target), len(self._map) - self._pos))
+        with memoryview(self._map) as mapped:
+            target[:count] = mapped[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._map.close()
+            self._file.close()
+        super().close()
+
+
+class DocumentSource:
+    """
+    An uploaded document, either held in memory or spilled to one file on disk
+
+    Every extraction stage opens its own reader over the same bytes: a BytesIO
+    that shares the in-memory buffer, or an mmap of the spill file. When
+    pickled for a pool worker a spilled source travels as its path only.
+    """
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None, owner: bool = False):
+        if (data is None) == (path is None):
+            raise ValueError("DocumentSource needs exactly one of data or path")
+        self.data = data
+        self.path = path
+        # Only the process that created the spill file may delete it
+        self._owner = owner
+
+    @classmethod
+    def from_bytes(cls, data: bytes, spill_threshold: Optional[int] = None) -> "DocumentSource":
+        """Wrap upload bytes, spilling them to disk when larger than spill_threshold"""
+        if spill_threshold and len(data) > spill_threshold:
+            with tempfile.NamedTemporaryFile(suffix=".upload", delete=False) as spill_file:
+                spill_file.write(data)
+            return cls(path=spill_file.name, owner=True)
+        return cls(data=data)
+
+    @property
+    def spilled(self) -> bool:
+        return self.path is not None
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        return os.path.getsize(self.path)
+
+    def open(self) -> BinaryIO:
+        """A fresh seekable reader positioned at the start of the document"""
+        if self.data is not None:
+            # BytesIO over bytes shares the buffer until something writes to it
+            return io.BytesIO(self.data)
+        return _MappedFile(self.path)
+
+    def read_bytes(self) -> bytes:
+        """The whole document as bytes (copies when spilled)"""
+        if self.data is not None:
+            return self.data
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def sha256(self, chunk_size: int = 1024 * 1024) -> str:
+        """Hex SHA-256 of the document, read in chunks"""
+        if self.data is not None:
+            return hashlib.sha256(self.data).hexdigest()
+        digest = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def close(self):
+        """Remove the spill file, if this source created one"""
+        if self._owner and self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_owner"] = False
+        return state
+
+
+class DocumentWriter:
+    """
+    Builds a DocumentSource from chunks, hashing as it goes
+
+    Chunks are kept in memory until spill_threshold bytes have been written,
+    after which everything moves to a single spill file on disk.
+    """
+
+    def __init__(self, spill_threshold: Optional[int] = None):
+        self.spill_threshold = spill_threshold
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._chunks = []
+        self._spill_file = None
+
+    def write(self, chunk: bytes):
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        if self._spill_file is None and self.spill_threshold and self.size > self.spill_threshold:
+            self._spill_file = tempfile.NamedTemporaryFile(suffix=".upload", delete=False)
+            for pending in self._chunks:
+                self._spill_file.write(pending)
+            self._chunks = []
+        if self._spill_file is not None:
+            self._spill_file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+    def finish(self) -> DocumentSource:
+        """The written document; the caller must close() it"""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            return DocumentSource(path=self._spill_file.name, owner=True)
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return DocumentSource(data=data)
+
+    def discard(self):
+        """Drop everything written so far, e.g. after a rejected upload"""
+        self._chunks = []
+        if self._spill_file is not None:
+            self._spill_file.close()
+            if os.path.exists(self._spill_file.name):
+                os.unlink(self._spill_file.name)
+            self._spill_file = None
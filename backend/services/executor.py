@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionQueueFull(Exception):
+    """Raised when too many extraction jobs are already running or waiting"""
+
+    def __init__(self, in_flight: int, limit: int, retry_after: int = 5):
+        super().__init__(f"Extraction queue is full ({in_flight}/{limit} jobs in flight)")
+        self.in_flight = in_flight
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def _call_portably(fn: Callable, *args):
+    """
+    Run fn in a worker, re-raising errors that cannot cross the process
+    boundary (such as pytesseract's TesseractNotFoundError, which fails to
+    unpickle and would break the whole pool) as a plain RuntimeError
+    """
+    try:
+        return fn(*args)
+    except Exception as e:
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+        raise
+
+
+class ExtractionExecutor:
+    """
+    Runs CPU-bound extraction work (pdfplumber, rasterization, tesseract)
+    outside the event loop, with a bounded number of admitted jobs.
+
+    Configuration (environment):
+        OCR_EXECUTOR      "process" (default) or "thread"
+        OCR_WORKERS       pool size, defaults to the CPU count
+        OCR_QUEUE_LIMIT   jobs allowed to wait once all workers are busy
+        OCR_START_METHOD  multiprocessing start method (fork/spawn/forkserver)
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 kind: Optional[str] = None, initializer: Optional[Callable] = None,
+                 initargs: tuple = ()):
+        self.kind = (kind or os.getenv("OCR_EXECUTOR", "process")).lower()
+        self.max_workers = max_workers or int(os.getenv("OCR_WORKERS") or 0) or (os.cpu_count() or 1)
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("OCR_QUEUE_LIMIT", "8"))
+        self.start_method = os.getenv("OCR_START_METHOD") or None
+        # Runs once in every worker, e.g. to load the OCR engine
+        self.initializer = initializer
+        self.initargs = initargs
+        self._pool: Optional[Executor] = None
+        self._in_flight = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of jobs admitted at once (running + waiting)"""
+        return self.max_workers + self.max_queue
+
+    def _get_pool(self) -> Executor:
+        """Create the worker pool on first use so importing the app stays cheap"""
+        if self._pool is None:
+            if self.kind == "thread":
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="extraction",
+                    initializer=self.initializer,
+                    initargs=self.initargs,
+                )
+            else:
+                context = multiprocessing.get_context(self.start_method) if self.start_method else None
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=self.initializer,
+                    initargs=self.initargs,
+                )
+            logger.info(f"Started {self.kind} extraction pool with {self.max_workers} workers")
+        return self._pool
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Reserve a slot for one extraction job, or raise ExtractionQueueFull
+        so the caller can shed load instead of piling up work
+        """
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise ExtractionQueueFull(self._in_flight, self.capacity)
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run a picklable callable in the pool and await its result
+
+        A pool broken by a crashed worker is replaced, and the call retried
+        once on the new pool.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return await loop.run_in_executor(pool, _call_portably, fn, *args)
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                if attempt:
+                    raise
+                logger.warning("Extraction pool broke (a worker died); retrying on a new pool")
+
+    def _discard_pool(self, pool: Executor):
+        """Drop a broken pool so the next job starts a fresh one"""
+        # Jobs that failed on the same pool all land here; only the first replaces it
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Current load, for /health"""
+        return {
+            "executor": self.kind,
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "capacity": self.capacity,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        """Stop the pool, cancelling work that has not started yet"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
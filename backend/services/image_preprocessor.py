@@ -0,0 +1,182 @@
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# What cameras and editors write when they do not know the real resolution
+_PLACEHOLDER_DPIS = (72, 96)
+
+
+def _env_flag(name: str, default: str = "true") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    """Otsu's threshold for an 8-bit grayscale array, from its histogram"""
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 128
+    levels = np.arange(256, dtype=np.float64)
+    weight_background = np.cumsum(histogram)
+    weight_foreground = total - weight_background
+    cumulative_mean = np.cumsum(histogram * levels)
+    mean_background = cumulative_mean / np.maximum(weight_background, 1)
+    mean_foreground = (cumulative_mean[-1] - cumulative_mean) / np.maximum(weight_foreground, 1)
+    between_class_variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+    return int(np.argmax(between_class_variance))
+
+
+class ImagePreprocessor:
+    """
+    Prepares page images for Tesseract: grayscale, downscale to a target DPI,
+    binarize, deskew and crop to the inked region
+
+    Configuration (environment):
+        OCR_PREPROCESS          master switch for everything below
+        OCR_TARGET_DPI          resolution images are scaled down to
+        OCR_PAGE_LONG_SIDE_IN   assumed page length for images without DPI info
+        OCR_BINARIZE            apply an Otsu threshold
+        OCR_DESKEW              straighten pages up to OCR_MAX_SKEW degrees
+        OCR_CROP                crop to the content plus a small margin
+    """
+
+    def __init__(self):
+        self.enabled = _env_flag("OCR_PREPROCESS")
+        self.target_dpi = int(os.getenv("OCR_TARGET_DPI", "300"))
+        self.page_long_side_in = float(os.getenv("OCR_PAGE_LONG_SIDE_IN", "11"))
+        self.binarize = _env_flag("OCR_BINARIZE")
+        self.deskew = _env_flag("OCR_DESKEW")
+        self.max_skew = float(os.getenv("OCR_MAX_SKEW", "5"))
+        self.crop = _env_flag("OCR_CROP")
+
+    def settings_key(self) -> str:
+        """Every option that changes the output, for cache keys"""
+        if not self.enabled:
+            return "off"
+        return (
+            f"{self.target_dpi}:{self.page_long_side_in}:{int(self.binarize)}:"
+            f"{int(self.deskew)}:{self.max_skew}:{int(self.crop)}"
+        )
+
+    def _source_dpi(self, image: Image.Image, dpi: Optional[int]) -> float:
+        """Resolution of the image, from the caller, its metadata, or the assumed page size"""
+        if dpi:
+            return float(dpi)
+        info_dpi = image.info.get("dpi")
+        if info_dpi and info_dpi[0] and round(float(info_dpi[0])) not in _PLACEHOLDER_DPIS \
+                and float(info_dpi[0]) >= 72:
+            return float(info_dpi[0])
+        # Phone photos carry no useful DPI; assume the page fills the long side
+        return max(image.size) / self.page_long_side_in
+
+    def _target_size(self, image: Image.Image, dpi: Optional[int]) -> Optional[Tuple[int, int]]:
+        scale = self.target_dpi / self._source_dpi(image, dpi)
+        if scale >= 1:
+            return None
+        width, height = image.size
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def draft(self, image: Image.Image, dpi: Optional[int] = None):
+        """
+        Let the JPEG decoder produce a grayscale, reduced-size image directly
+
+        Must be called before the image is loaded; a no-op for other formats.
+        The recorded DPI is scaled with the image, so process() does not
+        shrink it a second time.
+        """
+        if not self.enabled or image.format != "JPEG":
+            return
+        target_size = self._target_size(image, dpi)
+        if target_size:
+            original_width, original_height = image.size
+            image.draft("L", target_size)
+            info_dpi = image.info.get("dpi")
+            if info_dpi and image.size != (original_width, original_height):
+                image.info["dpi"] = (
+                    float(info_dpi[0]) * image.width / original_width,
+                    float(info_dpi[1]) * image.height / original_height,
+                )
+
+    def process(self, image: Image.Image, dpi: Optional[int] = None) -> Tuple[Image.Image, Dict[str, float]]:
+        """
+        Run the enabled steps and return the processed image with the time
+        each step took, in milliseconds
+        """
+        timings: Dict[str, float] = {}
+        if not self.enabled:
+            return image, timings
+
+        def timed(step: str, started: float):
+            timings[step] = round((time.perf_counter() - started) * 1000, 2)
+
+        started = time.perf_counter()
+        if image.mode != "L":
+            image = image.convert("L")
+        timed("grayscale", started)
+
+        started = time.perf_counter()
+        target_size = self._target_size(image, dpi)
+        if target_size:
+            image = image.resize(target_size, Image.Resampling.LANCZOS)
+        timed("downscale", started)
+
+        pixels = np.asarray(image)
+        threshold = otsu_threshold(pixels)
+
+        if self.binarize:
+            started = time.perf_counter()
+            pixels = np.where(pixels > threshold, 255, 0).astype(np.uint8)
+            image = Image.fromarray(pixels)
+            timed("binarize", started)
+
+        if self.deskew:
+            started = time.perf_counter()
+            angle = self._estimate_skew(pixels, threshold)
+            if abs(angle) >= 0.3:
+                image = image.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=255)
+                pixels = np.asarray(image)
+            timed("deskew", started)
+
+        if self.crop:
+            started = time.perf_counter()
+            image = self._crop_to_content(image, pixels, threshold)
+            timed("crop", started)
+
+        return image, timings
+
+    def _estimate_skew(self, pixels: np.ndarray, threshold: int) -> float:
+        """
+        Skew angle in degrees by projection profile: text lines are level
+        when the row sums of ink vary the most
+        """
+        ink = Image.fromarray(np.where(pixels > threshold, 0, 255).astype(np.uint8))
+        # A small copy is plenty to find the angle
+        ink.thumbnail((800, 800))
+        angles = np.arange(-self.max_skew, self.max_skew + 0.25, 0.5)
+        scores = []
+        for angle in angles:
+            profile = np.asarray(ink.rotate(float(angle), resample=Image.Resampling.NEAREST)).sum(axis=1, dtype=np.float64)
+            scores.append(np.var(profile))
+        return float(angles[int(np.argmax(scores))])
+
+    def _crop_to_content(self, image: Image.Image, pixels: np.ndarray, threshold: int) -> Image.Image:
+        """Crop to the bounding box of dark pixels, keeping a small white margin"""
+        ink = pixels <= threshold
+        rows = np.flatnonzero(ink.any(axis=1))
+        columns = np.flatnonzero(ink.any(axis=0))
+        if rows.size == 0 or columns.size == 0:
+            return image
+        margin = max(10, min(image.size) // 50)
+        box = (
+            max(0, int(columns[0]) - margin),
+            max(0, int(rows[0]) - margin),
+            min(image.width, int(columns[-1]) + margin + 1),
+            min(image.height, int(rows[-1]) + margin + 1),
+        )
+        return image.crop(box)
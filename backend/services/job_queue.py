@@ -0,0 +1,370 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stages a job can run, in the order they run
+JOB_STAGES = ("extract", "simplify", "translate", "tts")
+
+# Jobs in these states never run again
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+_JSON_COLUMNS = ("stages", "options", "progress", "result")
+
+
+class JobStore:
+    """
+    Jobs in a single SQLite file, so queued and interrupted jobs survive a
+    restart
+
+    Every method is blocking; JobQueue calls them off the event loop where
+    it matters.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "stages TEXT NOT NULL, options TEXT NOT NULL, progress TEXT NOT NULL, result TEXT, "
+            "error TEXT, filename TEXT, content_type TEXT, digest TEXT, file_path TEXT, "
+            "cancel_requested INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created REAL NOT NULL, started REAL, finished REAL, updated REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for column in _JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job[column] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def create(self, stages: List[str], options: dict, priority: int, filename: Optional[str],
+               content_type: str, digest: str, file_path: str, job_id: Optional[str] = None) -> Dict[str, Any]:
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        progress = {stage: {"status": "pending"} for stage in stages}
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO jobs (id, status, priority, stages, options, progress, filename, "
+                "content_type, digest, file_path, created, updated) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, priority, json.dumps(stages), json.dumps(options), json.dumps(progress),
+                 filename, content_type, digest, file_path, now, now),
+            )
+            self._connection.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY created DESC LIMIT ?"
+        with self._lock:
+            rows = self._connection.execute(query, params + (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Mark the highest-priority, oldest queued job as running and return it"""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE jobs SET status = 'running', started = ?, updated = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (now, now, row["id"]),
+            )
+            self._connection.commit()
+        return self.get(row["id"])
+
+    def set_progress(self, job_id: str, progress: dict):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET progress = ?, updated = ? WHERE id = ?",
+                (json.dumps(progress), time.time(), job_id),
+            )
+            self._connection.commit()
+
+    def finish(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, updated = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, now, job_id),
+            )
+            self._connection.commit()
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job: queued jobs are cancelled at once, running ones are
+        flagged for their worker. Returns the job's status afterwards.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status = row["status"]
+            if status == "queued":
+                status = "cancelled"
+                self._connection.execute(
+                    "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished = ?, updated = ? "
+                    "WHERE id = ?",
+                    (now, now, job_id),
+                )
+            elif status == "running":
+                self._connection.execute(
+                    "UPDATE jobs SET cancel_requested = 1, updated = ? WHERE id = ?", (now, job_id)
+                )
+            self._connection.commit()
+        return status
+
+    def requeue(self, job_id: str):
+        """Put a running job back in the queue without counting the attempt"""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), updated = ? "
+                "WHERE id = ? AND status = 'running'",
+                (time.time(), job_id),
+            )
+            self._connection.commit()
+
+    def recover(self, max_attempts: int) -> Tuple[int, List[str]]:
+        """
+        Requeue jobs that were running when the previous process stopped
+
+        A job that has already been started max_attempts times is marked
+        failed instead, so a job that brings the process down cannot do so
+        forever. Returns the number requeued and the IDs of the failed jobs.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND attempts >= ?", (max_attempts,)
+            ).fetchall()
+            failed = [row["id"] for row in rows]
+            self._connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished = ?, updated = ? "
+                "WHERE status = 'running' AND attempts >= ?",
+                (f"Interrupted {max_attempts} times; not retried", now, now, max_attempts),
+            )
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'running'", (now,)
+            )
+            self._connection.commit()
+        return cursor.rowcount, failed
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation was requested"""
+
+
+class JobContext:
+    """
+    What a running job's handler uses to report progress and honour cancellation
+
+    Progress is saved on a worker thread; updates made while a save is in
+    flight are written together by the next one.
+    """
+
+    def __init__(self, store: JobStore, job: Dict[str, Any]):
+        self.store = store
+        self.job = job
+        self.progress: dict = job["progress"] or {}
+        self._dirty = False
+        self._saving: Optional[asyncio.Future] = None
+
+    def update(self, stage: str, **fields):
+        """Merge fields into one stage's progress and schedule saving it"""
+        self.progress.setdefault(stage, {}).update(fields)
+        self._dirty = True
+        if self._saving is None or self._saving.done():
+            self._saving = asyncio.ensure_future(self._save())
+
+    async def _save(self):
+        while self._dirty:
+            self._dirty = False
+            # Copied here, so the thread never sees a stage mid-update
+            snapshot = {stage: dict(fields) for stage, fields in self.progress.items()}
+            try:
+                await asyncio.to_thread(self.store.set_progress, self.job["id"], snapshot)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not save progress of job {self.job['id']}: {str(e)}")
+
+    async def flush(self):
+        """Wait until every progress update so far is saved"""
+        if self._saving is not None:
+            await asyncio.shield(self._saving)
+
+    def start(self, stage: str, **fields):
+        self.update(stage, status="running", started=time.time(), **fields)
+
+    def complete(self, stage: str, **fields):
+        started = self.progress.get(stage, {}).get("started")
+        seconds = round(time.time() - started, 3) if started else None
+        self.update(stage, status="completed", seconds=seconds, **fields)
+
+    async def check_cancelled(self):
+        job = await asyncio.to_thread(self.store.get, self.job["id"])
+        if job is None or job["cancel_requested"]:
+            raise JobCancelled()
+
+
+JobHandler = Callable[[Dict[str, Any], JobContext], Awaitable[dict]]
+
+
+class JobQueue:
+    """
+    Local worker pool that runs jobs from a JobStore
+
+    Workers claim the highest-priority queued job, run the handler and
+    record its result. A job running when the process stops is requeued on
+    the next start, so its stages run again (cached steps return quickly);
+    one that was interrupted JOBS_MAX_ATTEMPTS times is marked failed.
+
+    Configuration (environment):
+        JOBS_DIR           directory for the job database and uploaded files
+                           (defaults to a temp directory)
+        JOBS_WORKERS       jobs run at once
+        JOBS_MAX_ATTEMPTS  times a job is started before it is given up on
+    """
+
+    def __init__(self, handler: JobHandler, directory: Optional[str] = None, workers: Optional[int] = None):
+        self.handler = handler
+        self.directory = directory or os.getenv("JOBS_DIR") or os.path.join(tempfile.gettempdir(), "medlens-jobs")
+        self.files_directory = os.path.join(self.directory, "files")
+        os.makedirs(self.files_directory, exist_ok=True)
+        self.store = JobStore(os.path.join(self.directory, "jobs.sqlite3"))
+        self.workers = workers or int(os.getenv("JOBS_WORKERS", "2"))
+        self.max_attempts = max(1, int(os.getenv("JOBS_MAX_ATTEMPTS") or 3))
+        self._wakeup = asyncio.Event()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    def file_path(self, job_id: str) -> str:
+        """Where a job's uploaded file is kept until the job finishes"""
+        return os.path.join(self.files_directory, job_id)
+
+    def start(self):
+        recovered, failed = self.store.recover(self.max_attempts)
+        if recovered:
+            logger.info(f"Requeued {recovered} jobs interrupted by the last shutdown")
+        for job_id in failed:
+            logger.error(f"Job {job_id} was interrupted {self.max_attempts} times; marked failed")
+            self._remove_file(job_id)
+        self._stopping = False
+        self._worker_tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._wakeup.set()
+
+    async def stop(self):
+        """Stop the workers; jobs still running are requeued on the next start"""
+        self._stopping = True
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, **job_fields) -> Dict[str, Any]:
+        job = self.store.create(**job_fields)
+        self._wakeup.set()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        status = self.store.request_cancel(job_id)
+        task = self._running.get(job_id)
+        if status == "running" and task is not None:
+            task.cancel()
+        elif status == "cancelled":
+            self._remove_file(job_id)
+        return status
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    # Poll now and then as well, in case a wakeup is missed
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        context = JobContext(self.store, job)
+        task = asyncio.ensure_future(self.handler(job, context))
+        self._running[job_id] = task
+        logger.info(f"Running job {job_id} ({', '.join(job['stages'])})")
+        try:
+            result = await task
+            await context.flush()
+            await asyncio.to_thread(self.store.finish, job_id, "completed", result=result)
+            logger.info(f"Job {job_id} completed")
+        except (asyncio.CancelledError, JobCancelled):
+            if self._stopping:
+                # A clean shutdown does not use up one of the job's attempts
+                self.store.requeue(job_id)
+                raise
+            await context.flush()
+            await asyncio.to_thread(self.store.finish, job_id, "cancelled")
+            logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await context.flush()
+            await asyncio.to_thread(self.store.finish, job_id, "failed", error=str(e))
+        finally:
+            self._running.pop(job_id, None)
+        self._remove_file(job_id)
+
+    def _remove_file(self, job_id: str):
+        try:
+            os.unlink(self.file_path(job_id))
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        """Queue depth and job counts for /health"""
+        counts = self.store.counts()
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "queued": counts.get("queued", 0),
+            "jobs": counts,
+        }
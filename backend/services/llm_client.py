@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, Optional
+
+import google.generativeai as genai
+
+from services.metrics import LLM_TOKENS, record_stage, timed
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: rate limits and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMClient:
+    """
+    Shared, non-blocking Gemini client
+
+    Configures the SDK once and hands out async calls bounded by a global
+    concurrency limit, with a timeout per call and jittered exponential
+    backoff on rate limits and 5xx errors.
+
+    Configuration (environment):
+        GEMINI_MODEL           model name
+        LLM_MAX_CONCURRENCY    Gemini calls in flight across the whole process
+        LLM_TIMEOUT            seconds allowed per attempt
+        LLM_MAX_RETRIES        retries after the first attempt
+        LLM_RETRY_BASE_DELAY   backoff before the first retry, in seconds
+        GEMINI_API_ENDPOINT    alternative API host, e.g. a local stand-in for benchmarks
+    """
+
+    def __init__(self):
+        self.model = None
+        self.model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.timeout = float(os.getenv("LLM_TIMEOUT", "60"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.retry_base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._retries = 0
+        self._failures = 0
+        # A custom endpoint is reached over REST, which the SDK only supports synchronously
+        self.api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        self._use_async = not self.api_endpoint
+        self._initialize_client()
+
+    def _initialize_client(self):
+        """Initialize Gemini client with API key"""
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key and api_key != "your_gemini_api_key_here":
+            if self.api_endpoint:
+                genai.configure(api_key=api_key, transport="rest",
+                                client_options={"api_endpoint": self.api_endpoint})
+            else:
+                genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel(self.model_name)
+            logger.info(f"Gemini client initialized successfully ({self.model_name})")
+        else:
+            logger.warning("Gemini API key not found. AI features will be disabled.")
+
+    def is_configured(self) -> bool:
+        """Check if the Gemini client is properly configured"""
+        return self.model is not None
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, asyncio.TimeoutError):
+            return True
+        # google.api_core errors carry the HTTP status as .code
+        return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, self.retry_base_delay * (2 ** attempt))
+
+    async def _call(self, prompt: str):
+        """One generate_content attempt without blocking the event loop"""
+        if self._use_async and hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt)
+        # Older SDKs (and the REST transport) only have the blocking call; run it in a thread instead
+        return await asyncio.to_thread(self.model.generate_content, prompt)
+
+    def _record_usage(self, usage):
+        """Token counts from a response's usage_metadata, when the SDK provides it"""
+        prompt_tokens = getattr(usage, "prompt_token_count", 0)
+        response_tokens = getattr(usage, "candidates_token_count", 0)
+        if prompt_tokens or response_tokens:
+            LLM_TOKENS.observe(prompt_tokens, direction="in")
+            LLM_TOKENS.observe(response_tokens, direction="out")
+
+    async def generate(self, prompt: str) -> str:
+        """
+        Generate a response for prompt and return its text
+
+        Raises the last error once retries are exhausted.
+        """
+        if not self.is_configured():
+            raise Exception("AI service not configured")
+
+        # One observation per call, backoff included; retries are counted separately (llm_retries_total)
+        with timed("llm_generate"):
+            attempt = 0
+            while True:
+                try:
+                    async with self._semaphore:
+                        self._in_flight += 1
+                        try:
+                            response = await asyncio.wait_for(self._call(prompt), timeout=self.timeout)
+                        finally:
+                            self._in_flight -= 1
+                    self._record_usage(getattr(response, "usage_metadata", None))
+                    return response.text
+
+                except Exception as e:
+                    if attempt >= self.max_retries or not self._is_retryable(e):
+                        self._failures += 1
+                        raise
+                    delay = self._backoff_delay(attempt)
+                    attempt += 1
+                    self._retries += 1
+                    logger.warning(f"Gemini call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+    def _chunk_text(self, chunk) -> str:
+        """Text of a streamed chunk; chunks without parts (e.g. the final one) have none"""
+        try:
+            return chunk.text
+        except (AttributeError, ValueError):
+            return ""
+
+    async def _start_stream(self, prompt: str) -> AsyncIterator:
+        """Open a streaming generate_content call as an async iterator of chunks"""
+        if self._use_async and hasattr(self.model, "generate_content_async"):
+            return (await self.model.generate_content_async(prompt, stream=True)).__aiter__()
+
+        # Older SDKs (and the REST transport) only stream synchronously; pull each chunk in a thread
+        response = await asyncio.to_thread(self.model.generate_content, prompt, stream=True)
+        chunks = iter(response)
+
+        async def iterate():
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+
+        return iterate()
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Generate a response for prompt, yielding text chunks as they arrive
+
+        LLM_TIMEOUT applies to the wait for each chunk. Failures are retried
+        only until the first chunk has been yielded.
+        """
+        if not self.is_configured():
+            raise Exception("AI service not configured")
+
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._semaphore:
+                    self._in_flight += 1
+                    opened = time.perf_counter()
+                    usage = None
+                    try:
+                        chunks = await asyncio.wait_for(self._start_stream(prompt), timeout=self.timeout)
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                            except StopAsyncIteration:
+                                break
+                            # Every chunk may carry usage; the last one has the totals
+                            usage = getattr(chunk, "usage_metadata", None) or usage
+                            text = self._chunk_text(chunk)
+                            if text:
+                                if not started:
+                                    record_stage("llm_first_chunk", time.perf_counter() - opened)
+                                started = True
+                                yield text
+                    finally:
+                        self._in_flight -= 1
+                        record_stage("llm_stream", time.perf_counter() - opened)
+                self._record_usage(usage)
+                return
+
+            except Exception as e:
+                if started or attempt >= self.max_retries or not self._is_retryable(e):
+                    self._failures += 1
+                    raise
+                delay = self._backoff_delay(attempt)
+                attempt += 1
+                self._retries += 1
+                logger.warning(f"Gemini stream failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Current load, for /health"""
+        return {
+            "model": self.model_name,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "retries": self._retries,
+            "failures": self._failures,
+        }
+
+
+_shared_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """The process-wide client shared by AIService and TranslationService"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = LLMClient()
+    return _shared_client
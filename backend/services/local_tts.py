@@ -0,0 +1,99 @@
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """Wrap raw little-endian PCM in a WAV container browsers can play"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=8)
+def tone_wav(frequency: float = 440.0, duration: float = 1.0, sample_rate: int = 22050,
+             amplitude: float = 0.1) -> bytes:
+    """A sine tone as 16-bit mono WAV, generated in one NumPy pass"""
+    t = np.arange(int(sample_rate * duration), dtype=np.float64) / sample_rate
+    samples = (32767 * amplitude * np.sin(2 * np.pi * frequency * t)).astype("<i2")
+    return pcm_to_wav(samples.tobytes(), sample_rate)
+
+
+def audio_media_type(audio: bytes) -> str:
+    """WAV from the local engines, MPEG from ElevenLabs"""
+    return "audio/wav" if audio[:4] == b"RIFF" else "audio/mpeg"
+
+
+class LocalSpeechEngine:
+    """
+    Offline speech synthesis through espeak-ng or piper, used when
+    ElevenLabs is not configured, rate-limited or failing
+
+    Both run as a subprocess per request and return WAV.
+
+    Configuration (environment):
+        LOCAL_TTS_ENGINE       "auto" (default), "piper", "espeak" or "none"
+        LOCAL_TTS_PIPER_MODEL  piper .onnx voice model (piper is only used with one)
+        LOCAL_TTS_TIMEOUT      seconds before a synthesis is abandoned
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        requested = (backend or os.getenv("LOCAL_TTS_ENGINE", "auto")).lower()
+        self.piper_model = os.getenv("LOCAL_TTS_PIPER_MODEL")
+        self.timeout = float(os.getenv("LOCAL_TTS_TIMEOUT", "30"))
+        self.piper = shutil.which("piper")
+        self.espeak = shutil.which("espeak-ng") or shutil.which("espeak")
+
+        self.backend = None
+        if requested in ("auto", "piper") and self.piper and self.piper_model:
+            self.backend = "piper"
+        elif requested in ("auto", "espeak") and self.espeak:
+            self.backend = "espeak"
+        if requested not in ("auto", "none") and self.backend != requested:
+            logger.warning(f"LOCAL_TTS_ENGINE={requested} is not available, using {self.backend or 'no local engine'}")
+        if self.backend:
+            logger.info(f"Local speech engine: {self.backend}")
+
+    @property
+    def available(self) -> bool:
+        return self.backend is not None
+
+    def synthesize(self, text: str, language: Optional[str] = None) -> bytes:
+        """WAV audio for text (blocking; run it off the event loop)"""
+        if self.backend == "piper":
+            return self._piper(text)
+        if self.backend == "espeak":
+            return self._espeak(text, language)
+        raise RuntimeError("No local speech engine available")
+
+    def _espeak(self, text: str, language: Optional[str]) -> bytes:
+        command = [self.espeak, "--stdout", "--stdin", "-v", language or "en"]
+        result = subprocess.run(command, input=text.encode("utf-8"), capture_output=True,
+                                timeout=self.timeout, check=True)
+        return result.stdout
+
+    def _piper(self, text: str) -> bytes:
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            command = [self.piper, "--model", self.piper_model, "--output_file", path]
+            subprocess.run(command, input=text.encode("utf-8"), capture_output=True,
+                           timeout=self.timeout, check=True)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.unlink(path)
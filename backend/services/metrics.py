@@ -0,0 +1,277 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds, from a cache lookup up to a long multi-page OCR run
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+LabelValues = Tuple[str, ...]
+# A collected sample: metric name suffix, labels and value
+Sample = Tuple[str, Dict[str, str], float]
+
+# Stage durations of the request being handled, for its Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+# Tasks and pool threads of one request update its timings together
+_timings_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A total that only goes up"""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        return [("", self._labels(key), value) for key, value in values]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as work in flight"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in flight while it runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        return [("", self._labels(key), value) for key, value in values]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, plus their sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: a count per bucket (not cumulative), then the sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            total[0] += value
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+# Returns (name, type, help, samples) for metrics read from elsewhere at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process, rendered in the Prometheus text format
+
+    Each worker process has its own registry; pool workers report their
+    timings back to the parent, which records them here.
+    """
+
+    def __init__(self, prefix: str = "medlens_"):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name + "_total", documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self.prefix + name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        """Call collector on every scrape, e.g. to report stats() kept by a service"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families = [(metric.name, metric.kind, metric.documentation, metric.samples())
+                    for metric in list(self._metrics.values())]
+        for collector in self._collectors:
+            families.extend((self.prefix + name, kind, documentation, samples)
+                            for name, kind, documentation, samples in collector())
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Time spent in each processing stage", ["stage"]
+)
+LLM_TOKENS = registry.histogram(
+    "llm_tokens", "Tokens per Gemini request, by direction (in: prompt, out: response)",
+    ["direction"], buckets=TOKEN_BUCKETS
+)
+DEMO_FALLBACKS = registry.counter(
+    "demo_fallbacks", "Times a service answered with its demo fallback instead of real output", ["service"]
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests being handled right now")
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Time to produce a response (before streamed bodies)",
+    ["method", "route", "status"]
+)
+
+
+def record_stage(stage: str, seconds: float):
+    """Observe a stage duration, and add it to the current request's Server-Timing"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        # Shared by reference with tasks and threads started during the request
+        with _timings_lock:
+            entry = timings.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+
+def record_step_timings(prefix: str, timings_ms: Dict[str, float]):
+    """Record per-step millisecond timings reported by a pool worker, as prefix_step stages"""
+    for step, elapsed_ms in timings_ms.items():
+        record_stage(f"{prefix}_{step}", elapsed_ms / 1000)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record how long the enclosed block takes as stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def start_request_timing() -> contextvars.Token:
+    """Start collecting stage timings for the request handled in this context"""
+    return _request_timings.set({})
+
+
+def server_timing_header(token: contextvars.Token, total_seconds: float) -> str:
+    """
+    The Server-Timing value for the request started with token, and stop
+    collecting for it
+
+    Stages run several times (pages, segments) are summed, with the count in
+    desc; stages that run in parallel can add up to more than the total.
+    """
+    with _timings_lock:
+        timings = {stage: tuple(entry) for stage, entry in (_request_timings.get() or {}).items()}
+    _request_timings.reset(token)
+    entries = []
+    for stage, (seconds, count) in timings.items():
+        entry = f"{stage};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count}x"'
+        entries.append(entry)
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
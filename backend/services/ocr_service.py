@@ -1,132 +1,397 @@
-import pytesseract
+import asyncio
+import hashlib
 from PIL import Image
-import io
 import logging
-import subprocess
-import tempfile
+import time
 import os
 import pdfplumber
-from typing import Optional
+import pypdfium2 as pdfium
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from services.cache import DiskCache, LRUCache, TieredCache
+from services.document_source import DocumentSource
+from services.executor import ExtractionExecutor
+from services.image_preprocessor import ImagePreprocessor
+from services.metrics import DEMO_FALLBACKS, record_step_timings, timed
+from services.tesseract_engine import get_engine, warm_up_engine
 
 logger = logging.getLogger(__name__)
 
+# Bump when extraction output changes so stale cache entries stop matching
+EXTRACTION_VERSION = "5"
+
+def _image_coverage(page) -> float:
+    """Fraction of the page area covered by embedded images (0.0 - 1.0)"""
+    page_area = float(page.width * page.height) or 1.0
+    image_area = 0.0
+    for image in page.images:
+        width = max(0.0, min(image["x1"], page.width) - max(image["x0"], 0))
+        height = max(0.0, min(image["bottom"], page.height) - max(image["top"], 0))
+        image_area += width * height
+    return min(1.0, image_area / page_area)
+
+
+def _pdf_text_job(source: DocumentSource) -> List[Tuple[str, float]]:
+    """
+    Extract the text layer of every PDF page with pdfplumber (runs in the extraction pool)
+
+    Returns (text, image coverage) per page; text is empty for pages
+    without a text layer.
+    """
+    with source.open() as stream, pdfplumber.open(stream) as pdf:
+        return [(page.extract_text() or "", _image_coverage(page)) for page in pdf.pages]
+
+
+def _pdf_page_count_job(source: DocumentSource) -> int:
+    """
+    Count PDF pages without extracting or rasterizing anything
+    """
+    with source.open() as stream:
+        pdf = pdfium.PdfDocument(stream)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def _ocr_image(image: Image.Image, lang: str, preprocessor: ImagePreprocessor,
+               dpi: Optional[int] = None) -> Tuple[str, Dict[str, float]]:
+    """
+    Preprocess an image and run tesseract on it
+
+    Returns the text and per-step timings in milliseconds.
+    """
+    image, timings = preprocessor.process(image, dpi=dpi)
+
+    # Tesseract wants RGB or grayscale
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    started = time.perf_counter()
+    text = get_engine(lang).image_to_string(image)
+    timings["tesseract"] = round((time.perf_counter() - started) * 1000, 2)
+    return text, timings
+
+
+def _pdf_page_ocr_job(source: DocumentSource, page_number: int, dpi: int, lang: str,
+                      preprocessor: ImagePreprocessor) -> Tuple[str, Dict[str, float]]:
+    """
+    Rasterize a single PDF page and OCR it (runs in the extraction pool)
+
+    The page is rendered by pypdfium2 straight from the source buffer, and
+    only this one page image is ever held in memory by the worker. pdfium
+    loads just the page asked for, so a job costs the same on page 60 as
+    on page 1.
+    """
+    started = time.perf_counter()
+    with source.open() as stream:
+        pdf = pdfium.PdfDocument(stream)
+        try:
+            page = pdf[page_number - 1]
+            # The image shares the bitmap's memory, which lives as long as bitmap does
+            bitmap = page.render(scale=dpi / 72)
+            image = bitmap.to_pil()
+            page.close()
+        finally:
+            pdf.close()
+    rasterize_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    text, timings = _ocr_image(image, lang, preprocessor, dpi=dpi)
+    timings["rasterize"] = rasterize_ms
+    return text, timings
+
+
+def _image_ocr_job(source: DocumentSource, lang: str,
+                   preprocessor: ImagePreprocessor) -> Tuple[str, Dict[str, float]]:
+    """
+    OCR a single uploaded image (runs in the extraction pool)
+    """
+    started = time.perf_counter()
+    with source.open() as stream:
+        image = Image.open(stream)
+        # Large JPEGs can be decoded straight to a smaller grayscale image
+        preprocessor.draft(image)
+        image.load()
+    decode_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    text, timings = _ocr_image(image, lang, preprocessor)
+    timings["decode"] = decode_ms
+    return text, timings
+
+
+def _sum_timings(timings_list: List[Dict[str, float]]) -> Dict[str, float]:
+    """Total time per step across several pages"""
+    totals: Dict[str, float] = {}
+    for timings in timings_list:
+        for step, elapsed in timings.items():
+            totals[step] = round(totals.get(step, 0.0) + elapsed, 2)
+    return totals
+
+
 class OCRService:
-    def __init__(self):
+    def __init__(self, executor: Optional[ExtractionExecutor] = None):
         # Configure tesseract path if needed (uncomment and adjust for your system)
         # pytesseract.pytesseract.tesseract_cmd = r'/usr/local/bin/tesseract'
-        pass
+        # All pdfplumber/pypdfium2/tesseract work runs here, never on the event loop
+        self.lang = os.getenv("OCR_LANG", "eng")
+        # Each worker loads Tesseract once and keeps it for every page
+        self.executor = executor or ExtractionExecutor(initializer=warm_up_engine, initargs=(self.lang,))
+        self.dpi = int(os.getenv("OCR_DPI", "200"))
+        # Pages rasterized + OCR'd concurrently per document; bounds peak memory
+        self.pages_in_flight = int(os.getenv("OCR_PAGES_IN_FLIGHT") or 0) or self.executor.max_workers
+        # Uploads larger than this are spilled to one mmap'd file instead of
+        # being pickled to every pool worker
+        self.spill_threshold = int(float(os.getenv("OCR_SPILL_THRESHOLD_MB", "8")) * 1024 * 1024)
+        # Per-page routing: pages below these thresholds are OCR'd instead of
+        # trusting their text layer
+        self.min_page_chars = int(os.getenv("OCR_MIN_PAGE_CHARS", "20"))
+        self.scanned_page_coverage = float(os.getenv("OCR_SCANNED_PAGE_COVERAGE", "0.5"))
+        self.min_scanned_page_chars = int(os.getenv("OCR_MIN_SCANNED_PAGE_CHARS", "200"))
+        self.preprocessor = ImagePreprocessor()
+        self.cache = self._create_cache()
+
+    def _create_cache(self) -> TieredCache:
+        """Extracted-text cache: memory LRU, plus a disk tier when OCR_CACHE_DIR is set"""
+        memory = LRUCache(max_entries=int(os.getenv("OCR_CACHE_ENTRIES", "128")))
+        disk = None
+        cache_dir = os.getenv("OCR_CACHE_DIR")
+        if cache_dir:
+            max_bytes = int(os.getenv("OCR_CACHE_MAX_MB", "256")) * 1024 * 1024
+            disk = DiskCache(cache_dir, max_bytes=max_bytes)
+        return TieredCache(
+            memory,
+            disk,
+            serialize=lambda text: text.encode("utf-8"),
+            deserialize=lambda data: data.decode("utf-8"),
+        )
+
+    def cache_key(self, content_digest: str, content_type: str) -> str:
+        """Cache key from the upload's SHA-256 plus every setting that affects the output"""
+        settings = (
+            f"{content_digest}:{content_type}:{self.lang}:{self.dpi}:"
+            f"{self.min_page_chars}:{self.scanned_page_coverage}:{self.min_scanned_page_chars}:"
+            f"{self.preprocessor.settings_key()}:{EXTRACTION_VERSION}"
+        )
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest()
     
-    async def extract_text(self, file_content: bytes, content_type: str) -> str:
+    async def extract_text(self, file_content: Union[bytes, DocumentSource], content_type: str,
+                           content_digest: Optional[str] = None,
+                           progress: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Extract text from PDF or image files using OCR
+
+        file_content may be raw bytes or a DocumentSource prepared by the
+        upload reader; a source passed in stays owned by the caller.
+        Results are cached by content hash, so repeat uploads skip extraction.
+        progress, if given, is called with (pages done, total pages) as
+        pages finish, and once with the page count on a cache hit. Raises
+        ExtractionQueueFull when the extraction pool is saturated.
         """
+        if isinstance(file_content, DocumentSource):
+            source = file_content
+            owns_source = False
+        else:
+            # Uploads over OCR_SPILL_THRESHOLD_MB are written once to a spill
+            # file that every stage maps instead of copying
+            source = await asyncio.to_thread(DocumentSource.from_bytes, file_content, self.spill_threshold)
+            owns_source = True
+
         try:
-            if content_type == "application/pdf":
-                return await self._extract_from_pdf(file_content)
-            elif content_type in ["image/jpeg", "image/png", "image/jpg"]:
-                return await self._extract_from_image(file_content)
-            else:
-                raise ValueError(f"Unsupported content type: {content_type}")
-                
-        except Exception as e:
-            logger.error(f"OCR extraction failed: {str(e)}")
-            raise
+            if content_digest is None:
+                content_digest = await asyncio.to_thread(source.sha256)
+            key = self.cache_key(content_digest, content_type)
+
+            cached_text = await asyncio.to_thread(self.cache.get, key)
+            if cached_text is not None:
+                logger.info(f"Extraction cache hit for {content_digest[:12]}")
+                if progress:
+                    page_count = await self._page_count(source, content_type)
+                    progress(page_count, page_count)
+                return cached_text
+
+            async with self.executor.admit():
+                try:
+                    if content_type == "application/pdf":
+                        extracted_text = await self._extract_from_pdf(source, progress)
+                    elif content_type in ["image/jpeg", "image/png", "image/jpg"]:
+                        extracted_text = await self._extract_from_image(source)
+                        if progress:
+                            progress(1, 1)
+                    else:
+                        raise ValueError(f"Unsupported content type: {content_type}")
+
+                except Exception as e:
+                    logger.error(f"OCR extraction failed: {str(e)}")
+                    raise
+
+            # Never cache the demo fallback, only real extraction results
+            if extracted_text.strip() and not self.is_sample_text(extracted_text):
+                await asyncio.to_thread(self.cache.set, key, extracted_text)
+            return extracted_text
+        finally:
+            if owns_source:
+                source.close()
     
-    async def _extract_from_pdf(self, pdf_content: bytes) -> str:
+    def is_sample_text(self, text: str) -> bool:
+        """Whether text is the sample report returned when extraction fails outright"""
+        return text == self._get_sample_medical_text()
+
+    async def _page_count(self, source: DocumentSource, content_type: str) -> int:
+        """Pages in a document (1 for an image), or 0 when the PDF cannot be read"""
+        if content_type != "application/pdf":
+            return 1
+        try:
+            return await self.executor.run(_pdf_page_count_job, source)
+        except Exception as e:
+            logger.warning(f"Could not count PDF pages: {str(e)}")
+            return 0
+
+    def _needs_ocr(self, page_text: str, image_coverage: float) -> bool:
+        """
+        Whether a page's text layer is too thin to trust
+
+        Pages with almost no text are OCR'd, as are mostly-image pages whose
+        text layer is only a stamp, header or page number on top of a scan.
+        """
+        text_length = len(page_text.strip())
+        if text_length < self.min_page_chars:
+            return True
+        return image_coverage >= self.scanned_page_coverage and text_length < self.min_scanned_page_chars
+
+    async def _extract_from_pdf(self, source: DocumentSource,
+                                progress: Optional[Callable[[int, int], None]] = None) -> str:
         """
-        Extract text from PDF using pdfplumber
+        Extract text from PDF, routing each page separately
+
+        Pages with a usable text layer come straight from pdfplumber; only
+        image-only or near-empty pages are rasterized and OCR'd.
         """
         try:
-            # Create a temporary file for the PDF
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-                temp_file.write(pdf_content)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Extract text using pdfplumber
-                extracted_text = ""
-                with pdfplumber.open(temp_file_path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            extracted_text += page_text + "\n"
-                
-                if extracted_text.strip():
-                    logger.info(f"Successfully extracted {len(extracted_text)} characters from PDF")
-                    return extracted_text.strip()
-                else:
-                    logger.warning("No text found in PDF, trying OCR fallback")
-                    # Fallback to OCR if no text found
-                    return await self._extract_from_pdf_ocr(pdf_content)
-                    
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+            with timed("pdf_text"):
+                pages = await self.executor.run(_pdf_text_job, source)
+            ocr_page_numbers = [
+                page_number
+                for page_number, (page_text, image_coverage) in enumerate(pages, start=1)
+                if self._needs_ocr(page_text, image_coverage)
+            ]
+
+            if progress:
+                progress(len(pages) - len(ocr_page_numbers), len(pages))
+
+            if not ocr_page_numbers:
+                extracted_text = "".join(page_text + "\n" for page_text, _ in pages if page_text)
+                logger.info(f"Successfully extracted {len(extracted_text)} characters from PDF")
+                return extracted_text.strip()
+
+            if len(ocr_page_numbers) == len(pages):
+                logger.warning("No usable text layer in PDF, trying OCR fallback")
+                # Fallback to OCR if no text found
+                return await self._extract_from_pdf_ocr(source, len(pages), progress)
+
+            logger.info(f"OCR'ing {len(ocr_page_numbers)} of {len(pages)} PDF pages without a usable text layer")
+            ocr_texts = dict(zip(
+                ocr_page_numbers,
+                await self._ocr_pages(source, ocr_page_numbers, progress, len(pages) - len(ocr_page_numbers), len(pages))
+            ))
+
+            extracted_text = ""
+            for page_number, (page_text, _) in enumerate(pages, start=1):
+                # Keep the thin text layer if OCR found nothing better
+                if page_number in ocr_texts and ocr_texts[page_number].strip():
+                    page_text = ocr_texts[page_number]
+                if page_text.strip():
+                    extracted_text += f"--- Page {page_number} ---\n{page_text}\n\n"
+
+            logger.info(f"Successfully extracted {len(extracted_text)} characters from mixed PDF")
+            return extracted_text.strip()
             
         except Exception as e:
             logger.error(f"PDF text extraction failed: {str(e)}")
             # Try OCR fallback
             try:
-                return await self._extract_from_pdf_ocr(pdf_content)
+                return await self._extract_from_pdf_ocr(source, progress=progress)
             except Exception as ocr_error:
                 logger.error(f"OCR fallback also failed: {str(ocr_error)}")
+                DEMO_FALLBACKS.inc(service="ocr")
                 return self._get_sample_medical_text()
     
-    async def _extract_from_pdf_ocr(self, pdf_content: bytes) -> str:
+    async def _extract_from_pdf_ocr(self, source: DocumentSource, page_count: Optional[int] = None,
+                                    progress: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Extract text from PDF using OCR (fallback method)
+
+        Pages are rasterized one at a time and OCR'd in parallel across the
+        extraction pool, then reassembled in page order.
         """
         try:
-            # Create a temporary file for the PDF
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-                temp_file.write(pdf_content)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Convert PDF to images and extract text using OCR
-                from pdf2image import convert_from_path
-                
-                # Convert PDF to images
-                images = convert_from_path(temp_file_path)
-                
-                extracted_text = ""
-                for i, image in enumerate(images):
-                    # Extract text from each page
-                    page_text = pytesseract.image_to_string(image, lang='eng')
-                    if page_text.strip():
-                        extracted_text += f"--- Page {i+1} ---\n{page_text}\n\n"
-                
-                if extracted_text.strip():
-                    logger.info(f"Successfully extracted text from PDF using OCR")
-                    return extracted_text.strip()
-                else:
-                    logger.warning("No text found in PDF using OCR")
-                    return self._get_sample_medical_text()
-                    
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+            if page_count is None:
+                page_count = await self.executor.run(_pdf_page_count_job, source)
+
+            page_texts = await self._ocr_pages(source, range(1, page_count + 1), progress, 0, page_count)
+
+            extracted_text = ""
+            for page_number, page_text in zip(range(1, page_count + 1), page_texts):
+                if page_text.strip():
+                    extracted_text += f"--- Page {page_number} ---\n{page_text}\n\n"
+
+            if extracted_text.strip():
+                logger.info(f"Successfully extracted text from {page_count} PDF pages using OCR")
+                return extracted_text.strip()
+            else:
+                logger.warning("No text found in PDF using OCR")
+                DEMO_FALLBACKS.inc(service="ocr")
+                return self._get_sample_medical_text()
             
         except Exception as e:
             logger.error(f"PDF OCR extraction failed: {str(e)}")
+            DEMO_FALLBACKS.inc(service="ocr")
             return self._get_sample_medical_text()
+
+    async def _ocr_pages(self, source: DocumentSource, page_numbers,
+                         progress: Optional[Callable[[int, int], None]] = None,
+                         pages_done: int = 0, pages_total: int = 0) -> List[str]:
+        """
+        OCR the given pages with at most pages_in_flight running at once
+
+        Results come back in the order of page_numbers. A page that fails is
+        logged and contributes no text rather than failing the whole document.
+        progress is called as each page finishes, counting on from pages_done.
+        """
+        semaphore = asyncio.Semaphore(self.pages_in_flight)
+        done = pages_done
+
+        async def ocr_page(page_number: int) -> Tuple[str, Dict[str, float]]:
+            nonlocal done
+            async with semaphore:
+                try:
+                    result = await self.executor.run(
+                        _pdf_page_ocr_job, source, page_number, self.dpi, self.lang, self.preprocessor
+                    )
+                except Exception as e:
+                    logger.error(f"OCR failed for page {page_number}: {str(e)}")
+                    result = "", {}
+            # Rasterize, preprocessing and tesseract times for this page, measured in the worker
+            record_step_timings("ocr", result[1])
+            done += 1
+            if progress:
+                progress(done, pages_total)
+            return result
+
+        results = await asyncio.gather(*(ocr_page(page_number) for page_number in page_numbers))
+        logger.info(f"OCR step timings (ms, summed over {len(results)} pages): "
+                    f"{_sum_timings([timings for _, timings in results])}")
+        return [text for text, _ in results]
     
-    async def _extract_from_image(self, image_content: bytes) -> str:
+    async def _extract_from_image(self, source: DocumentSource) -> str:
         """
         Extract text from image files
         """
         try:
-            # Open image with PIL
-            image = Image.open(io.BytesIO(image_content))
-            
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Extract text using tesseract
-            extracted_text = pytesseract.image_to_string(image, lang='eng')
+            extracted_text, timings = await self.executor.run(
+                _image_ocr_job, source, self.lang, self.preprocessor
+            )
+            logger.info(f"Image OCR step timings (ms): {timings}")
+            record_step_timings("ocr", timings)
             
             return extracted_text.strip()
             
@@ -0,0 +1,69 @@
+import re
+from typing import List
+
+# All-caps headings such as "HISTORY OF PRESENT ILLNESS:" or "DISCHARGE MEDICATIONS:",
+# and the "--- Page N ---" markers OCRService puts between scanned pages
+_SECTION_BOUNDARY = re.compile(
+    r"^(?:[ \t]*[A-Z][A-Z0-9 /&(),'-]{3,60}:|[ \t]*--- Page \d+ ---)",
+    re.MULTILINE,
+)
+
+
+def split_sections(text: str) -> List[str]:
+    """
+    Split a report at its section headings, keeping each heading with its body
+
+    Text before the first heading (e.g. patient details) is its own section.
+    """
+    starts = [match.start() for match in _SECTION_BOUNDARY.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(text))
+    sections = [text[start:end].strip() for start, end in zip(starts, starts[1:])]
+    return [section for section in sections if section]
+
+
+def _split_oversized(section: str, max_chars: int) -> List[str]:
+    """Break a section longer than max_chars at paragraph, line, then word boundaries"""
+    pieces = [section]
+    for separator in ("\n\n", "\n", " "):
+        next_pieces = []
+        for piece in pieces:
+            if len(piece) <= max_chars:
+                next_pieces.append(piece)
+                continue
+            current = ""
+            for part in piece.split(separator):
+                candidate = f"{current}{separator}{part}" if current else part
+                if current and len(candidate) > max_chars:
+                    next_pieces.append(current)
+                    current = part
+                else:
+                    current = candidate
+            if current:
+                next_pieces.append(current)
+        pieces = next_pieces
+    # A single unbroken token longer than max_chars is hard-cut
+    return [piece[i:i + max_chars] for piece in pieces for i in range(0, len(piece), max_chars)]
+
+
+def chunk_report(text: str, max_chars: int) -> List[str]:
+    """
+    Group consecutive sections into chunks of at most max_chars
+
+    Sections are never merged across a chunk boundary; a section that is
+    longer than max_chars on its own is split further.
+    """
+    chunks = []
+    current = ""
+    for section in split_sections(text):
+        for piece in _split_oversized(section, max_chars):
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if current and len(candidate) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
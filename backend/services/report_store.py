@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from services.cache import DiskCache, LRUCache, TieredCache
+
+logger = logging.getLogger(__name__)
+
+
+class ReportSession:
+    """Everything the server has produced for one uploaded report"""
+
+    def __init__(self, report_id: str, extracted_text: str, filename: Optional[str] = None):
+        self.report_id = report_id
+        self.filename = filename
+        self.extracted_text = extracted_text
+        self.simplified_text: Optional[str] = None
+        # Keyed by target language
+        self.translations: Dict[str, str] = {}
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def to_dict(self) -> dict:
+        return {
+            "report_id": self.report_id,
+            "filename": self.filename,
+            "extracted_text": self.extracted_text,
+            "simplified_text": self.simplified_text,
+            "translations": self.translations,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReportSession":
+        session = cls(data["report_id"], data["extracted_text"], data.get("filename"))
+        session.simplified_text = data.get("simplified_text")
+        session.translations = dict(data.get("translations") or {})
+        session.created_at = data.get("created_at", session.created_at)
+        session.updated_at = data.get("updated_at", session.updated_at)
+        return session
+
+
+class ReportSessionStore:
+    """
+    Server-side report sessions, so clients refer to a report_id instead of
+    posting the extracted text back on every call
+
+    Configuration (environment):
+        REPORT_STORE_MAX_SESSIONS  sessions kept in memory (LRU)
+        REPORT_STORE_TTL           seconds an idle session stays in memory
+        REPORT_STORE_DIR           directory for a persistent tier (optional)
+        REPORT_STORE_MAX_MB        size limit of the persistent tier
+    """
+
+    def __init__(self):
+        ttl = float(os.getenv("REPORT_STORE_TTL", str(6 * 3600))) or None
+        memory = LRUCache(max_entries=int(os.getenv("REPORT_STORE_MAX_SESSIONS", "256")), ttl=ttl)
+        disk = None
+        directory = os.getenv("REPORT_STORE_DIR")
+        if directory:
+            disk = DiskCache(directory, max_bytes=int(os.getenv("REPORT_STORE_MAX_MB", "512")) * 1024 * 1024)
+        self._sessions = TieredCache(
+            memory,
+            disk,
+            serialize=lambda session: json.dumps(session.to_dict()).encode("utf-8"),
+            deserialize=lambda data: ReportSession.from_dict(json.loads(data.decode("utf-8"))),
+        )
+        self._lock = threading.Lock()
+
+    def create(self, report_id: str, extracted_text: str, filename: Optional[str] = None) -> ReportSession:
+        """
+        Start a session for an upload, keeping earlier results when the
+        same report is uploaded again
+        """
+        with self._lock:
+            session = self._sessions.get(report_id)
+            if session is None or session.extracted_text != extracted_text:
+                session = ReportSession(report_id, extracted_text, filename)
+                self._sessions.set(report_id, session)
+            return session
+
+    def get(self, report_id: str) -> Optional[ReportSession]:
+        return self._sessions.get(report_id)
+
+    def save(self, session: ReportSession):
+        """Record changes to a session (and write it through to disk)"""
+        session.updated_at = time.time()
+        self._sessions.set(session.report_id, session)
+
+    def stats(self) -> dict:
+        return self._sessions.stats()
@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from typing import Awaitable, Callable, Optional
+
+from services.cache import LRUCache, SQLiteCache, TieredCache
+
+logger = logging.getLogger(__name__)
+
+_SPACES = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form of an input for cache keys: NFC, unified newlines,
+    collapsed runs of spaces and blank lines, no leading/trailing space
+    """
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+class ResponseCache:
+    """
+    Cache of LLM responses shared by AIService and TranslationService
+
+    Keys combine the operation, the normalized input, the target language,
+    the model name and the prompt template version, so changing any of
+    them never serves a stale answer. Only successful model output should
+    be stored, never demo fallbacks.
+
+    Configuration (environment):
+        RESPONSE_CACHE_ENTRIES   in-memory entries (0 disables the cache)
+        RESPONSE_CACHE_TTL       seconds before an entry expires
+        RESPONSE_CACHE_PATH      SQLite file for a persistent tier (optional)
+        RESPONSE_CACHE_MAX_ROWS  rows kept in the SQLite tier
+    """
+
+    def __init__(self):
+        ttl = float(os.getenv("RESPONSE_CACHE_TTL", "86400")) or None
+        memory = LRUCache(max_entries=int(os.getenv("RESPONSE_CACHE_ENTRIES", "512")), ttl=ttl)
+        persistent = None
+        path = os.getenv("RESPONSE_CACHE_PATH")
+        if path:
+            persistent = SQLiteCache(path, max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ROWS", "10000")), ttl=ttl)
+        # Entries are (text, seconds it took to generate) so hits can report saved latency
+        self._cache = TieredCache(
+            memory,
+            persistent,
+            serialize=lambda entry: json.dumps(entry).encode("utf-8"),
+            deserialize=lambda data: tuple(json.loads(data.decode("utf-8"))),
+        )
+        self.saved_seconds = 0.0
+
+    def make_key(self, operation: str, text: str, language: str = "", model: str = "",
+                 prompt_version: str = "") -> str:
+        """Hash of everything that determines the model's answer"""
+        normalized = normalize_text(text)
+        material = "\x1f".join([operation, language.lower(), model, prompt_version, normalized])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        text, latency = entry
+        self.saved_seconds += latency
+        return text
+
+    def set(self, key: str, text: str, latency: float = 0.0):
+        self._cache.set(key, (text, round(latency, 3)))
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return the cached response for key, or await generate() and cache it
+
+        Errors from generate() propagate and nothing is cached. The cache
+        is read and written on a worker thread, since the SQLite tier blocks.
+        """
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        text = await generate()
+        await asyncio.to_thread(self.set, key, text, time.perf_counter() - started)
+        return text
+
+    def stats(self) -> dict:
+        """Hit rate and latency saved, for /health"""
+        stats = self._cache.stats()
+        stats["saved_seconds"] = round(self.saved_seconds, 2)
+        return stats
+
+
+_shared_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """The process-wide cache shared by AIService and TranslationService"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+    return _shared_cache
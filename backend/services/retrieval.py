@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from services.cache import LRUCache
+from services.report_chunker import chunk_report
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# Common English words that carry no signal for matching questions to passages
+_STOPWORDS = frozenset("""
+a about am an and are as at be been but by can could did do does for from had has have how i
+if in is it its me my of on or should so that the their there this to was what when where which
+who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with stopwords removed"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of passages"""
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(passage)) for passage in passages]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(passages)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            normalizer = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1.0))
+            for term in terms:
+                frequency = counts.get(term, 0)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + normalizer)
+            scores.append(score)
+        return scores
+
+
+class EmbeddingModel:
+    """
+    Optional local sentence-embedding model (sentence-transformers)
+
+    Only loaded when RETRIEVAL_EMBEDDING_MODEL names a model and the
+    package is installed; retrieval is BM25-only otherwise.
+    """
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        logger.info(f"Loaded embedding model {model_name}")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+class ReportIndex:
+    """
+    Passages of one report with a BM25 index and, optionally, embeddings
+
+    select_context() returns only the passages relevant to a question, so
+    the prompt size depends on the question rather than the report size.
+    """
+
+    def __init__(self, text: str, passage_chars: int, embedder: Optional[EmbeddingModel] = None,
+                 embedding_weight: float = 0.5):
+        self.text = text
+        self.passages = chunk_report(text, passage_chars)
+        self.bm25 = BM25Index(self.passages)
+        self.embedder = embedder
+        self.embedding_weight = embedding_weight
+        self.embeddings = embedder.encode(self.passages) if embedder and self.passages else None
+
+    def search(self, question: str, top_k: int) -> List[Tuple[int, float]]:
+        """(passage index, score) pairs for the best top_k passages"""
+        scores = np.asarray(self.bm25.scores(question), dtype=np.float64)
+        if scores.size and scores.max() > 0:
+            scores = scores / scores.max()
+        if self.embeddings is not None:
+            query = self.embedder.encode([question])[0]
+            similarity = self.embeddings @ query
+            scores = (1 - self.embedding_weight) * scores + self.embedding_weight * similarity
+        ranked = np.argsort(-scores)[:top_k]
+        return [(int(index), float(scores[index])) for index in ranked]
+
+    def select_context(self, question: str, top_k: int) -> str:
+        """The top_k passages for question, in their original report order"""
+        if len(self.passages) <= top_k:
+            return self.text
+        ranked = self.search(question, top_k)
+        if not ranked or ranked[0][1] <= 0:
+            # Nothing in the report matches the question; let the model see all of it
+            return self.text
+        selected = sorted(index for index, _ in ranked)
+        return "\n\n[...]\n\n".join(self.passages[index] for index in selected)
+
+
+class ReportIndexStore:
+    """
+    Retrieval indexes for recent reports, keyed by report ID
+
+    Configuration (environment):
+        RETRIEVAL_MAX_REPORTS      indexes kept in memory (LRU)
+        RETRIEVAL_PASSAGE_CHARS    target passage size
+        RETRIEVAL_TOP_K            passages sent with each question
+        RETRIEVAL_MIN_CHARS        shorter reports are always sent whole
+        RETRIEVAL_EMBEDDING_MODEL  sentence-transformers model for hybrid search (optional)
+    """
+
+    def __init__(self):
+        self.passage_chars = int(os.getenv("RETRIEVAL_PASSAGE_CHARS", "800"))
+        self.top_k = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+        self.min_chars = int(os.getenv("RETRIEVAL_MIN_CHARS", "4000"))
+        self.embedding_weight = float(os.getenv("RETRIEVAL_EMBEDDING_WEIGHT", "0.5"))
+        self._indexes = LRUCache(max_entries=int(os.getenv("RETRIEVAL_MAX_REPORTS", "64")))
+        self.embedder = self._load_embedder()
+
+    def _load_embedder(self) -> Optional[EmbeddingModel]:
+        model_name = os.getenv("RETRIEVAL_EMBEDDING_MODEL")
+        if not model_name:
+            return None
+        try:
+            return EmbeddingModel(model_name)
+        except Exception as e:
+            logger.warning(f"Embedding model unavailable, using BM25 only: {str(e)}")
+            return None
+
+    @staticmethod
+    def context_id(text: str) -> str:
+        """
+        ID for a report that was sent as raw context rather than uploaded
+
+        Prefixed so it can never equal a report ID, which is a digest too.
+        """
+        return "context:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, report_id: str) -> Optional[ReportIndex]:
+        return self._indexes.get(report_id)
+
+    def build(self, report_id: str, text: str) -> ReportIndex:
+        """Index text under report_id (CPU-bound; call it off the event loop)"""
+        index = ReportIndex(text, self.passage_chars, self.embedder, self.embedding_weight)
+        self._indexes.set(report_id, index)
+        logger.info(f"Indexed report {report_id[:12]} as {len(index.passages)} passages")
+        return index
+
+    def get_or_build(self, report_id: str, text: str) -> ReportIndex:
+        index = self.get(report_id)
+        if index is None or index.text != text:
+            index = self.build(report_id, text)
+        return index
+
+    def select_context(self, index: ReportIndex, question: str) -> str:
+        """Relevant passages for question, or the whole report when it is short"""
+        if len(index.text) <= self.min_chars:
+            return index.text
+        return index.select_context(question, self.top_k)
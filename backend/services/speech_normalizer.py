@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_LEXICON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lexicons")
+
+# Markdown emphasis, dropped before speaking
+_EMPHASIS = re.compile(r"\*+")
+# Punctuation that needs a following space to be read as a pause (not inside 2.5 or 10:30)
+_PAUSE = re.compile(r"([.:;])(?=[^\s\d])")
+# Lexicon file names are language codes such as "en" or "pt-br"
+_LANGUAGE_CODE = re.compile(r"[a-z]{2,3}(?:-[a-z0-9]+)?")
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Regex matching any of terms, built as a character trie so matching
+    cost depends on the text length rather than the number of terms
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        ends_here = "" in node
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        # Greedy, so the longest term wins ("w/o" over "w/")
+        return group + "?" if ends_here else group
+
+    return build(trie)
+
+
+def _terms_pattern(terms: List[str]) -> str:
+    """Alternation of terms; those ending in a word character must end a word"""
+    word_final = [term for term in terms if re.match(r"\w", term[-1])]
+    other = [term for term in terms if not re.match(r"\w", term[-1])]
+    alternatives = []
+    if word_final:
+        alternatives.append(f"(?:{_trie_pattern(word_final)})(?!\\w)")
+    if other:
+        alternatives.append(f"(?:{_trie_pattern(other)})")
+    return "|".join(alternatives)
+
+
+class SpeechNormalizer:
+    """
+    Expands abbreviations from a lexicon in one pass over the text
+
+    Terms match case-sensitively and only as whole words, so "mg" is
+    expanded in "5 mg" but not inside "imaging". Terms that start with a
+    lowercase letter, such as units, may also follow a number directly
+    ("81mg", "2.5mg"). Terms that end in punctuation (such as "w/") may be
+    followed directly by a word.
+    """
+
+    def __init__(self, lexicon: Dict[str, str]):
+        self.lexicon = {term: expansion for term, expansion in lexicon.items() if term}
+        after_number = [term for term in self.lexicon if term[0].islower()]
+        standalone = [term for term in self.lexicon if not term[0].islower()]
+        alternatives = []
+        if after_number:
+            # Not preceded by a letter, but a digit is fine
+            alternatives.append(f"(?<![^\\W\\d])(?:{_terms_pattern(after_number)})")
+        if standalone:
+            alternatives.append(f"(?<!\\w)(?:{_terms_pattern(standalone)})")
+        self.pattern = re.compile("|".join(alternatives)) if alternatives else None
+
+    def expand(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._expansion, text)
+
+    def _expansion(self, match: "re.Match") -> str:
+        expansion = self.lexicon[match.group(0)]
+        # "81mg" becomes "81 milligrams"
+        start = match.start()
+        if start and match.string[start - 1].isdigit():
+            expansion = " " + expansion
+        # "w/water" becomes "with water", not "withwater"
+        end = match.end()
+        if end < len(match.string) and match.string[end].isalnum():
+            expansion += " "
+        return expansion
+
+    def clean(self, text: str) -> str:
+        """Text ready for speech synthesis: no markdown emphasis, abbreviations expanded"""
+        cleaned = self.expand(_EMPHASIS.sub("", text))
+        # Add pauses for better speech flow
+        return _PAUSE.sub(r"\1 ", cleaned).strip()
+
+
+class SpeechLexicons:
+    """
+    Per-language normalizers loaded from <directory>/<language>.json
+
+    Each file is a JSON object mapping a term to what should be spoken.
+    Languages without a file fall back to English.
+
+    Configuration (environment):
+        SPEECH_LEXICON_DIR  directory of lexicon files (defaults to backend/lexicons)
+    """
+
+    def __init__(self, directory: Optional[str] = None, default_language: str = "en"):
+        self.directory = directory or os.getenv("SPEECH_LEXICON_DIR") or _DEFAULT_LEXICON_DIR
+        self.default_language = default_language
+        self._normalizers: Dict[str, SpeechNormalizer] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, language: str) -> Optional[Dict[str, str]]:
+        path = os.path.join(self.directory, f"{language}.json")
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                lexicon = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load speech lexicon {path}: {str(e)}")
+            return None
+        logger.info(f"Loaded {len(lexicon)} speech lexicon terms for {language}")
+        return lexicon
+
+    def _get_locked(self, language: str) -> SpeechNormalizer:
+        normalizer = self._normalizers.get(language)
+        if normalizer is None:
+            lexicon = self._load(language)
+            if lexicon is None and language != self.default_language:
+                normalizer = self._get_locked(self.default_language)
+            else:
+                normalizer = SpeechNormalizer(lexicon or {})
+            self._normalizers[language] = normalizer
+        return normalizer
+
+    def get(self, language: Optional[str] = None) -> SpeechNormalizer:
+        """The normalizer for language (a code such as "es"), built once"""
+        language = (language or self.default_language).lower()
+        if not _LANGUAGE_CODE.fullmatch(language):
+            language = self.default_language
+        with self._lock:
+            return self._get_locked(language)
@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # Optional: falls back to the pytesseract subprocess
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+
+class TesseractEngine:
+    """
+    A long-lived Tesseract instance for one language
+
+    With tesserocr installed, each thread keeps its own loaded
+    PyTessBaseAPI, so the traineddata is read once per worker instead of
+    once per page. Otherwise every call goes through pytesseract, which
+    starts a tesseract process per image.
+
+    Configuration (environment):
+        OCR_ENGINE          "auto" (default), "tesserocr" or "pytesseract"
+        OCR_TESSDATA_PATH   tessdata directory for tesserocr, if not the default
+    """
+
+    def __init__(self, lang: str = "eng", backend: Optional[str] = None):
+        self.lang = lang
+        requested = (backend or os.getenv("OCR_ENGINE", "auto")).lower()
+        if requested == "tesserocr" and tesserocr is None:
+            logger.warning("OCR_ENGINE=tesserocr but tesserocr is not installed, using pytesseract")
+        self.backend = "tesserocr" if requested in ("auto", "tesserocr") and tesserocr is not None else "pytesseract"
+        self.tessdata_path = os.getenv("OCR_TESSDATA_PATH")
+        self._local = threading.local()
+
+    def _api(self):
+        """This thread's loaded tesserocr API, created on first use"""
+        api = getattr(self._local, "api", None)
+        if api is None:
+            kwargs = {"lang": self.lang}
+            if self.tessdata_path:
+                kwargs["path"] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+            logger.info(f"Loaded tesserocr engine ({self.lang}) in process {os.getpid()}")
+        return api
+
+    def warm_up(self):
+        """Load the model now rather than on the first page"""
+        if self.backend == "tesserocr":
+            self._api()
+
+    def image_to_string(self, image: Image.Image) -> str:
+        if self.backend == "tesserocr":
+            try:
+                api = self._api()
+                api.SetImage(image)
+                return api.GetUTF8Text()
+            except Exception as e:
+                logger.error(f"tesserocr failed, falling back to pytesseract: {str(e)}")
+                self._local.api = None
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+
+# One engine per language per process; pool workers reuse it for every page
+_engines: Dict[str, TesseractEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(lang: str = "eng") -> TesseractEngine:
+    """This process's engine for lang"""
+    with _engines_lock:
+        engine = _engines.get(lang)
+        if engine is None:
+            engine = TesseractEngine(lang)
+            _engines[lang] = engine
+        return engine
+
+
+def warm_up_engine(lang: str = "eng"):
+    """Extraction pool initializer: load Tesseract once when a worker starts"""
+    try:
+        get_engine(lang).warm_up()
+    except Exception as e:
+        logger.error(f"Failed to warm up OCR engine: {str(e)}")
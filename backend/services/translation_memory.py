@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from services.cache import LRUCache, SQLiteCache, TieredCache
+from services.response_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Markdown that opens a line and is kept as-is: headings, bullets, numbered items, quotes
+_LINE_PREFIX = re.compile(r"^\s*(?:(?:#{1,6}|[-*+]|\d+[.)]|>)\s+)*")
+# A sentence ends at . ! or ? followed by space and something that starts a sentence
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(*\[]*[A-Z0-9])")
+# Abbreviations that end in a period without ending the sentence
+_ABBREVIATION = re.compile(r"(?:\b(?:Dr|Mr|Mrs|Ms|St|vs|approx|e\.g|i\.e)\.)$", re.IGNORECASE)
+_HAS_LETTERS = re.compile(r"[^\W\d_]")
+
+# A document is a template of literal strings and indexes into its list of segments
+Template = List[Union[str, int]]
+
+
+def segment_markdown(text: str) -> Tuple[Template, List[str]]:
+    """
+    Split text into translatable segments (sentences and list items),
+    keeping markdown prefixes, whitespace and newlines as literals
+
+    Repeated segments appear once in the segment list. Joining the
+    template with each index replaced by its segment gives back the text.
+    """
+    template: Template = []
+    segments: List[str] = []
+    positions: Dict[str, int] = {}
+
+    def add(piece: str):
+        if not piece:
+            return
+        stripped = piece.strip()
+        if not stripped or not _HAS_LETTERS.search(stripped):
+            template.append(piece)
+            return
+        start = piece.index(stripped)
+        if start:
+            template.append(piece[:start])
+        if stripped not in positions:
+            positions[stripped] = len(segments)
+            segments.append(stripped)
+        template.append(positions[stripped])
+        trailing = piece[start + len(stripped):]
+        if trailing:
+            template.append(trailing)
+
+    for line in text.splitlines(keepends=True):
+        body = line.rstrip("\r\n")
+        prefix = _LINE_PREFIX.match(body).group(0)
+        if prefix:
+            template.append(prefix)
+        rest = body[len(prefix):]
+        start = 0
+        for boundary in _SENTENCE_END.finditer(rest):
+            if _ABBREVIATION.search(rest[start:boundary.start()]):
+                continue
+            add(rest[start:boundary.start()])
+            template.append(boundary.group(0))
+            start = boundary.end()
+        add(rest[start:])
+        if len(line) > len(body):
+            template.append(line[len(body):])
+    return template, segments
+
+
+def assemble(template: Template, translations: List[str]) -> str:
+    """Rebuild a document from its template and translated segments"""
+    return "".join(translations[part] if isinstance(part, int) else part for part in template)
+
+
+def parse_segment_translations(response: str, count: int) -> Optional[List[str]]:
+    """
+    Translations from a batched response (a JSON object keyed "1".."count"),
+    or None when the response is malformed or incomplete
+    """
+    start, end = response.find("{"), response.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(response[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    translations = [data.get(str(number)) for number in range(1, count + 1)]
+    if not all(isinstance(translation, str) and translation.strip() for translation in translations):
+        return None
+    return [translation.strip() for translation in translations]
+
+
+class TranslationMemory:
+    """
+    Translated segments keyed by language, model and prompt version, so
+    boilerplate seen in earlier reports is never sent to the model again
+
+    Configuration (environment):
+        TRANSLATION_MEMORY_ENTRIES   segments kept in memory (0 disables the memory)
+        TRANSLATION_MEMORY_PATH      SQLite file for a persistent tier (optional)
+        TRANSLATION_MEMORY_MAX_ROWS  rows kept in the SQLite tier
+    """
+
+    def __init__(self):
+        self.enabled = int(os.getenv("TRANSLATION_MEMORY_ENTRIES", "20000")) > 0
+        memory = LRUCache(max_entries=int(os.getenv("TRANSLATION_MEMORY_ENTRIES", "20000")))
+        persistent = None
+        path = os.getenv("TRANSLATION_MEMORY_PATH")
+        if path:
+            persistent = SQLiteCache(path, max_entries=int(os.getenv("TRANSLATION_MEMORY_MAX_ROWS", "200000")))
+        self._segments = TieredCache(
+            memory,
+            persistent,
+            serialize=lambda translation: translation.encode("utf-8"),
+            deserialize=lambda data: data.decode("utf-8"),
+        )
+        self.segments_reused = 0
+        self.segments_translated = 0
+
+    @staticmethod
+    def key(segment: str, language: str, model: str, prompt_version: str) -> str:
+        material = "\x1f".join([language.lower(), model, prompt_version, normalize_text(segment)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def lookup(self, segments: List[str], language: str, model: str,
+               prompt_version: str) -> List[Optional[str]]:
+        """
+        The stored translation of each segment, or None where there is none
+
+        Blocking (one batched read of the persistent tier); call it off the event loop.
+        """
+        found = self._segments.get_many([self.key(segment, language, model, prompt_version) for segment in segments])
+        self.segments_reused += sum(1 for translation in found if translation is not None)
+        return found
+
+    def store(self, pairs: List[Tuple[str, str]], language: str, model: str, prompt_version: str):
+        """Remember (segment, translation) pairs (blocking, like lookup())"""
+        self._segments.set_many([(self.key(segment, language, model, prompt_version), translation)
+                                 for segment, translation in pairs])
+        self.segments_translated += len(pairs)
+
+    def stats(self) -> dict:
+        """Reuse counters for /health"""
+        stats = self._segments.stats()
+        stats["segments_reused"] = self.segments_reused
+        stats["segments_translated"] = self.segments_translated
+        return stats
+
+
+_shared_memory: Optional[TranslationMemory] = None
+
+
+def get_translation_memory() -> TranslationMemory:
+    """The process-wide translation memory"""
+    global _shared_memory
+    if _shared_memory is None:
+        _shared_memory = TranslationMemory()
+    return _shared_memory
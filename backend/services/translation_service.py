@@ -1,14 +1,78 @@
-import google.generativeai as genai
-import os
+import asyncio
+import json
 import logging
-from typing import Optional
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+
+from services.llm_client import LLMClient, get_llm_client
+from services.metrics import DEMO_FALLBACKS
+from services.response_cache import ResponseCache, get_response_cache
+from services.translation_memory import (
+    TranslationMemory,
+    assemble,
+    get_translation_memory,
+    parse_segment_translations,
+    segment_markdown,
+)
 
 logger = logging.getLogger(__name__)
 
+# Bump when the prompt template changes so cached translations stop matching
+TRANSLATE_PROMPT_VERSION = "2"
+TRANSLATE_SEGMENTS_PROMPT_VERSION = "1"
+
+# Returned by translation when Gemini fails; other languages get the text back unchanged
+_DEMO_TRANSLATIONS = {
+    "spanish": """**Resumen Simple**: 
+Tuviste un ataque al corazón (STEMI) lo que significa que uno de los vasos sanguíneos que suministra sangre a tu músculo cardíaco se bloqueó. Los doctores rápidamente lo abrieron con un procedimiento llamado angioplastia y colocaron un pequeño tubo (stent) para mantenerlo abierto. Esta es una condición común y muy tratable.
+
+**Términos Clave**:
+- **STEMI**: Un tipo serio de ataque al corazón donde un vaso sanguíneo está completamente bloqueado
+- **Angioplastia**: Un procedimiento para abrir vasos sanguíneos bloqueados en el corazón
+- **Stent**: Un pequeño tubo de malla que mantiene los vasos sanguíneos abiertos
+- **Hipertensión**: Presión arterial alta
+- **Hiperlipidemia**: Niveles altos de colesterol
+
+**Lo que esto significa**:
+- ¡Vas a estar bien! Esta es una condición muy tratable
+- Necesitarás tomar medicamentos para prevenir problemas futuros
+- Haz seguimiento con tu cardiólogo y médico de atención primaria
+- Comienza rehabilitación cardíaca para fortalecer tu corazón
+- Haz cambios en el estilo de vida como comer saludable y hacer ejercicio
+- Evita levantar objetos pesados por una semana, luego regresa gradualmente a actividades normales
+
+Recuerda: Esta es información educativa, no consejo médico. Siempre consulta a tu equipo de atención médica para decisiones médicas.""",
+    "urdu": """**آسان خلاصہ**: 
+آپ کو دل کا دورہ پڑا (STEMI) جس کا مطلب ہے کہ آپ کے دل کے پٹھے کو خون فراہم کرنے والی ایک رگ بند ہو گئی۔ ڈاکٹروں نے فوری طور پر اسے کھول دیا اور ایک چھوٹی ٹیوب (stent) لگا دی۔ یہ ایک عام اور قابل علاج حالت ہے۔
+
+**اہم اصطلاحات**:
+- **STEMI**: دل کے دورے کی ایک سنگین قسم جہاں خون کی رگ مکمل طور پر بند ہو جاتی ہے
+- **Angioplasty**: دل میں بند خون کی رگوں کو کھولنے کا طریقہ
+- **Stent**: ایک چھوٹی جالی دار ٹیوب جو خون کی رگوں کو کھلا رکھتی ہے
+- **Hypertension**: ہائی بلڈ پریشر
+- **Hyperlipidemia**: کولیسٹرول کی زیادہ مقدار
+
+**اس کا کیا مطلب ہے**:
+- آپ ٹھیک ہو جائیں گے! یہ ایک قابل علاج حالت ہے
+- آپ کو مستقبل کے مسائل سے بچنے کے لیے دوائیں لینی ہوں گی
+- اپنے کارڈیالوجسٹ اور پرائمری ڈاکٹر سے فالو اپ کریں
+- اپنے دل کو مضبوط بنانے کے لیے کارڈیک ری ہیبلیٹیشن شروع کریں
+- صحت مند کھانا اور ورزش جیسے طرز زندگی میں تبدیلیاں کریں
+- ایک ہفتے تک بھاری چیزوں کو اٹھانے سے گریز کریں
+
+یاد رکھیں: یہ تعلیمی معلومات ہے، طبی مشورہ نہیں۔ طبی فیصلوں کے لیے ہمیشہ اپنی ہیلتھ کیئر ٹیم سے مشورہ کریں۔""",
+}
+
 class TranslationService:
-    def __init__(self):
-        self.model = None
-        self._initialize_client()
+    def __init__(self, llm: Optional[LLMClient] = None, cache: Optional[ResponseCache] = None,
+                 memory: Optional[TranslationMemory] = None):
+        # Gemini access and cached responses are shared with AIService
+        self.llm = llm or get_llm_client()
+        self.cache = cache or get_response_cache()
+        # Sentence-level translations reused across documents
+        self.memory = memory or get_translation_memory()
+        # Languages translated at once by translate_many()
+        self.batch_concurrency = int(os.getenv("TRANSLATE_BATCH_CONCURRENCY", "4"))
         # Extended language support with commonly used languages
         self.language_codes = {
             "english": "en",
@@ -63,31 +127,12 @@ class TranslationService:
             "khmer": "Khmer"
         }
     
-    def _initialize_client(self):
-        """Initialize Gemini client with API key"""
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key and api_key != "your_gemini_api_key_here":
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
-            logger.info("Translation service initialized successfully")
-        else:
-            logger.warning("Gemini API key not found. Translation features will be disabled.")
-    
     def is_configured(self) -> bool:
         """Check if translation service is properly configured"""
-        return self.model is not None
+        return self.llm.is_configured()
     
-    async def translate_text(self, text: str, target_language: str) -> str:
-        """
-        Translate text to specified language using Gemini
-        """
-        if not self.is_configured():
-            raise Exception("Translation service not configured")
-        
-        try:
-            target_lang = self.language_names.get(target_language.lower(), target_language)
-            
-            prompt = f"""You are a professional medical translator. Translate the following medical text to {target_lang}. 
+    def _translate_prompt(self, text: str, target_lang: str) -> str:
+        return f"""You are a professional medical translator. Translate the following medical text to {target_lang}. 
 
 Guidelines:
 - Maintain medical accuracy
@@ -100,8 +145,80 @@ Guidelines:
 Text to translate:
 {text}"""
 
-            response = self.model.generate_content(prompt)
-            translated_text = response.text
+    def _translate_segments_prompt(self, segments: List[str], target_lang: str) -> str:
+        numbered = {str(number): segment for number, segment in enumerate(segments, start=1)}
+        return f"""You are a professional medical translator. Translate each numbered segment of a medical document to {target_lang}. The segments are sentences and list items in document order.
+
+Guidelines:
+- Maintain medical accuracy
+- Use appropriate medical terminology in the target language
+- Keep the tone professional but accessible
+- Keep markdown such as **bold** exactly where it is in each segment
+- If a medical term doesn't have a direct translation, provide both the original term and explanation
+- Use natural, native-speaker level language
+- Translate every segment on its own; do not merge, split, skip or add segments
+
+Return only a JSON object mapping each segment number to its translation.
+
+Segments:
+{json.dumps(numbered, ensure_ascii=False, indent=1)}"""
+
+    async def _translate_document(self, text: str, target_lang: str) -> str:
+        """
+        Translate text through the translation memory
+
+        Segments already translated for this language are reused; the rest
+        go to the model in a single batched prompt. A malformed batched
+        response falls back to translating the whole document.
+        """
+        template, segments = segment_markdown(text)
+        if not self.memory.enabled or not segments:
+            return await self.llm.generate(self._translate_prompt(text, target_lang))
+
+        model = self.llm.model_name
+        translations = await asyncio.to_thread(
+            self.memory.lookup, segments, target_lang, model, TRANSLATE_SEGMENTS_PROMPT_VERSION
+        )
+        missing = [index for index, translation in enumerate(translations) if translation is None]
+        if missing:
+            unseen = [segments[index] for index in missing]
+            response = await self.llm.generate(self._translate_segments_prompt(unseen, target_lang))
+            translated = parse_segment_translations(response, len(unseen))
+            if translated is None:
+                logger.warning("Batched segment translation was malformed, translating the whole document")
+                return await self.llm.generate(self._translate_prompt(text, target_lang))
+            await asyncio.to_thread(
+                self.memory.store, list(zip(unseen, translated)), target_lang, model,
+                TRANSLATE_SEGMENTS_PROMPT_VERSION
+            )
+            for index, translation in zip(missing, translated):
+                translations[index] = translation
+
+        logger.info(
+            f"Translated {len(missing)} new segments to {target_lang}, "
+            f"reused {len(segments) - len(missing)} from translation memory"
+        )
+        return assemble(template, translations)
+
+    def _translate_cache_key(self, text: str, target_lang: str) -> str:
+        return self.cache.make_key(
+            "translate", text, language=target_lang,
+            model=self.llm.model_name, prompt_version=TRANSLATE_PROMPT_VERSION
+        )
+
+    async def translate_text(self, text: str, target_language: str) -> str:
+        """
+        Translate text to specified language using Gemini
+        """
+        if not self.is_configured():
+            raise Exception("Translation service not configured")
+        
+        try:
+            target_lang = self.language_names.get(target_language.lower(), target_language)
+            cache_key = self._translate_cache_key(text, target_lang)
+            translated_text = await self.cache.get_or_generate(
+                cache_key, lambda: self._translate_document(text, target_lang)
+            )
             logger.info(f"Successfully translated text to {target_lang} using Gemini")
             return translated_text
             
@@ -110,55 +227,56 @@ Text to translate:
             # Return demo translation for hackathon
             return self._get_demo_translation(text, target_language)
     
-    def _get_demo_translation(self, text: str, target_language: str) -> str:
+    async def translate_many(self, text: str, target_languages: List[str]) -> AsyncIterator[Tuple[str, str]]:
         """
-        Return demo translations for hackathon presentation
-        Only provides demos for Spanish and Urdu, returns original for others
+        Translate text into several languages, yielding (language, translation)
+        pairs as each one finishes
+
+        Cached translations are yielded first without waiting for a slot;
+        the rest run concurrently, at most batch_concurrency at a time.
         """
-        if target_language.lower() == "spanish":
-            return """**Resumen Simple**: 
-Tuviste un ataque al corazón (STEMI) lo que significa que uno de los vasos sanguíneos que suministra sangre a tu músculo cardíaco se bloqueó. Los doctores rápidamente lo abrieron con un procedimiento llamado angioplastia y colocaron un pequeño tubo (stent) para mantenerlo abierto. Esta es una condición común y muy tratable.
+        if not self.is_configured():
+            raise Exception("Translation service not configured")
 
-**Términos Clave**:
-- **STEMI**: Un tipo serio de ataque al corazón donde un vaso sanguíneo está completamente bloqueado
-- **Angioplastia**: Un procedimiento para abrir vasos sanguíneos bloqueados en el corazón
-- **Stent**: Un pequeño tubo de malla que mantiene los vasos sanguíneos abiertos
-- **Hipertensión**: Presión arterial alta
-- **Hiperlipidemia**: Niveles altos de colesterol
+        pending = []
+        for language in target_languages:
+            target_lang = self.language_names.get(language.lower(), language)
+            cached = await asyncio.to_thread(self.cache.get, self._translate_cache_key(text, target_lang))
+            if cached is not None:
+                yield language, cached
+            else:
+                pending.append(language)
 
-**Lo que esto significa**:
-- ¡Vas a estar bien! Esta es una condición muy tratable
-- Necesitarás tomar medicamentos para prevenir problemas futuros
-- Haz seguimiento con tu cardiólogo y médico de atención primaria
-- Comienza rehabilitación cardíaca para fortalecer tu corazón
-- Haz cambios en el estilo de vida como comer saludable y hacer ejercicio
-- Evita levantar objetos pesados por una semana, luego regresa gradualmente a actividades normales
+        semaphore = asyncio.Semaphore(max(1, self.batch_concurrency))
 
-Recuerda: Esta es información educativa, no consejo médico. Siempre consulta a tu equipo de atención médica para decisiones médicas."""
-        
-        elif target_language.lower() == "urdu":
-            return """**آسان خلاصہ**: 
-آپ کو دل کا دورہ پڑا (STEMI) جس کا مطلب ہے کہ آپ کے دل کے پٹھے کو خون فراہم کرنے والی ایک رگ بند ہو گئی۔ ڈاکٹروں نے فوری طور پر اسے کھول دیا اور ایک چھوٹی ٹیوب (stent) لگا دی۔ یہ ایک عام اور قابل علاج حالت ہے۔
+        async def translate_one(language: str) -> Tuple[str, str]:
+            async with semaphore:
+                return language, await self.translate_text(text, language)
 
-**اہم اصطلاحات**:
-- **STEMI**: دل کے دورے کی ایک سنگین قسم جہاں خون کی رگ مکمل طور پر بند ہو جاتی ہے
-- **Angioplasty**: دل میں بند خون کی رگوں کو کھولنے کا طریقہ
-- **Stent**: ایک چھوٹی جالی دار ٹیوب جو خون کی رگوں کو کھلا رکھتی ہے
-- **Hypertension**: ہائی بلڈ پریشر
-- **Hyperlipidemia**: کولیسٹرول کی زیادہ مقدار
-
-**اس کا کیا مطلب ہے**:
-- آپ ٹھیک ہو جائیں گے! یہ ایک قابل علاج حالت ہے
-- آپ کو مستقبل کے مسائل سے بچنے کے لیے دوائیں لینی ہوں گی
-- اپنے کارڈیالوجسٹ اور پرائمری ڈاکٹر سے فالو اپ کریں
-- اپنے دل کو مضبوط بنانے کے لیے کارڈیک ری ہیبلیٹیشن شروع کریں
-- صحت مند کھانا اور ورزش جیسے طرز زندگی میں تبدیلیاں کریں
-- ایک ہفتے تک بھاری چیزوں کو اٹھانے سے گریز کریں
+        tasks = [asyncio.ensure_future(translate_one(language)) for language in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client went away mid-batch; stop translations nobody will read
+            for task in tasks:
+                task.cancel()
+    
+    def _get_demo_translation(self, text: str, target_language: str) -> str:
+        """
+        Return demo translations for hackathon presentation
+        Only provides demos for Spanish and Urdu, returns original for others
+        """
+        DEMO_FALLBACKS.inc(service="translation")
+        return _DEMO_TRANSLATIONS.get(target_language.lower(), text)
 
-یاد رکھیں: یہ تعلیمی معلومات ہے، طبی مشورہ نہیں۔ طبی فیصلوں کے لیے ہمیشہ اپنی ہیلتھ کیئر ٹیم سے مشورہ کریں۔"""
-        
-        else:
-            return text  # Return original text if language not supported in demo
+    @staticmethod
+    def is_demo_translation(translated_text: str, text: str) -> bool:
+        """
+        Whether translated_text is the demo translation (or the untranslated
+        text) returned for text when Gemini fails
+        """
+        return translated_text == text or translated_text in _DEMO_TRANSLATIONS.values()
     
     def get_supported_languages(self) -> list:
         """Get list of supported languages"""
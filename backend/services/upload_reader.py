@@ -0,0 +1,128 @@
+import logging
+import os
+from typing import Optional
+
+from services.document_source import DocumentSource, DocumentWriter
+
+logger = logging.getLogger(__name__)
+
+# Magic numbers of the upload formats OCRService understands
+_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+]
+
+# Enough leading bytes to recognise any signature above
+_SNIFF_BYTES = 8
+
+
+class UploadRejected(Exception):
+    """Raised when an upload fails validation; carries the HTTP status to return"""
+
+    status_code = 400
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+
+
+class UnsupportedFileType(UploadRejected):
+    status_code = 400
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Detect the file type from its first bytes, ignoring what the client claimed"""
+    # Some PDF writers put junk before the header; readers accept it within 1 KB
+    if b"%PDF-" in head[:1024]:
+        return "application/pdf"
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+class UploadedDocument:
+    """A validated upload, ready to hand to OCRService"""
+
+    def __init__(self, source: DocumentSource, content_type: str, digest: str, size: int):
+        self.source = source
+        self.content_type = content_type
+        self.digest = digest
+        self.size = size
+
+    def close(self):
+        self.source.close()
+
+
+class UploadReader:
+    """
+    Reads an upload in chunks: sniffs the type from its magic bytes, hashes
+    it incrementally and stops as soon as it goes over the size limit
+
+    Configuration (environment):
+        MAX_UPLOAD_MB     largest accepted upload
+        UPLOAD_CHUNK_KB   read size per chunk
+    """
+
+    def __init__(self, spill_threshold: Optional[int] = None):
+        self.max_bytes = int(float(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+        self.chunk_size = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+        self.spill_threshold = spill_threshold
+
+    def check_declared_size(self, content_length: Optional[str]):
+        """Reject from the Content-Length header before the body is read at all"""
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise UploadTooLarge(self._too_large_message())
+
+    def check_received_size(self, received: int):
+        """Reject a body sent without Content-Length once the bytes received pass the limit"""
+        if received > self.max_bytes:
+            raise UploadTooLarge(self._too_large_message())
+
+    def _too_large_message(self) -> str:
+        return f"File is too large. The maximum upload size is {self.max_bytes // (1024 * 1024)} MB."
+
+    async def read(self, upload) -> UploadedDocument:
+        """
+        Read an object with an async read(size) method (e.g. UploadFile)
+
+        The caller must close() the returned document.
+        """
+        writer = DocumentWriter(self.spill_threshold)
+        content_type = None
+        head = b""
+        try:
+            while True:
+                chunk = await upload.read(self.chunk_size)
+                if not chunk:
+                    break
+
+                if content_type is None and len(head) < _SNIFF_BYTES:
+                    head += chunk[:1024]
+                    if len(head) >= _SNIFF_BYTES:
+                        content_type = sniff_content_type(head)
+                        if content_type is None:
+                            raise UnsupportedFileType(
+                                "File type not supported. Please upload PDF, JPEG, or PNG files."
+                            )
+
+                if writer.size + len(chunk) > self.max_bytes:
+                    raise UploadTooLarge(self._too_large_message())
+                writer.write(chunk)
+
+            if content_type is None:
+                content_type = sniff_content_type(head)
+            if content_type is None:
+                raise UnsupportedFileType("File type not supported. Please upload PDF, JPEG, or PNG files.")
+
+        except BaseException:
+            writer.discard()
+            raise
+
+        logger.info(f"Read {writer.size} byte upload as {content_type}")
+        return UploadedDocument(writer.finish(), content_type, writer.hexdigest(), writer.size)
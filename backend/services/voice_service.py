@@ -1,17 +1,42 @@
 import os
+import asyncio
 import logging
+import re
 import elevenlabs
 from elevenlabs import Voice, VoiceSettings
 import tempfile
-from typing import Optional
+from typing import AsyncIterator, List, Optional
+
+from services.audio_cache import AudioCache
+from services.local_tts import LocalSpeechEngine, tone_wav
+from services.metrics import DEMO_FALLBACKS, timed
+from services.speech_normalizer import SpeechLexicons
 
 logger = logging.getLogger(__name__)
 
+# Sentence boundaries used to split long explanations for parallel synthesis
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
 class VoiceService:
     def __init__(self):
         self.api_key = None
         self.voice_id = None
         self.client = None
+        # Long texts are synthesized as segments of about this size, in parallel
+        self.segment_chars = int(os.getenv("TTS_SEGMENT_CHARS", "400"))
+        self.segment_concurrency = int(os.getenv("TTS_SEGMENT_CONCURRENCY", "3"))
+        self.voice_settings = VoiceSettings(
+            stability=0.75,  # More stable, less variation
+            similarity_boost=0.8,  # Closer to original voice
+            style=0.3,  # Slightly more expressive
+            use_speaker_boost=True  # Enhance voice clarity
+        )
+        # Whole clips and single sentences, keyed by cleaned text and voice
+        self.audio_cache = AudioCache()
+        # Per-language abbreviation lexicons for _clean_text_for_speech
+        self.lexicons = SpeechLexicons()
+        # Offline fallback (espeak-ng / piper) when ElevenLabs is unavailable
+        self.local_engine = LocalSpeechEngine()
         self._initialize_client()
     
     def _initialize_client(self):
@@ -23,7 +48,9 @@ class VoiceService:
             try:
                 # Set the API key for elevenlabs
                 os.environ["ELEVEN_API_KEY"] = self.api_key
-                self.client = elevenlabs.ElevenLabs()
+                # ELEVENLABS_BASE_URL points at another host, e.g. a local stand-in for benchmarks
+                base_url = os.getenv("ELEVENLABS_BASE_URL")
+                self.client = elevenlabs.ElevenLabs(base_url=base_url) if base_url else elevenlabs.ElevenLabs()
                 logger.info("Voice service initialized successfully")
             except Exception as e:
                 logger.error(f"Failed to initialize ElevenLabs client: {str(e)}")
@@ -34,100 +61,155 @@ class VoiceService:
     def is_configured(self) -> bool:
         """Check if voice service is properly configured"""
         return self.client is not None and self.api_key is not None and self.api_key != "your_elevenlabs_api_key_here"
+
+    def is_available(self) -> bool:
+        """Whether speech can be produced at all, through ElevenLabs or a local engine"""
+        return self.is_configured() or self.local_engine.available
     
-    async def text_to_speech(self, text: str) -> Optional[bytes]:
+    def _split_for_speech(self, text: str) -> List[str]:
+        """
+        Split text at sentence boundaries into segments of up to about
+        segment_chars, so the first segment is short enough to play quickly
+        """
+        segments = []
+        current = ""
+        for sentence in _SENTENCE_END.split(text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            candidate = f"{current} {sentence}" if current else sentence
+            # The first segment stays a single sentence so playback starts early
+            if current and (len(candidate) > self.segment_chars or not segments):
+                segments.append(current)
+                current = sentence
+            else:
+                current = candidate
+        if current:
+            segments.append(current)
+        return segments
+
+    def _synthesize(self, cleaned_text: str) -> bytes:
+        """One blocking ElevenLabs request (run it off the event loop)"""
+        # Generate speech with warm, family-like voice settings
+        with timed("tts_synthesis"):
+            audio_iterator = self.client.text_to_speech.convert(
+                voice_id=self.voice_id,
+                text=cleaned_text,
+                voice_settings=self.voice_settings
+            )
+            return b''.join(audio_iterator)
+
+    def _audio_key(self, kind: str, cleaned_text: str) -> str:
+        return self.audio_cache.key(kind, cleaned_text, self.voice_id, self.voice_settings)
+
+    def _synthesize_segment(self, cleaned_text: str) -> bytes:
+        """Audio for one segment from the sentence cache, or from ElevenLabs (blocking)"""
+        key = self._audio_key("segment", cleaned_text)
+        audio = self.audio_cache.get(key)
+        if audio is None:
+            audio = self._synthesize(cleaned_text)
+            self.audio_cache.set(key, audio)
+        return audio
+
+    def cached_speech_path(self, text: str, language: Optional[str] = None) -> Optional[str]:
+        """File holding the complete audio for text, if it was synthesized before"""
+        return self.audio_cache.path(self._audio_key("clip", self._clean_text_for_speech(text, language)))
+
+    async def stream_speech(self, text: str, language: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Yield MPEG audio for text one segment at a time, in order
+
+        language is a code such as "es" that picks the abbreviation lexicon.
+
+        A clip synthesized before is read back from the audio cache whole.
+        Otherwise segments are synthesized concurrently (at most
+        segment_concurrency at once), so the first one can play while later
+        ones are generated, and the finished clip is cached. Errors
+        propagate; nothing falls back to demo audio here.
+        """
+        if not self.is_configured():
+            raise Exception("Voice service not configured")
+
+        clip_key = self._audio_key("clip", self._clean_text_for_speech(text, language))
+        cached = await asyncio.to_thread(self.audio_cache.get, clip_key)
+        if cached is not None:
+            yield cached
+            return
+
+        # Split before cleaning, so expansions like "e.g." -> "for example" cannot end a sentence early
+        segments = [self._clean_text_for_speech(segment, language) for segment in self._split_for_speech(text)]
+        segments = [segment for segment in segments if segment]
+        semaphore = asyncio.Semaphore(max(1, self.segment_concurrency))
+
+        async def synthesize(segment: str) -> bytes:
+            async with semaphore:
+                return await asyncio.to_thread(self._synthesize_segment, segment)
+
+        # Tasks start in order, so the semaphore hands out slots to the earliest segments first
+        tasks = [asyncio.ensure_future(synthesize(segment)) for segment in segments]
+        parts = []
+        try:
+            for task in tasks:
+                parts.append(await task)
+                yield parts[-1]
+        finally:
+            # The listener went away; stop queued segments from reaching ElevenLabs
+            for task in tasks:
+                task.cancel()
+        await asyncio.to_thread(self.audio_cache.set, clip_key, b''.join(parts))
+        logger.info(f"Streamed speech for {len(text)} characters in {len(segments)} segments")
+
+    async def local_speech(self, text: str, language: Optional[str] = None) -> bytes:
+        """
+        WAV audio from the local engine, or the demo tone when there is none
+        or it fails
+        """
+        if self.local_engine.available:
+            try:
+                cleaned_text = self._clean_text_for_speech(text, language)
+                with timed("tts_local_synthesis"):
+                    return await asyncio.to_thread(self.local_engine.synthesize, cleaned_text, language)
+            except Exception as e:
+                logger.error(f"Local speech engine failed: {str(e)}")
+        return self._get_demo_audio()
+
+    async def text_to_speech(self, text: str, language: Optional[str] = None) -> Optional[bytes]:
         """
         Convert text to speech using ElevenLabs
-        Returns audio data as bytes
+        Returns audio data as bytes: MPEG from ElevenLabs, WAV from the
+        local engine when ElevenLabs is not configured or fails
         """
         if not self.is_configured():
+            if self.local_engine.available:
+                return await self.local_speech(text, language)
             logger.warning("Voice service not configured")
             return None
         
         try:
-            # Clean text for better speech synthesis
-            cleaned_text = self._clean_text_for_speech(text)
-            
-            # Generate speech with warm, family-like voice settings
-            audio_iterator = self.client.text_to_speech.convert(
-                voice_id=self.voice_id,
-                text=cleaned_text,
-                voice_settings=VoiceSettings(
-                    stability=0.75,  # More stable, less variation
-                    similarity_boost=0.8,  # Closer to original voice
-                    style=0.3,  # Slightly more expressive
-                    use_speaker_boost=True  # Enhance voice clarity
-                )
-            )
-            
-            # Convert iterator to bytes
-            audio_bytes = b''.join(audio_iterator)
+            audio_bytes = b''.join([chunk async for chunk in self.stream_speech(text, language)])
             
             logger.info(f"Successfully generated speech for {len(text)} characters")
             return audio_bytes
             
         except Exception as e:
             logger.error(f"Error generating speech: {str(e)}")
-            # Return demo audio for hackathon purposes
-            return self._get_demo_audio()
+            # Fall back to local speech (or demo audio for hackathon purposes)
+            return await self.local_speech(text, language)
 
     def _get_demo_audio(self) -> bytes:
-        """Generate demo audio data for when API is not available"""
-        # Create a simple audio file (silence) for demo purposes
-        # In a real implementation, you'd have a pre-recorded demo audio
-        import wave
-        import io
-        
-        # Create a simple 1-second silence audio
-        sample_rate = 22050
-        duration = 1  # seconds
-        frames = int(sample_rate * duration)
-        
-        # Create a simple sine wave as demo audio
-        import math
-        audio_data = []
-        for i in range(frames):
-            # Simple sine wave at 440Hz (A note)
-            value = int(32767 * 0.1 * math.sin(2 * math.pi * 440 * i / sample_rate))
-            audio_data.append(value)
-        
-        # Convert to bytes (16-bit PCM)
-        audio_bytes = b''.join([value.to_bytes(2, byteorder='little', signed=True) for value in audio_data])
-        
+        """Demo audio (a one-second 440Hz tone as WAV) for when no engine is available"""
         logger.info("Using demo audio due to API limitations")
-        return audio_bytes
+        DEMO_FALLBACKS.inc(service="voice")
+        return tone_wav(440.0, 1.0)
     
-    def _clean_text_for_speech(self, text: str) -> str:
+    def _clean_text_for_speech(self, text: str, language: Optional[str] = None) -> str:
         """
         Clean text to make it more suitable for speech synthesis
+
+        Markdown emphasis is removed and medical abbreviations are expanded
+        from the language's lexicon (see lexicons/) in a single pass.
         """
-        # Remove markdown formatting
-        cleaned = text.replace("**", "").replace("*", "")
-        
-        # Replace common medical abbreviations with full words
-        replacements = {
-            "STEMI": "S-T-E-M-I",
-            "PCI": "P-C-I", 
-            "LAD": "L-A-D",
-            "ECG": "E-C-G",
-            "BP": "blood pressure",
-            "HR": "heart rate",
-            "mg": "milligrams",
-            "ml": "milliliters",
-            "vs": "versus",
-            "w/": "with",
-            "w/o": "without"
-        }
-        
-        for abbrev, full in replacements.items():
-            cleaned = cleaned.replace(abbrev, full)
-        
-        # Add pauses for better speech flow
-        cleaned = cleaned.replace(".", ". ")
-        cleaned = cleaned.replace(":", ": ")
-        cleaned = cleaned.replace(";", "; ")
-        
-        return cleaned.strip()
+        return self.lexicons.get(language).clean(text)
     
     def get_available_voices(self) -> list:
         """
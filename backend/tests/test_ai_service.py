@@ -0,0 +1,75 @@
+import asyncio
+import re
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from services.ai_service import AIService  # noqa: E402
+from services.response_cache import ResponseCache  # noqa: E402
+
+
+class RecordingLLM:
+    """Answers each chunk prompt with a note naming its part, after a delay that reverses completion order"""
+
+    model_name = "test-model"
+
+    def __init__(self):
+        self.prompts = []
+
+    def is_configured(self):
+        return True
+
+    async def generate(self, prompt):
+        self.prompts.append(prompt)
+        index, total = map(int, re.search(r"part (\d+) of (\d+)", prompt).groups())
+        await asyncio.sleep(0.001 * (total - index))
+        return f"note for part {index}"
+
+
+def _service(monkeypatch, long_document_chars, chunk_chars):
+    monkeypatch.setenv("RESPONSE_CACHE_ENTRIES", "64")
+    monkeypatch.delenv("RESPONSE_CACHE_PATH", raising=False)
+    service = AIService(RecordingLLM(), ResponseCache())
+    service.long_document_chars = long_document_chars
+    service.chunk_chars = chunk_chars
+    service.chunk_concurrency = 2
+    return service
+
+
+def _report(sections):
+    return "\n\n".join(f"SECTION {i}:\n" + f"finding {i} " * 20 for i in range(sections))
+
+
+def test_short_report_is_sent_whole(monkeypatch):
+    service = _service(monkeypatch, long_document_chars=100000, chunk_chars=200)
+    report = _report(3)
+    prompt = asyncio.run(service._final_simplify_prompt(report))
+    assert report in prompt
+    assert service.llm.prompts == []
+
+
+def test_long_report_notes_are_merged_in_part_order(monkeypatch):
+    service = _service(monkeypatch, long_document_chars=500, chunk_chars=300)
+    prompt = asyncio.run(service._final_simplify_prompt(_report(6)))
+    total = len(service.llm.prompts)
+    assert total > 1
+    # Chunks finish in reverse order, but the merge prompt lists them as they appear in the report
+    positions = [prompt.index(f"Part {i}:\nnote for part {i}") for i in range(1, total + 1)]
+    assert positions == sorted(positions)
+
+
+def test_every_chunk_prompt_carries_its_own_text(monkeypatch):
+    service = _service(monkeypatch, long_document_chars=500, chunk_chars=300)
+    asyncio.run(service._final_simplify_prompt(_report(6)))
+    covered = " ".join(re.split(r"Report part \d+ of \d+:\n", prompt)[1] for prompt in service.llm.prompts)
+    for i in range(6):
+        assert f"SECTION {i}:" in covered
+
+
+def test_unchanged_chunks_come_from_the_cache(monkeypatch):
+    service = _service(monkeypatch, long_document_chars=500, chunk_chars=300)
+    asyncio.run(service._final_simplify_prompt(_report(6)))
+    calls = len(service.llm.prompts)
+    asyncio.run(service._final_simplify_prompt(_report(6)))
+    assert len(service.llm.prompts) == calls
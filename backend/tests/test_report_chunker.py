@@ -0,0 +1,69 @@
+from services.report_chunker import chunk_report, split_sections
+
+REPORT = """Patient: Jane Doe
+MRN: 12345
+
+HISTORY OF PRESENT ILLNESS:
+Chest pain for two hours.
+
+--- Page 2 ---
+ASSESSMENT AND PLAN:
+Admit to cardiology.
+Start aspirin 81 mg daily.
+
+DISCHARGE MEDICATIONS:
+Aspirin, atorvastatin."""
+
+
+def _words(text):
+    return text.split()
+
+
+def test_split_sections_keeps_headings_with_their_body():
+    sections = split_sections(REPORT)
+    assert sections[0].startswith("Patient: Jane Doe")
+    assert sections[1] == "HISTORY OF PRESENT ILLNESS:\nChest pain for two hours."
+    assert sections[2] == "--- Page 2 ---"
+    assert sections[3].startswith("ASSESSMENT AND PLAN:")
+    assert sections[4].startswith("DISCHARGE MEDICATIONS:")
+
+
+def test_split_sections_without_headings_is_one_section():
+    assert split_sections("just a note\nwith two lines") == ["just a note\nwith two lines"]
+
+
+def test_chunks_respect_the_size_limit():
+    for max_chars in (20, 40, 80, 200):
+        assert all(len(chunk) <= max_chars for chunk in chunk_report(REPORT, max_chars))
+
+
+def test_chunks_reassemble_to_the_report_in_order_without_overlap():
+    for max_chars in (20, 40, 80, 200, 10000):
+        chunks = chunk_report(REPORT, max_chars)
+        assert _words(" ".join(chunks)) == _words(REPORT)
+
+
+def test_short_report_is_one_chunk():
+    assert chunk_report(REPORT, 10000) == ["\n\n".join(split_sections(REPORT))]
+
+
+def test_sections_are_not_split_when_they_fit():
+    chunks = chunk_report(REPORT, 80)
+    # Each heading starts a chunk or follows a blank line inside one, never mid-chunk text
+    for heading in ("HISTORY OF PRESENT ILLNESS:", "ASSESSMENT AND PLAN:", "DISCHARGE MEDICATIONS:"):
+        holder = next(chunk for chunk in chunks if heading in chunk)
+        assert holder.startswith(heading) or f"\n\n{heading}" in holder
+
+
+def test_oversized_section_is_split_at_lines_then_words():
+    section = "MEDICATIONS:\n" + "\n".join(f"drug{i} 10 mg twice daily" for i in range(20))
+    chunks = chunk_report(section, 60)
+    assert all(len(chunk) <= 60 for chunk in chunks)
+    # Lines fit, so none of them is broken in two
+    assert all(line.startswith("drug") or line == "MEDICATIONS:" for chunk in chunks for line in chunk.split("\n"))
+    assert _words(" ".join(chunks)) == _words(section)
+
+
+def test_unbroken_token_longer_than_the_limit_is_hard_cut():
+    chunks = chunk_report("x" * 25, 10)
+    assert chunks == ["x" * 10, "x" * 10, "x" * 5]
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from services.speech_normalizer import SpeechLexicons, SpeechNormalizer
+
+
+@pytest.fixture(scope="module")
+def english():
+    return SpeechLexicons().get("en")
+
+
+@pytest.fixture(scope="module")
+def spanish():
+    return SpeechLexicons().get("es")
+
+
+@pytest.mark.parametrize("text, spoken", [
+    ("BP 120/80 mmHg, HR 72 bpm", "blood pressure 120/80 millimeters of mercury, heart rate 72 beats per minute"),
+    ("Aspirin 81mg daily", "Aspirin 81 milligrams daily"),
+    ("Take 2.5mg BID", "Take 2.5 milligrams twice a day"),
+    ("Metoprolol 25 mg PO BID", "Metoprolol 25 milligrams by mouth twice a day"),
+    ("Dose 10mL/kg", "Dose 10 milliliters/kilograms"),
+    ("45y/o male", "45 year old male"),
+    ("Status post STEMI, s/p PCI to LAD", "Status post S-T-E-M-I, s/p P-C-I to L-A-D"),
+    ("Take w/water, not w/o food", "Take with water, not without food"),
+    ("Dr. Lee prescribed it prn", "Doctor Lee prescribed it prn"),
+])
+def test_english_expansions(english, text, spoken):
+    assert english.expand(text) == spoken
+
+
+@pytest.mark.parametrize("text", [
+    "Stage IV lung cancer",
+    "Stage IV",
+    "IV fluids were given",
+    "Class IV heart failure",
+])
+def test_roman_numeral_iv_is_left_alone(english, text):
+    assert english.expand(text) == text
+
+
+@pytest.mark.parametrize("text", [
+    "imaging of the chest",   # "mg" inside a word
+    "mgmt plan",              # "mg" at the start of a word
+    "ABPM ordered",           # "BP" inside a word
+    "bp is lowercase",        # terms are case-sensitive
+    "CO2 retention",          # "O2" after a letter
+])
+def test_terms_inside_words_are_not_expanded(english, text):
+    assert english.expand(text) == text
+
+
+def test_longest_term_wins(english):
+    assert english.expand("NSTEMI") == "N-S-T-E-M-I"
+    assert english.expand("w/o") == "without"
+
+
+def test_uppercase_terms_need_a_word_boundary_before_them(english):
+    # Only lowercase-initial terms (units) may follow a digit directly
+    assert english.expand("3CT scans") == "3CT scans"
+    assert english.expand("3 CT scans") == "3 C-T scans"
+
+
+def test_spanish_lexicon(spanish):
+    assert spanish.expand("Estadio IV, 10mg VO c/8 horas") == "Estadio IV, 10 miligramos por vía oral cada 8 horas"
+
+
+def test_clean_strips_emphasis_and_adds_pauses(english):
+    assert english.clean("**Take** 5mg.Then rest:now") == "Take 5 milligrams. Then rest: now"
+    # Decimal points and times are not pauses
+    assert english.clean("2.5 mg at 10:30") == "2.5 milligrams at 10:30"
+
+
+def test_unknown_language_falls_back_to_english(english):
+    lexicons = SpeechLexicons()
+    assert lexicons.get("xx").expand("81mg") == "81 milligrams"
+    assert lexicons.get("../etc/passwd").expand("81mg") == "81 milligrams"
+
+
+def test_custom_lexicon_directory(tmp_path):
+    (tmp_path / "en.json").write_text(json.dumps({"q4h": "every four hours"}), encoding="utf-8")
+    normalizer = SpeechLexicons(directory=str(tmp_path)).get("en")
+    assert normalizer.expand("Tylenol q4h, 81mg") == "Tylenol every four hours, 81mg"
+
+
+def test_empty_lexicon_leaves_text_alone():
+    assert SpeechNormalizer({}).expand("81mg IV") == "81mg IV"
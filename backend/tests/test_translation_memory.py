@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from services.translation_memory import TranslationMemory, assemble, parse_segment_translations, segment_markdown
+
+DOCUMENT = """## **Simple Summary**
+
+You had a heart attack. Dr. Smith opened the artery with a stent! Is that serious? Not usually.
+
+**Key Terms**:
+- **STEMI**: A serious heart attack.
+- **Stent**: A small mesh tube, e.g. a scaffold.
+1. Take aspirin 81 mg daily.
+2) Take aspirin 81 mg daily.
+> Remember: this is not medical advice.
+
+  Indented line without a full stop
+---
+12/05/2024
+"""
+
+
+@pytest.mark.parametrize("text", [
+    DOCUMENT,
+    DOCUMENT.replace("\n", "\r\n"),
+    "No trailing newline. Second sentence",
+    "",
+    "\n\n",
+])
+def test_segmenting_round_trips(text):
+    template, segments = segment_markdown(text)
+    assert assemble(template, segments) == text
+
+
+def test_segments_are_sentences_and_list_items_without_markdown_prefixes():
+    _, segments = segment_markdown(DOCUMENT)
+    assert "You had a heart attack." in segments
+    assert "Dr. Smith opened the artery with a stent!" in segments
+    assert "Is that serious?" in segments
+    assert "**STEMI**: A serious heart attack." in segments
+    assert "Remember: this is not medical advice." in segments
+    # Abbreviations do not end a sentence
+    assert "**Stent**: A small mesh tube, e.g. a scaffold." in segments
+    assert not any(segment.startswith(("- ", "1. ", "2) ", "> ", "#")) for segment in segments)
+
+
+def test_lines_without_letters_are_kept_as_literals():
+    template, segments = segment_markdown(DOCUMENT)
+    assert "---" not in segments and "12/05/2024" not in segments
+    assert "".join(part for part in template if isinstance(part, str)).count("12/05/2024") == 1
+
+
+def test_repeated_segments_are_translated_once():
+    template, segments = segment_markdown(DOCUMENT)
+    assert segments.count("Take aspirin 81 mg daily.") == 1
+    index = segments.index("Take aspirin 81 mg daily.")
+    assert template.count(index) == 2
+
+
+def test_translations_are_placed_by_segment_index():
+    template, segments = segment_markdown("- First item.\n- Second item.\n")
+    translated = assemble(template, [f"<{number}>" for number in range(len(segments))])
+    assert translated == "- <0>\n- <1>\n"
+
+
+def test_parse_accepts_keys_in_any_order_and_surrounding_text():
+    response = 'Here you go:\n```json\n{"2": " dos ", "1": "uno", "3": "tres"}\n```'
+    assert parse_segment_translations(response, 3) == ["uno", "dos", "tres"]
+
+
+@pytest.mark.parametrize("response", [
+    json.dumps({"1": "uno", "3": "tres"}),        # a segment is missing
+    json.dumps({"1": "uno", "2": "", "3": "tres"}),  # a segment is empty
+    json.dumps({"1": "uno", "2": 2, "3": "tres"}),   # not a string
+    json.dumps(["uno", "dos", "tres"]),           # not keyed by number
+    '{"1": "uno", "2": "dos", "3": ',              # truncated
+    "no JSON at all",
+])
+def test_parse_rejects_incomplete_or_malformed_responses(response):
+    assert parse_segment_translations(response, 3) is None
+
+
+def test_parse_ignores_extra_segments():
+    assert parse_segment_translations(json.dumps({"1": "uno", "2": "dos", "3": "tres"}), 2) == ["uno", "dos"]
+
+
+def test_memory_reuses_segments_per_language(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRANSLATION_MEMORY_PATH", str(tmp_path / "memory.sqlite3"))
+    memory = TranslationMemory()
+    memory.store([("Take aspirin.", "Tome aspirina.")], "Spanish", "model", "1")
+
+    # A new process only has the persistent tier
+    memory = TranslationMemory()
+    assert memory.lookup(["Take  aspirin.", "Rest."], "Spanish", "model", "1") == ["Tome aspirina.", None]
+    assert memory.lookup(["Take aspirin."], "French", "model", "1") == [None]
+    assert memory.lookup(["Take aspirin."], "Spanish", "model", "2") == [None]
+    assert memory.segments_reused == 1
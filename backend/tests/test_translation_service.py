@@ -0,0 +1,59 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from services.response_cache import ResponseCache  # noqa: E402
+from services.translation_memory import TranslationMemory  # noqa: E402
+from services.translation_service import TranslationService  # noqa: E402
+
+
+class SegmentLLM:
+    """Translates batched segments as "es:<segment>", dropping the segments listed in drop"""
+
+    model_name = "test-model"
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.prompts = []
+
+    def is_configured(self):
+        return True
+
+    async def generate(self, prompt):
+        self.prompts.append(prompt)
+        match = re.search(r"Segments:\n(\{.*\})\s*$", prompt, re.S)
+        if match is None:
+            return "whole document translation"
+        segments = json.loads(match.group(1))
+        return json.dumps({number: f"es:{text}" for number, text in segments.items() if number not in self.drop})
+
+
+def _service(monkeypatch, llm):
+    monkeypatch.delenv("RESPONSE_CACHE_PATH", raising=False)
+    monkeypatch.delenv("TRANSLATION_MEMORY_PATH", raising=False)
+    return TranslationService(llm, ResponseCache(), TranslationMemory())
+
+
+def test_segments_are_reassembled_in_document_order(monkeypatch):
+    service = _service(monkeypatch, SegmentLLM())
+    translated = asyncio.run(service.translate_text("- First item.\n- Second item. Third one.\n", "spanish"))
+    assert translated == "- es:First item.\n- es:Second item. es:Third one.\n"
+
+
+def test_a_missing_segment_falls_back_to_the_whole_document(monkeypatch):
+    service = _service(monkeypatch, SegmentLLM(drop={"2"}))
+    translated = asyncio.run(service.translate_text("First item. Second item.", "spanish"))
+    assert translated == "whole document translation"
+
+
+def test_known_segments_are_not_sent_again(monkeypatch):
+    llm = SegmentLLM()
+    service = _service(monkeypatch, llm)
+    asyncio.run(service.translate_text("Take aspirin daily. Rest well.", "spanish"))
+    asyncio.run(service.translate_text("Take aspirin daily. Drink water.", "spanish"))
+    assert "Take aspirin daily." not in llm.prompts[-1]
+    assert "Drink water." in llm.prompts[-1]
@@ -22,6 +22,7 @@ function FileUpload() {
       const response = await uploadFile(formData);
       
       if (response.success) {
+        dispatch({ type: 'SET_REPORT_ID', payload: response.report_id || null });
         dispatch({ type: 'SET_EXTRACTED_TEXT', payload: response.extracted_text });
       } else {
         dispatch({ type: 'SET_ERROR', payload: 'Failed to extract text from file' });
@@ -6,7 +6,7 @@ import VoicePlayer from './VoicePlayer';
 
 function QASection() {
   const { state, dispatch } = useMedical();
-  const { extractedText, simplifiedText, chatHistory } = state;
+  const { reportId, extractedText, simplifiedText, chatHistory } = state;
   const [question, setQuestion] = useState('');
   const [isAsking, setIsAsking] = useState(false);
   const [fontSize, setFontSize] = useState(14); // default font size in pixels
@@ -57,7 +57,7 @@ function QASection() {
 
     try {
       const context = simplifiedText || extractedText;
-      const response = await askQuestion(question, context);
+      const response = await askQuestion(question, context, reportId);
       
       if (response.success) {
         const botMessage = {
@@ -6,7 +6,7 @@ import VoicePlayer from './VoicePlayer';
 
 function ResultsPanel() {
   const { state, dispatch } = useMedical();
-  const { extractedText, simplifiedText, isProcessing, currentLanguage } = state;
+  const { reportId, extractedText, simplifiedText, isProcessing, currentLanguage } = state;
   const [isTranslating, setIsTranslating] = useState(false);
   const [copied, setCopied] = useState(false);
   const [fontSize, setFontSize] = useState(14); // default font size in pixels
@@ -45,7 +45,7 @@ function ResultsPanel() {
     dispatch({ type: 'SET_ERROR', payload: null });
 
     try {
-      const response = await simplifyText(extractedText);
+      const response = await simplifyText(extractedText, reportId);
       if (response.success) {
         dispatch({ type: 'SET_SIMPLIFIED_TEXT', payload: response.simplified_text });
       } else {
@@ -69,7 +69,7 @@ function ResultsPanel() {
     dispatch({ type: 'SET_LANGUAGE', payload: newLanguage });
 
     try {
-      const response = await translateText(simplifiedText, newLanguage);
+      const response = await translateText(simplifiedText, newLanguage, reportId);
       if (response.success) {
         dispatch({ type: 'SET_SIMPLIFIED_TEXT', payload: response.translated_text });
       }
@@ -135,7 +135,11 @@ function ResultsPanel() {
           <div className="flex items-center justify-between mb-4">
             <h3 className="text-lg font-medium text-gray-900">Simplified Explanation</h3>
             <div className="flex items-center space-x-3">
-              <VoicePlayer text={simplifiedText} />
+              <VoicePlayer
+                text={simplifiedText}
+                reportId={reportId}
+                language={currentLanguage === 'english' ? null : currentLanguage}
+              />
               {/* Text Size Controls */}
               <div className="flex items-center space-x-1 border border-gray-300 rounded px-2 py-1">
                 <button
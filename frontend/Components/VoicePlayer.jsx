@@ -2,7 +2,9 @@ import React, { useState, useRef, useEffect } from 'react';
 import { Volume2, VolumeX, Play, Pause, Loader } from 'lucide-react';
 import { textToSpeech } from '../src/services/api';
 
-function VoicePlayer({ text, className = "" }) {
+// With a reportId the server reads the report's own text, so the text
+// itself is only sent if the server no longer has the report
+function VoicePlayer({ text, reportId = null, language = null, className = "" }) {
   const [isPlaying, setIsPlaying] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
@@ -22,7 +24,7 @@ function VoicePlayer({ text, className = "" }) {
     setError(null);
 
     try {
-      const response = await textToSpeech(text);
+      const response = await textToSpeech(text, reportId, language);
       
       if (response.success && response.audio_data) {
         // Convert base64 to blob
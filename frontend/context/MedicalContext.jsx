@@ -3,6 +3,8 @@ import React, { createContext, useContext, useReducer } from 'react';
 const MedicalContext = createContext();
 
 const initialState = {
+  // ID of the uploaded report on the server, sent instead of its text
+  reportId: null,
   extractedText: '',
   simplifiedText: '',
   isProcessing: false,
@@ -15,6 +17,8 @@ function medicalReducer(state, action) {
   switch (action.type) {
     case 'SET_EXTRACTED_TEXT':
       return { ...state, extractedText: action.payload, error: null };
+    case 'SET_REPORT_ID':
+      return { ...state, reportId: action.payload };
     case 'SET_SIMPLIFIED_TEXT':
       return { ...state, simplifiedText: action.payload, error: null };
     case 'SET_PROCESSING':
@@ -31,6 +35,7 @@ function medicalReducer(state, action) {
     case 'CLEAR_DATA':
       return { 
         ...state, 
+        reportId: null,
         extractedText: '', 
         simplifiedText: '', 
         chatHistory: [],
@@ -32,6 +32,23 @@ api.interceptors.response.use(
   }
 );
 
+// Send a report's ID instead of its text. The server keeps uploaded reports
+// for a while; if it has forgotten this one (404) or has nothing stored for
+// the request (400), send the text after all.
+const postForReport = async (path, reportId, reportBody, textBody) => {
+  if (reportId) {
+    try {
+      return await api.post(path, { ...reportBody, report_id: reportId });
+    } catch (error) {
+      const status = error.response?.status;
+      if (status !== 404 && status !== 400) {
+        throw error;
+      }
+    }
+  }
+  return api.post(path, textBody);
+};
+
 export const uploadFile = async (formData) => {
   try {
     const response = await api.post('/upload', formData, {
@@ -46,9 +63,14 @@ export const uploadFile = async (formData) => {
   }
 };
 
-export const simplifyText = async (text) => {
+export const simplifyText = async (text, reportId = null) => {
   try {
-    const response = await api.post('/simplify', { text });
+    const response = await postForReport(
+      '/simplify',
+      reportId,
+      { include_original_text: false },
+      { text, include_original_text: false }
+    );
     return response.data;
   } catch (error) {
     console.error('Simplify error:', error);
@@ -56,12 +78,9 @@ export const simplifyText = async (text) => {
   }
 };
 
-export const askQuestion = async (question, context) => {
+export const askQuestion = async (question, context, reportId = null) => {
   try {
-    const response = await api.post('/ask', {
-      question,
-      context
-    });
+    const response = await postForReport('/ask', reportId, { question }, { question, context });
     return response.data;
   } catch (error) {
     console.error('Q&A error:', error);
@@ -69,12 +88,15 @@ export const askQuestion = async (question, context) => {
   }
 };
 
-export const translateText = async (text, targetLanguage) => {
+// With a reportId the server translates the report's simplified text
+export const translateText = async (text, targetLanguage, reportId = null) => {
   try {
-    const response = await api.post('/translate', {
-      text,
-      target_language: targetLanguage
-    });
+    const response = await postForReport(
+      '/translate',
+      reportId,
+      { target_language: targetLanguage, include_original_text: false },
+      { text, target_language: targetLanguage, include_original_text: false }
+    );
     return response.data;
   } catch (error) {
     console.error('Translation error:', error);
@@ -82,9 +104,12 @@ export const translateText = async (text, targetLanguage) => {
   }
 };
 
-export const textToSpeech = async (text) => {
+// With a reportId the server speaks the report's simplified text, or its
+// translation into language
+export const textToSpeech = async (text, reportId = null, language = null) => {
   try {
-    const response = await api.post('/text-to-speech', { text });
+    const reportBody = language ? { language } : {};
+    const response = await postForReport('/text-to-speech', reportId, reportBody, { text });
     return response.data;
   } catch (error) {
     console.error('Text-to-speech error:', error);